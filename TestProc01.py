@@ -4,7 +4,19 @@ import csv
 import numpy as np
 import pyvisa
 from time import sleep
-from robust_serial import Order, read_order, write_i8, write_i16, write_order
+from robust_serial import FrameReader, Order, read_order, write_i8, write_i16, write_order
+from robust_serial.pipeline import ArduinoError, CommandWindow
+from binning import BIN_LABELS, BIN_PERCENT_STEP, BIN_RANGE, RESISTOR_BINS, TARGET_RESISTANCE
+from clock import RealClock
+from sdm3055 import SDM3055, DMMTimeoutError
+from settling import HV_SETTLE, RELAY_SETTLE, wait_settled
+from sampling import SEQUENTIAL_SAMPLING, measure
+from columnar import save_columnar
+from costmodel import save_timings
+from measurements import MeasurementStore
+from journal import Journal, JournalState, journal_path
+from results import ResultsWriter, write_results_csv
+from testplan import RELAY_TEST_PLAN, STANDARD_PLAN, PlanExecutor, load_plan
 from robust_serial.utils import open_serial_port, setRelay  # Import setRelay function
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QTabWidget,
@@ -13,26 +25,12 @@ from PyQt5.QtWidgets import (
 from PyQt5.QtCore import QObject, pyqtSignal
 import string
 
-TARGET_RESISTANCE = 5000e6  # 5000 MΩ
-BIN_PERCENT_STEP = 0.002    # 0.2%
-BIN_RANGE = 0.01            # ±1.0%
-BIN_LABELS = list(string.ascii_uppercase)
-
-# Step 1: Define range and calculate edges
-range_steps = int(BIN_RANGE / BIN_PERCENT_STEP)
-edges = [TARGET_RESISTANCE * (1 + i * BIN_PERCENT_STEP) for i in range(-range_steps, range_steps + 1)]
-
-# Step 2: Sort edges by distance to center (TARGET_RESISTANCE)
-sorted_edges = sorted(edges, key=lambda x: abs(x - TARGET_RESISTANCE))
-
-# Step 3: Map sorted edges to bin labels
-bin_edges = sorted_edges
+# Bin table built once in binning.py
+bin_edges = RESISTOR_BINS.edges
 label_map = {edge: BIN_LABELS[i] for i, edge in enumerate(bin_edges)}
 
 def bin_resistance(value):
-    diffs = [abs(value - edge) for edge in bin_edges]
-    idx = int(np.argmin(diffs))
-    return BIN_LABELS[idx]
+    return RESISTOR_BINS.label(value)
 
 
 class TestingProcess(QObject):
@@ -41,24 +39,40 @@ class TestingProcess(QObject):
     voltage_live = pyqtSignal(float)
     test_complete = pyqtSignal()
 
-    def __init__(self, arduino_port, dmm_port, file_path=None):
+    def __init__(self, arduino_port, dmm_port, file_path=None, clock=None, serial_file=None, dmm=None):
         """
         Initializes connections to both the Arduino and the DMM based on the selected USB ports.
+        All waits go through clock (RealClock by default, VirtualClock for simulations).
+        Already opened serial_file / dmm objects (e.g. the simulated devices) can be passed instead of ports.
         """
         super().__init__()
         self.arduino_port = arduino_port
         self.dmm_port = dmm_port
         self.file_path = file_path
+        self.clock = RealClock() if clock is None else clock
         self.is_running = True
-        self.data = []
+        self.stopped = False
+        self.data = MeasurementStore()
+        self.settle_log = []
+        self.timings = []
+        self.rejected = {}
+        self.plan_name = None
+        self.journal = None
+        self.resume_journal = None
+        self.results = None
+        self.sample_policy = SEQUENTIAL_SAMPLING
         self.test_info = {}
         
 
         # Initialize Arduino connection
-        try:
-            self.serial_file = open_serial_port(arduino_port, baudrate=115200, timeout=None)
-        except Exception as e:
-            raise RuntimeError(f"Failed to connect to Arduino on {arduino_port}: {e}")
+        if serial_file is not None:
+            self.serial_file = serial_file
+        else:
+            try:
+                # Finite timeout so a silent Arduino can never block a read forever
+                self.serial_file = open_serial_port(arduino_port, baudrate=115200, timeout=0.1)
+            except Exception as e:
+                raise RuntimeError(f"Failed to connect to Arduino on {arduino_port}: {e}")
 
         is_connected = False
         while not is_connected:
@@ -67,7 +81,7 @@ class TestingProcess(QObject):
 
             bytes_array = bytearray(self.serial_file.read(1))
             if not bytes_array:
-                time.sleep(2)
+                self.clock.sleep(2)
                 continue
 
             byte = bytes_array[0]
@@ -76,22 +90,29 @@ class TestingProcess(QObject):
                 write_order(self.serial_file, Order.ALREADY_CONNECTED)
 
         print(f"Connected to Arduino on {arduino_port}")
+        self.reader = FrameReader(self.serial_file)
+        self.link = CommandWindow(self.serial_file, reader=self.reader, clock=self.clock)
         
-        self.rm = pyvisa.ResourceManager()
         try:
-            self.dmm = self.rm.open_resource(dmm_port)
-            self.dmm.write("*IDN?")
+            if dmm is not None:
+                self.dmm = dmm
+            else:
+                self.rm = pyvisa.ResourceManager()
+                self.dmm = self.rm.open_resource(dmm_port)
             self.dmm.timeout = 5000
             self.dmm.write_termination = '\n'
             self.dmm.read_termination = '\n'
-            print(f"Connected to DMM on {dmm_port}")
+            # Read the answer back, otherwise it is returned by the next query
+            idn = self.dmm.query("*IDN?").strip()
+            self.meter = SDM3055(self.dmm, self.clock)
+            print(f"Connected to DMM on {dmm_port}: {idn}")
         except Exception as e:
             raise RuntimeError(f"failed to connect to dmm on {dmm_port}")
             
        
     def set_test_info(self, info_dict):
         self.test_info = info_dict  
-        self.timestamp = int(time.time())
+        self.timestamp = int(self.clock.time())
         
     def build_csv_path(self, folder_path):
         if hasattr(self, 'test_info') and hasattr(self, 'timestamp'):
@@ -99,30 +120,75 @@ class TestingProcess(QObject):
             self.file_path = os.path.join(folder_path, filename)
             
        
+    def open_results(self):
+        """
+        Opens the CSV and writes its header, the rows are then written as they are measured.
+        """
+        try:
+            self.results = ResultsWriter(self.file_path, self.test_info, self.timestamp)
+            self.results.write_rows(self.data)
+        except Exception as e:
+            print(f"Error opening CSV: {e}")
+            self.results = None
+
     def save_data_csv(self):
+        """
+        Closes the CSV written during the test (or writes it at once if it was not),
+        and saves the columnar copy (.npy + .meta.json), settling and timing files next to it.
+        Does nothing the second time.
+        """
+        if self.results is not None:
+            if self.results.closed:
+                return
+            # Closed even when the run produced no data
+            self.results.close()
         if self.file_path and self.data:
             try:
-                with open(self.file_path, 'w', newline = '') as csvfile:
-                    writer =csv.writer(csvfile)
-                    
-                    writer.writerow(["ID:", f"{self.test_info['Stand Number']}_{self.test_info['Dunk Board']}_{self.timestamp}", "User:", self.test_info['Tester Name']])
-                    
-                    writer.writerow(["Calibration Channel (-1 if not calib):", self.test_info['Calib Channel'], "Calibration Value (GOhm):",self.test_info['Calib Value']])
-                    
-                    writer.writerow(['HV Index', 'CHANNEL', 'Voltage','Error'])
-                    
-                    for row in self.data:
-                        writer.writerow([row['DAC Value'],row['Relay'],row['Measured Voltage [V]'], row['Voltage Error [V]']])
-                    print(f"Data saved successfully to {self.file_path}")
+                if self.results is None:
+                    write_results_csv(self.file_path, self.test_info, self.timestamp, self.data)
+                print(f"Data saved successfully to {self.file_path}")
+                save_columnar(self.file_path, self.data.array, {'test_info': self.test_info, 'timestamp': self.timestamp, 'plan': self.plan_name, 'rejected': self.rejected})
+                if self.settle_log:
+                    self.save_settle_log(os.path.splitext(self.file_path)[0] + "_settling.csv")
+                if self.timings:
+                    save_timings(os.path.splitext(self.file_path)[0] + "_timing.json", self.timings, self.test_info.get('Stand Number'), self.plan_name)
             except Exception as e:
                 print(f"Error saving CSV: {e}")
+
+    def save_settle_log(self, path):
+        """
+        Settle time of every HV and relay step, to follow the health of the stand.
+        """
+        with open(path, 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(['HV Index', 'CHANNEL', 'Settle Time [s]', 'Settled'])
+            for row in self.settle_log:
+                relay = row['Relay'] if row['Relay'] is not None else -1
+                writer.writerow([row['DAC Value'], relay, f"{row['Settle Time [s]']:.2f}", int(row['Settled'])])
                 
                 
                     
-    def initialize_dmm(self):
+    def send_command(self, order, value=None, timeout=2):
+        """
+        Sends a sequenced order to the Arduino and waits for its acknowledgement.
+        Returns the CommandResult, or None if the Arduino failed or did not answer.
+        """
+        try:
+            return self.link.send(order, value, timeout=timeout)
+        except (ArduinoError, TimeoutError, RuntimeError) as e:
+            print(f"Arduino command {order.name} failed: {e}")
+            return None
+            
+            
+    def initialize_dmm(self, voltage_range=2):
+        """
+        Configures the DMM for DC readings on voltage_range (V, None for auto range).
+        Cheap to call again: nothing is sent if the DMM is already configured.
+        """
         try:
-            self.dmm.write("CONF:VOLT:DC")
-            self.dmm.write("SENS:VOLT:DC:RANG 2")
+            self.meter.configure_voltage(voltage_range)
+            for error in self.meter.check_errors():
+                print(f"DMM error: {error}")
             #self.dmm.write("SYST:INP:Z 10E9")
             #print("DMM initialized to 2V range and 10Gohm input Z")
         except Exception as e:
@@ -134,32 +200,35 @@ class TestingProcess(QObject):
     def read_DMM(self):
         """
         Reads voltage from the Siglent SDM3055 digital multimeter via USB.
+        The DMM must have been configured with initialize_dmm().
         """
-        self.initialize_dmm()
         try:
-            #voltage = float(self.dmm.query("MEAS:VOLT:DC?"))
-            voltage = float(self.dmm.query("READ?"))
-            return voltage
+            return self.meter.read()
         except Exception as e:
             print(f"Error reading from DMM: {e}")
             return None  # Return None if reading fails
             
             
             
-    def DMM_live_readings(self, input_HV):
-        
+    def DMM_live_readings(self, input_HV, num_readings=10):
+        """
+        Takes num_readings readings in one acquisition and fetches them with a single query.
+        With num_readings=None, takes as many readings as self.sample_policy asks for.
+        """
+        if not self.is_running:
+            print("Test cancelled during DMM read.")
+            return []
         readings = []
-        for _ in range(10):
-            if not self.is_running:
-                print("Test cancelled during DMM read.")
-                return None, None
-                
-     
-            voltage = self.read_DMM()
-            if voltage is not None:
-                readings.append(voltage)
-                self.voltage_live.emit(voltage)
-            time.sleep(0.5)  # Small delay between readings
+        try:
+            if num_readings is None:
+                measure(self.meter, self.sample_policy, readings.append)
+            else:
+                readings = self.meter.acquire(num_readings)
+        except Exception as e:
+            print(f"Error reading from DMM: {e}")
+            return []
+        for voltage in readings:
+            self.voltage_live.emit(voltage)
         return readings
             
             
@@ -177,172 +246,207 @@ class TestingProcess(QObject):
         else:
             return None, None
             
-    def dmm_calc_stats(self):
-        self.dmm.write("SAMP:COUN 10")
-        self.dmm.write("CALC:AVER:CLE")
-        self.dmm.write("CALC:AVER:STAT ON")
-        self.dmm.write("INIT")
-        time.sleep(5)
-        response = self.dmm.query("CALC:AVER:ALL?").split(",")
-        avg_voltage = float(response[0])
-        std_dev = float(response[1])
-        return avg_voltage, std_dev
+    def settle(self, policy, dac_value, relay=None):
+        """
+        Waits until the DMM voltage is settled (see settling.wait_settled)
+        and records the settle time in self.settle_log.
+        """
+        try:
+            result = wait_settled(self.meter, policy, self.clock)
+        except Exception as e:
+            print(f"Error reading from DMM while settling: {e}")
+            self.clock.sleep(policy.max_wait)
+            return None
+        self.settle_log.append({'DAC Value': dac_value, 'Relay': relay, 'Settle Time [s]': result.elapsed, 'Settled': result.settled})
+        if not result.settled:
+            print(f"Not settled after {result.elapsed:.1f} s")
+        return result
+
+    def dmm_calc_stats(self, policy=None):
+        """
+        Returns (mean, standard deviation) of the readings asked for by policy (self.sample_policy by default):
+        with a fixed count they are averaged by the DMM itself, with a target standard error
+        they are added until the target is met (see sampling.measure).
+        Returns (None, None) if the DMM does not complete the readings in time.
+        """
+        policy = self.sample_policy if policy is None else policy
+        try:
+            if policy.target_sem is None:
+                return self.meter.statistics(policy.max_count)
+            stats = measure(self.meter, policy)
+        except DMMTimeoutError as e:
+            print(e)
+            return None, None
+        if stats.n == 0:
+            return None, None
+        return stats.mean, stats.sdev
             
             
 
+    def request_stop(self):
+        """
+        Asks the running test to stop, safe to call from the GUI thread: only clears the flag,
+        the worker thread sees it between steps and calls stop() itself (the Arduino link
+        is only ever used from the worker thread).
+        """
+        self.is_running = False
+
     def stop(self):
-        print("TestingProcess: Stopping Test.")
-        if not self.is_running:
+        """
+        Drops the HV, opens the relays and saves the data. Runs in the worker thread, once.
+        """
+        if self.stopped:
             return
+        print("TestingProcess: Stopping Test.")
+        self.stopped = True
+        self.is_running = False
         
         try:
             print("Setting HV to 0")
-            write_order(self.serial_file, Order.HV_SET,0)
-            time.sleep(2)
-            self.serial_file.read(1)
+            self.send_command(Order.HV_SET, 0)
             
             print("opening all relays")
             for relay in range(8):
-                write_order(self.serial_file, Order.OPEN_RELAYS)
-                time.sleep(0.1)
-                self.serial_file.read(1)
+                self.link.submit(Order.OPEN_RELAYS)
+            self.link.wait_all(timeout=2)
                 
         except Exception as e:
-            print("Error during stop cleanup: {e}")
+            print(f"Error during stop cleanup: {e}")
         
-        if self.data:
-            self.save_data_csv()
+        if self.journal is not None:
+            self.journal.close()
+        self.save_data_csv()
         if hasattr(self, 'serial_file') and self.serial_file:
             self.serial_file.close()
         
         self.test_complete.emit()
         
         
-    def pause_test(self):
-        print("Pausing testing for 1 min")
+    def pause_test(self, duration=60):
+        print(f"Pausing testing for {duration:g} s")
         try:
             for relay in range(8):
-                write_order(self.serial_file, Order.OPEN_RELAYS)
-                time.sleep(0.1)
-                self.serial_file.read()
-            time.sleep(60)
+                self.link.submit(Order.OPEN_RELAYS)
+            self.link.wait_all(timeout=2)
+            self.clock.sleep(duration)
         except Exception as e:
             print(f"Error during pause test: {e}")
         
         
-    def standardTest(self):
-        step_size = 13 #DAC units for ~100V step
-        low_index = 13
-        upper_index = 256
-        voltage_per_unit = 7.843 # = 2000/255
-        num_relays = 8
-        start_time = time.time()
-
-        print(f"Step size = {step_size}, approx 100V step size")
-        self.initialize_dmm()
-        for i in range(low_index,upper_index,step_size):
-            input_HV = i*voltage_per_unit
-            
-            if not self.is_running:
-                self.stop()
-                return
-              
-            if time.time()-start_time > 1000:
-                self.pause_test()
-                start_time = time.time()
-    
-            print(f"Setting HV to DAC value: {i} ~ {input_HV:.2f} V")
-            self.serial_file.reset_input_buffer()
-            write_order(self.serial_file, Order.HV_SET,i)
-            time.sleep(10)
-            print(self.serial_file.read_until())
-            bytes_array = bytearray(self.serial_file.read(2))
-            print(bytes_array)
-            if not bytes_array:
-                print("No HV order received")
-            else:
-                print(f"Arduino communicating")
-            
-            for relay in range(num_relays):
-                
+    def prepare(self, plan):
+        self.plan_name = plan.name
+        print(f"Running plan {plan.name}: {len(plan.dac_values)} HV steps x {len(plan.channels)} channels")
+        self.initialize_dmm(plan.voltage_range)
+
+    def set_hv(self, dac_value, input_HV):
+        print(f"Setting HV to DAC value: {dac_value} ~ {input_HV:.2f} V")
+        hv_result = self.send_command(Order.HV_SET, dac_value)
+        if hv_result is None:
+            print("No HV order received")
+        else:
+            print(f"Arduino communicating")
+        return hv_result is not None
+
+    def select_relay(self, channel, input_HV):
+        print(f"Activating relay {channel} at {input_HV:.2f} V")
+        relay_result = self.send_command(Order.RELAY, channel - 1)
+        self.relay_updated.emit(channel - 1)
+        if relay_result is None:
+            print("No RELAY order received")
+            return False
+        print(f"Relay {channel} activated")
+        return True
+
+    def measure(self, step, policy):
+        avg_voltage, std_err = self.dmm_calc_stats(policy)
+        if avg_voltage is not None:
+            self.voltage_measured.emit(avg_voltage, std_err, step.volts)
+
+            print(f" {avg_voltage:.4f} +- {std_err:.4f} V measured across relay {step.channel}")
+            self.record({'DAC Value': step.dac, 'Voltage Step [V]': step.volts, 'Relay': step.channel, 'Measured Voltage [V]': avg_voltage, 'Voltage Error [V]': std_err})
+        else:
+            print(f"Failed to get DMM reading for relay {step.channel}")
+        return avg_voltage, std_err
+
+    def reject(self, channel, reason):
+        print(f"Relay {channel} out of spec ({reason}), skipped for the rest of the test")
+        self.rejected[channel] = reason
+
+    def stream(self, step, samples, chunk, delay):
+        """
+        One acquisition of samples readings, delay apart, fetched in chunks as they come
+        """
+        try:
+            for readings in self.meter.stream(samples, chunk=chunk, delay=delay):
+
                 if not self.is_running:
-                    self.stop()
-                    return
-                    
-                print(f"Activating relay {relay+1} at {input_HV:.2f} V")
-                write_order(self.serial_file, Order.RELAY, relay)
-                self.relay_updated.emit(relay)
-                self.serial_file.read(1)
-                relay_array = bytearray(self.serial_file.read(1))
-                if not relay_array:
-                    print("No RELAY order received")
-                else:
-                    print(f"Relay {relay +1} activated")
-                    time.sleep(2)
-                    avg_voltage, std_err = self.dmm_calc_stats()
-                    
-                    if avg_voltage is not None:
-                        self.voltage_measured.emit(avg_voltage, std_err, input_HV)
+                    self.meter.abort()
+                    break
 
-                        print(f" {avg_voltage:.4f} +- {std_err:.4f} V measured across relay {relay+1}")
-                        self.data.append({'DAC Value': i, 'Voltage Step [V]': i*voltage_per_unit, 'Relay': relay+1, 'Measured Voltage [V]': avg_voltage, 'Voltage Error [V]': std_err})
-                    else:
-                        print(f"Failed to get DMM reading for relay {relay +1}")
-                    
-                    
-                    
-                    time.sleep(1)
-            
-        self.save_data_csv()
-        self.test_complete.emit()
-        self.serial_file.close()
+                for voltage in readings:
+                    self.voltage_measured.emit(voltage, 0, step.volts)
+                    self.voltage_live.emit(voltage)
+                    self.record({'DAC Value': step.dac, 'Voltage Step [V]': step.volts, 'Relay': step.channel, 'Measured Voltage [V]': voltage, 'Voltage Error [V]': 0})
+        except Exception as e:
+            print(f"Error reading from DMM: {e}")
+
+    def pause(self, duration):
+        self.pause_test(duration)
+
+    def record(self, row):
+        row['Timestamp [s]'] = self.clock.time()
+        self.data.append(row)
+        if self.results is not None:
+            self.results.write_row(row)
+        if self.journal is not None:
+            self.journal.row(row)
+
+    def checkpoint(self, step):
+        if self.journal is not None:
+            self.journal.done(step.dac, step.channel)
+
+    def finish(self):
         self.stop()
-        
-        
-        
-        
-        
-        
+
+    def run_plan(self, plan, done=None):
+        """
+        Runs a test plan (testplan.TestPlan, a plan file or the name of a built-in plan).
+        Every finished point is journaled next to the CSV (see journal.py), skips the done (DAC, channel) steps.
+        """
+        if isinstance(plan, str):
+            plan = load_plan(plan)
+        if self.file_path and self.journal is None:
+            self.journal = Journal(journal_path(self.file_path))
+            if not done:
+                self.journal.start(plan.source, self.test_info, self.file_path, getattr(self, 'timestamp', None))
+        if self.file_path and self.results is None:
+            self.open_results()
+        return PlanExecutor(self, plan, done).run()
+
+    def resume(self, path):
+        """
+        Continues the test recorded in the journal at path: the points already measured
+        are loaded back into self.data and skipped.
+        """
+        state = JournalState(path)
+        print(f"Resuming plan {state.plan} from {path}: {len(state.done)} points already done")
+        self.test_info = state.test_info
+        self.timestamp = state.timestamp
+        self.file_path = state.file_path or self.file_path
+        self.data = MeasurementStore.from_rows(state.rows)
+        self.journal = Journal(path)
+        self.journal.resume()
+        return self.run_plan(state.plan, state.done)
+
+    def resumeTest(self):
+        return self.resume(self.resume_journal)
+
+    def standardTest(self):
+        return self.run_plan(STANDARD_PLAN)
+
     def relayTest(self):
         print("Starting single relay test")
-        DAC_Value = 0
-        voltage_per_unit = 2000/255
-        input_HV = voltage_per_unit * DAC_Value
-        target_relay = 0
-        
-        if not self.is_running:
-            self.stop()
-            return
-            
-        print(f"Setting HV to DAC value: {DAC_Value} ~ {input_HV:.2f} V")
-        write_order(self.serial_file, Order.HV_SET, DAC_Value)
-        time.sleep(10)
-        self.serial_file.read(1)
-        
-        print(f"Activating relay {target_relay +1} at {input_HV:.2f} V")
-        write_order(self.serial_file, Order.RELAY, target_relay)
-        self.relay_updated.emit(target_relay)
-        self.serial_file.read(1)
-        
-        for i in range(3000):
-        
-            if not self.is_running:
-                self.stop()
-                break
-                
-            voltage = self.read_DMM()
-            if voltage is not None:
-                #print(f"DMM read for {i} reading is {voltage}")
-                self.voltage_measured.emit(voltage,0, input_HV)
-                self.voltage_live.emit(voltage)
-                self.data.append({'DAC Value': DAC_Value, 'Voltage Step [V]': input_HV, 'Relay': target_relay, 'Measured Voltage [V]': voltage, 'Voltage Error [V]': 0})
-            else:
-                print(f"failed to get reading {i+1}")
-            time.sleep(1)
-        self.save_data_csv()
-        self.test_complete.emit()
-        self.serial_file.close()
-        self.stop()
+        return self.run_plan(RELAY_TEST_PLAN)
 
 
 if __name__ == "__main__":
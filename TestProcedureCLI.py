@@ -1,9 +1,21 @@
+import argparse
+import os
+import sys
 import time
 import csv
 import numpy as np
 import pyvisa
 from time import sleep
-from robust_serial import Order, read_order, write_i8, write_i16, write_order
+from robust_serial import FrameReader, Order, read_order, write_i8, write_i16, write_order
+from robust_serial.pipeline import ArduinoError, CommandWindow
+from clock import RealClock
+from sdm3055 import SDM3055
+from settling import HV_SETTLE, RELAY_SETTLE, wait_settled
+from sampling import SEQUENTIAL_SAMPLING, measure
+from costmodel import CostModel, format_estimate, load_timings, save_timings
+from measurements import MeasurementStore
+from journal import Journal, JournalState
+from testplan import CLI_STANDARD_PLAN, PlanExecutor, load_plan
 from robust_serial.utils import open_serial_port, setRelay  # Import setRelay function
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QTabWidget,
@@ -13,20 +25,34 @@ from PyQt5.QtCore import QTimer, QThread, pyqtSignal, Qt
 import string
 
 class TestingProcess():
-    def __init__(self, arduino_port, dmm_port, file_path=None):
+    def __init__(self, arduino_port, dmm_port, file_path=None, clock=None, serial_file=None, dmm=None):
         """
         Initializes connections to both the Arduino and the DMM based on the selected USB ports.
+        All waits go through clock (RealClock by default, VirtualClock for simulations).
+        Already opened serial_file / dmm objects (e.g. the simulated devices) can be passed instead of ports.
         """
         self.arduino_port = arduino_port
         self.dmm_port = dmm_port
         self.file_path = file_path
+        self.clock = RealClock() if clock is None else clock
+        self.is_running = True
+        self.data = MeasurementStore()
+        self.settle_log = []
+        self.timings = []
+        self.rejected = {}
+        self.journal = None
+        self.sample_policy = SEQUENTIAL_SAMPLING
         
 
         # Initialize Arduino connection
-        try:
-            self.serial_file = open_serial_port(arduino_port, baudrate=115200, timeout=None)
-        except Exception as e:
-            raise RuntimeError(f"Failed to connect to Arduino on {arduino_port}: {e}")
+        if serial_file is not None:
+            self.serial_file = serial_file
+        else:
+            try:
+                # Finite timeout so a silent Arduino can never block a read forever
+                self.serial_file = open_serial_port(arduino_port, baudrate=115200, timeout=0.1)
+            except Exception as e:
+                raise RuntimeError(f"Failed to connect to Arduino on {arduino_port}: {e}")
 
         is_connected = False
         while not is_connected:
@@ -35,7 +61,7 @@ class TestingProcess():
 
             bytes_array = bytearray(self.serial_file.read(1))
             if not bytes_array:
-                time.sleep(2)
+                self.clock.sleep(2)
                 continue
 
             byte = bytes_array[0]
@@ -44,109 +70,199 @@ class TestingProcess():
                 write_order(self.serial_file, Order.ALREADY_CONNECTED)
 
         print(f"Connected to Arduino on {arduino_port}")
+        self.reader = FrameReader(self.serial_file)
+        self.link = CommandWindow(self.serial_file, reader=self.reader, clock=self.clock)
         
-        self.rm = pyvisa.ResourceManager()
         try:
-            self.dmm = self.rm.open_resource(dmm_port)
-            self.dmm.write("*IDN?")
+            if dmm is not None:
+                self.dmm = dmm
+            else:
+                self.rm = pyvisa.ResourceManager()
+                self.dmm = self.rm.open_resource(dmm_port)
             self.dmm.timeout = 5000
             self.dmm.write_termination = '\n'
             self.dmm.read_termination = '\n'
-            print(f"Connected to DMM on {dmm_port}")
+            # Read the answer back, otherwise it is returned by the next query
+            idn = self.dmm.query("*IDN?").strip()
+            self.meter = SDM3055(self.dmm, self.clock)
+            print(f"Connected to DMM on {dmm_port}: {idn}")
         except Exception as e:
             raise RuntimeError(f"failed to connect to dmm on {dmm_port}")
+    def send_command(self, order, value=None, timeout=2):
+        """
+        Sends a sequenced order to the Arduino and waits for its acknowledgement.
+        Returns the CommandResult, or None if the Arduino failed or did not answer.
+        """
+        try:
+            return self.link.send(order, value, timeout=timeout)
+        except (ArduinoError, TimeoutError, RuntimeError) as e:
+            print(f"Arduino command {order.name} failed: {e}")
+            return None
+
     def read_DMM(self):
         """
         Reads voltage from the Siglent SDM3055 digital multimeter via USB.
         """
         try:
-            voltage = float(self.dmm.query("MEAS:VOLT:DC?"))
-            return voltage
+            return self.meter.read()
         except Exception as e:
             print(f"Error reading from DMM: {e}")
             return None  # Return None if reading fails
 
-    def communicate_with_DMM(self):
+    def settle(self, policy, dac_value, relay=None):
+        """
+        Waits until the DMM voltage is settled (see settling.wait_settled)
+        and records the settle time in self.settle_log.
+        """
+        try:
+            result = wait_settled(self.meter, policy, self.clock)
+        except Exception as e:
+            print(f"Error reading from DMM while settling: {e}")
+            self.clock.sleep(policy.max_wait)
+            return None
+        self.settle_log.append({'DAC Value': dac_value, 'Relay': relay, 'Settle Time [s]': result.elapsed, 'Settled': result.settled})
+        if not result.settled:
+            print(f"Not settled after {result.elapsed:.1f} s")
+        return result
+
+    def communicate_with_DMM(self, policy=None):
         """
-        Polls data from the digital multimeter (DMM), averages over 10 readings,
-        and calculates standard error.
+        Polls data from the digital multimeter (DMM), averages over the readings
+        asked for by policy (self.sample_policy by default), and calculates standard deviation.
         """
-        readings = []
-        for _ in range(10):
-            voltage = self.read_DMM()
-            if voltage is not None:
-                readings.append(voltage)
-            time.sleep(0.5)  # Small delay between readings
+        try:
+            stats = measure(self.meter, self.sample_policy if policy is None else policy)
+        except Exception as e:
+            print(f"Error reading from DMM: {e}")
+            return None, None
         
-        if len(readings) > 0:
-            avg_voltage = np.mean(readings)
-            std_err = np.std(readings) 
-            return avg_voltage, std_err
+        if stats.n > 0:
+            return stats.mean, stats.sdev
         else:
             return None, None
 
        
-    def standardTest(self):
-        step_size = 13 #DAC units for ~100V step
-        low_index = 0
-        upper_index = 256
-        voltage_per_unit = 7.843 # = 2000/255
-        num_relays = 8
-        data = []
-        
-        
-        print(f"Step size = {step_size}, approx 100V step size")
-        for i in range(low_index,upper_index,step_size):
-            print(f"Setting HV to DAC value: {i} ~ {i * voltage_per_unit:.2f} V")
-            
-            write_order(self.serial_file, Order.HV_SET,i)
-            time.sleep(10)
-            
-            bytes_array = bytearray(self.serial_file.read(1))
-            if not bytes_array:
-                print("No HV order received")
+    def prepare(self, plan):
+        print(f"Running plan {plan.name}: {len(plan.dac_values)} HV steps x {len(plan.channels)} channels")
+        # Configured once (auto range by default, as MEAS:VOLT:DC? did before every reading)
+        self.meter.configure_voltage(plan.voltage_range)
+
+    def set_hv(self, dac_value, input_HV):
+        print(f"Setting HV to DAC value: {dac_value} ~ {input_HV:.2f} V")
+        hv_result = self.send_command(Order.HV_SET, dac_value)
+        if hv_result is None:
+            print("No HV order received")
+        else:
+            print(f"Arduino communicating")
+        return hv_result is not None
+
+    def select_relay(self, channel, input_HV):
+        print(f"Activating relay {channel} at {input_HV:.2f} V")
+        relay_result = self.send_command(Order.RELAY, channel - 1)
+        if relay_result is None:
+            print("No RELAY order received")
+            return False
+        print(f"Relay {channel} activated")
+        return True
+
+    def measure(self, step, policy):
+        avg_voltage, std_err = self.communicate_with_DMM(policy)
+        if avg_voltage is not None:
+            print(f" {avg_voltage:.6f} +- {std_err:.6f} V measured across channel {step.channel}")
+            self.record({'DAC Value': step.dac, 'Voltage Step [V]': step.volts, 'Relay': step.channel, 'Measured Voltage [V]': avg_voltage, 'Voltage Error [V]': std_err})
+        else:
+            print(f"Failed to get DMM reading for relay {step.channel}")
+        return avg_voltage, std_err
+
+    def reject(self, channel, reason):
+        print(f"Channel {channel} out of spec ({reason}), skipped for the rest of the test")
+        self.rejected[channel] = reason
+
+    def stream(self, step, samples, chunk, delay):
+        try:
+            for readings in self.meter.stream(samples, chunk=chunk, delay=delay):
+                for voltage in readings:
+                    print(f" {voltage:.6f} V measured across channel {step.channel}")
+                    self.record({'DAC Value': step.dac, 'Voltage Step [V]': step.volts, 'Relay': step.channel, 'Measured Voltage [V]': voltage, 'Voltage Error [V]': 0})
+        except Exception as e:
+            print(f"Error reading from DMM: {e}")
+
+    def pause(self, duration):
+        print(f"Pausing testing for {duration:g} s")
+        self.link.submit(Order.OPEN_RELAYS)
+        self.link.wait_all(timeout=2)
+        self.clock.sleep(duration)
+
+    def stop(self):
+        self.is_running = False
+        if self.journal is not None:
+            self.journal.close()
+        self.serial_file.close()
+
+    def record(self, row):
+        self.data.append(row)
+        if self.journal is not None:
+            self.journal.row(row)
+
+    def checkpoint(self, step):
+        if self.journal is not None:
+            self.journal.done(step.dac, step.channel)
+
+    def finish(self):
+        self.stop()
+
+    def run_plan(self, plan, done=None, journal=None):
+        """
+        Runs a test plan (testplan.TestPlan, a plan file or the name of a built-in plan),
+        skipping the done (DAC, channel) steps. Finished points are appended to the journal file if given.
+        """
+        if isinstance(plan, str):
+            plan = load_plan(plan)
+        if journal and self.journal is None:
+            self.journal = Journal(journal)
+            if not done:
+                self.journal.start(plan.source, {}, None, None)
             else:
-                print(f"Arduino communicating")
-            
-            for relay in range(num_relays):
-                print(f"Activating relay {relay+1} at {i * voltage_per_unit:.2f} V")
-                write_order(self.serial_file, Order.RELAY, relay)
-                time.sleep(5)
-                relay_array = bytearray(self.serial_file.read(1))
-                if not relay_array:
-                    print("No RELAY order received")
-                else:
-                    print(f"Relay {relay +1} activated")
-                    
-                    avg_voltage, std_err = self.communicate_with_DMM()
-                    
-                    if avg_voltage is not None:
-                        print(f" {avg_voltage:.6f} +- {std_err:.6f} V measured across channel {relay+1}")
-                        data.append({'DAC Value': i, 'Voltage Step [V]': i*voltage_per_unit, 'Relay': relay+1, 'Measured Voltage [V]': avg_voltage, 'Voltage Error [V]': std_err})
-                        
-                    else:
-                        print(f"Failed to get DMM reading for relay {relay +1}")
-                    
-                    
-                
-                    time.sleep(5)
-                #response1 = input("Type y to continue to next relay, anything else to quit:  ").strip().lower()
-                #if response1 != 'y':
-                    #print("Stopping test.")
-                    #break
-            
-            #response = input("Type y to continue to next stage, anything else to quit:  ").strip().lower()
-            #if response != 'y':
-                #print("Stopping test.")
-                #break
-            
-            
-        self.serial_file.close()    
+                self.journal.resume()
+        return PlanExecutor(self, plan, done).run()
+
+    def resume(self, path):
+        """
+        Continues the test recorded in the journal at path, skipping the points already measured.
+        """
+        state = JournalState(path)
+        print(f"Resuming plan {state.plan} from {path}: {len(state.done)} points already done")
+        self.data = MeasurementStore.from_rows(state.rows)
+        return self.run_plan(state.plan, state.done, path)
+
+    def standardTest(self):
+        return self.run_plan(CLI_STANDARD_PLAN)
 
 
 if __name__ == "__main__":
-    arduino_port = "/dev/ttyACM0"  # Example port, replace with actual selection
-    dmm_port = "USB0::62700::4609::SDM35HBC800947::0::INSTR"  # Example VISA address
+    arduino_port = os.environ.get("ARDUINO_PORT", "/dev/ttyACM0")  # Example port, replace with actual selection
+    dmm_port = os.environ.get("DMM_RESOURCE", "USB0::62700::4609::SDM35HBC800947::0::INSTR")  # Example VISA address
+
+    parser = argparse.ArgumentParser(description="Run a test plan from the command line")
+    parser.add_argument("--plan", default=CLI_STANDARD_PLAN.name, help="Plan file (JSON / YAML) or built-in plan name")
+    parser.add_argument("--dry-run", action="store_true", default=False, help="Only print the predicted duration of the plan")
+    parser.add_argument("--timings", nargs="*", default=[], help="Timing files of earlier runs the duration is learned from")
+    parser.add_argument("--stand", default=None, help="Only learn from the timing files of this stand")
+    parser.add_argument("--save-timings", default=None, help="Timing file to write after the run")
+    parser.add_argument("--journal", default=None, help="Journal file the finished points are appended to")
+    parser.add_argument("--resume", default=None, help="Journal of an interrupted run to continue")
+    args = parser.parse_args()
+    plan = load_plan(JournalState(args.resume).plan if args.resume else args.plan)
+
+    model = CostModel.fit(load_timings(args.timings, args.stand))
+    print(format_estimate(plan, model.estimate(plan)))
+    if args.dry_run:
+        sys.exit(0)
 
     tester = TestingProcess(arduino_port, dmm_port)
-    tester.standardTest()
+    if args.resume:
+        tester.resume(args.resume)
+    else:
+        tester.run_plan(plan, journal=args.journal)
+    if args.save_timings:
+        save_timings(args.save_timings, tester.timings, args.stand, plan.name)
@@ -0,0 +1,253 @@
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+R_PICKOFF = 1.47e6  # Ohm
+VOLTS_PER_UNIT = 7.843  # HV volts per DAC unit
+
+# One row per (run, channel) fit
+FIT_DTYPE = np.dtype(
+    [
+        ("run", "<i4"),
+        ("channel", "<i2"),
+        ("n", "<i4"),
+        ("slope", "<f8"),  # linear: conductance (S); power law: exponent
+        ("slope_err", "<f8"),
+        ("intercept", "<f8"),  # linear: offset current (A); power law: ln(k), I = k * U**exponent
+        ("intercept_err", "<f8"),
+        ("chi2", "<f8"),  # reduced chi square, nan without errors or with 2 points
+        ("resistance", "<f8"),  # (Ohm) linear fit only, after calibration
+        ("resistance_err", "<f8"),
+    ]
+)
+
+
+def currents(voltage, r_pickoff: float = R_PICKOFF) -> np.ndarray:
+    """
+    :param voltage: (V) measured across the pickoff resistor, negative as read by the DMM
+    :param r_pickoff: (Ohm)
+    :return: (A) current through the component, positive
+    """
+    return -np.asarray(voltage, dtype=float) / r_pickoff
+
+
+def component_voltages(voltage, hv) -> np.ndarray:
+    """
+    :param voltage: (V) measured across the pickoff resistor, negative as read by the DMM
+    :param hv: (V) HV applied to the component and the pickoff resistor in series
+    :return: (V) voltage across the component
+    """
+    return np.asarray(hv, dtype=float) + np.asarray(voltage, dtype=float)
+
+
+def resistances(voltage, hv, error=None, r_pickoff: float = R_PICKOFF) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Resistance of the component at every point, R = (HV - |V|) * R_pickoff / |V|.
+
+    :param voltage: (V) measured across the pickoff resistor, negative as read by the DMM
+    :param hv: (V) applied HV
+    :param error: (V) error on voltage, None for no error
+    :param r_pickoff: (Ohm)
+    :return: (resistance, error) in Ohm, inf where no current flows
+    """
+    voltage = np.asarray(voltage, dtype=float)
+    hv = np.asarray(hv, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        resistance = np.where(voltage < 0, component_voltages(voltage, hv) * r_pickoff / -voltage, np.inf)
+        if error is None:
+            return resistance, None
+        # dR/dV = HV * R_pickoff / V**2
+        resistance_error = np.where(voltage < 0, hv * r_pickoff * np.asarray(error, dtype=float) / voltage**2, np.inf)
+    return resistance, resistance_error
+
+
+def _group_fit(groups: np.ndarray, x: np.ndarray, y: np.ndarray, sigma: Optional[np.ndarray]) -> dict:
+    """
+    Weighted least squares y = intercept + slope * x for every group at once.
+    Without sigma (or where it is 0 everywhere in a group) the points are weighted equally.
+    """
+    keys, index = np.unique(groups, return_inverse=True)
+    n_groups = len(keys)
+    if sigma is None:
+        w = np.ones_like(x)
+    else:
+        with np.errstate(divide="ignore"):
+            w = np.where(sigma > 0, 1 / sigma**2, 0.0)
+        unweighted = np.bincount(index, weights=w, minlength=n_groups) == 0
+        w = np.where(unweighted[index], 1.0, w)
+
+    def total(values):
+        return np.bincount(index, weights=values, minlength=n_groups)
+
+    n = np.bincount(index, minlength=n_groups)
+    s, sx, sy = total(w), total(w * x), total(w * y)
+    sxx, sxy = total(w * x * x), total(w * x * y)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        delta = s * sxx - sx**2
+        slope = (s * sxy - sx * sy) / delta
+        intercept = (sxx * sy - sx * sxy) / delta
+        residuals = y - intercept[index] - slope[index] * x
+        chi2 = total(w * residuals**2) / (n - 2)
+        if sigma is None:
+            scale = chi2
+            chi2 = np.full(n_groups, np.nan)
+        else:
+            scale = np.where(unweighted, chi2, 1.0)
+            chi2 = np.where(unweighted, np.nan, chi2)
+        slope_err = np.sqrt(scale * s / delta)
+        intercept_err = np.sqrt(scale * sxx / delta)
+    return {
+        "keys": keys,
+        "n": n,
+        "slope": slope,
+        "slope_err": slope_err,
+        "intercept": intercept,
+        "intercept_err": intercept_err,
+        "chi2": chi2,
+    }
+
+
+def _points(runs: Sequence[np.ndarray], volts_per_unit: float, r_pickoff: float):
+    # Every point of every run, with its run number
+    run = np.concatenate([np.full(len(array), i, dtype=np.int64) for i, array in enumerate(runs)])
+    channel = np.concatenate([np.asarray(array["Relay"], dtype=np.int64) for array in runs])
+    voltage = np.concatenate([np.asarray(array["Measured Voltage [V]"], dtype=float) for array in runs])
+    error = np.concatenate([np.asarray(array["Voltage Error [V]"], dtype=float) for array in runs])
+    hv = np.concatenate(
+        [
+            np.asarray(array["Voltage Step [V]"], dtype=float)
+            if "Voltage Step [V]" in array.dtype.names
+            else np.asarray(array["DAC Value"], dtype=float) * volts_per_unit
+            for array in runs
+        ]
+    )
+    current = currents(voltage, r_pickoff)
+    current_error = error / r_pickoff
+    u = component_voltages(voltage, hv)
+    # Points without current (open channel, failed reading) cannot be fitted, their channel still counts
+    measured = np.unique(run * 1000 + channel)
+    keep = (current > 0) & (u > 0) & np.isfinite(current_error)
+    return measured, run[keep], channel[keep], u[keep], current[keep], current_error[keep]
+
+
+def fit_runs(
+    runs: Sequence[np.ndarray],
+    kind: str = "resistor",
+    test_infos: Optional[Sequence[dict]] = None,
+    volts_per_unit: float = VOLTS_PER_UNIT,
+    r_pickoff: float = R_PICKOFF,
+) -> np.ndarray:
+    """
+    Fits the I-V curve of every channel of every run in one batched computation.
+
+    Resistors: I = offset + U / R (weighted linear fit, errors from Voltage Error).
+    Varistors: I = k * U**exponent (weighted linear fit of ln I against ln U).
+
+    If a run's test info has a calibration channel (not -1), the resistances of the run
+    are scaled so that channel reads its Calibration Value (GOhm).
+
+    :param runs: structured arrays with at least the fields 'DAC Value' (or 'Voltage Step [V]'),
+        'Relay', 'Measured Voltage [V]' and 'Voltage Error [V]' (e.g. TestingProcess.data.array,
+        columnar.load_columnar)
+    :param kind: "resistor" or "varistor"
+    :param test_infos: test info of each run, for the calibration
+    :param volts_per_unit: HV volts per DAC unit, when the runs have no 'Voltage Step [V]'
+    :param r_pickoff: (Ohm)
+    :return: structured array with FIT_DTYPE, one row per measured (run, channel);
+        channels with fewer than 2 usable points (e.g. open, no current) have NaN fits
+    """
+    measured, run, channel, u, current, current_error = _points(runs, volts_per_unit, r_pickoff)
+    groups = run * 1000 + channel
+    if kind == "resistor":
+        fit = _group_fit(groups, u, current, current_error)
+    elif kind == "varistor":
+        with np.errstate(divide="ignore"):
+            fit = _group_fit(groups, np.log(u), np.log(current), current_error / current)
+    else:
+        raise ValueError(f"Unknown component kind {kind}, expected resistor or varistor")
+
+    # One row per measured channel: the ones without a usable point stay at n = 0 and NaN
+    fits = np.zeros(len(measured), dtype=FIT_DTYPE)
+    fits["run"], fits["channel"] = np.divmod(measured, 1000)
+    for name in ("slope", "slope_err", "intercept", "intercept_err", "chi2"):
+        fits[name] = np.nan
+    rows = np.searchsorted(measured, fit["keys"])
+    for name in ("n", "slope", "slope_err", "intercept", "intercept_err", "chi2"):
+        fits[name][rows] = fit[name]
+    # A single point does not define a line
+    for name in ("slope", "slope_err", "intercept", "intercept_err"):
+        fits[name][fits["n"] < 2] = np.nan
+    if kind == "resistor":
+        with np.errstate(divide="ignore", invalid="ignore"):
+            fits["resistance"] = 1 / fits["slope"]
+            fits["resistance_err"] = fits["slope_err"] / fits["slope"] ** 2
+        if test_infos is not None:
+            calibrate(fits, test_infos)
+    else:
+        fits["resistance"] = np.nan
+        fits["resistance_err"] = np.nan
+    return fits
+
+
+def calibration(test_info: dict) -> Optional[Tuple[int, float]]:
+    """
+    :param test_info: test info ('Calib Channel', -1 for none, and 'Calib Value' in GOhm)
+    :return: (calibration channel, its known resistance in Ohm), None if the run has no calibration
+    """
+    try:
+        channel = int(test_info.get("Calib Channel", -1))
+        value = float(test_info.get("Calib Value", 0)) * 1e9
+    except (TypeError, ValueError):
+        return None
+    if channel < 0 or value <= 0:
+        return None
+    return channel, value
+
+
+def calibrate(fits: np.ndarray, test_infos: Sequence[dict]) -> None:
+    """
+    Scales in place the resistances of every run that has a calibration channel.
+
+    :param fits: result of fit_runs
+    :param test_infos: test info of each run ('Calib Channel', 'Calib Value' in GOhm)
+    """
+    for run, info in enumerate(test_infos):
+        calib = calibration(info)
+        if calib is None:
+            continue
+        channel, value = calib
+        in_run = fits["run"] == run
+        reference = in_run & (fits["channel"] == channel)
+        if not reference.any():
+            continue
+        factor = value / fits["resistance"][reference][0]
+        if not np.isfinite(factor):
+            continue
+        fits["resistance"][in_run] *= factor
+        fits["resistance_err"][in_run] *= factor
+
+
+def knee_voltages(fits: np.ndarray, current: float) -> np.ndarray:
+    """
+    :param fits: varistor fits (fit_runs(..., kind="varistor"))
+    :param current: (A) current defining the knee
+    :return: (V) voltage at which each varistor conducts that current
+    """
+    return np.exp((np.log(current) - fits["intercept"]) / fits["slope"])
+
+
+def fit_run(array: np.ndarray, kind: str = "resistor", test_info: Optional[dict] = None, **kwargs) -> np.ndarray:
+    """
+    fit_runs for a single run.
+    """
+    return fit_runs([array], kind, None if test_info is None else [test_info], **kwargs)
+
+
+def live_values(voltage: float, hv: float, r_pickoff: float = R_PICKOFF) -> Tuple[float, float]:
+    """
+    :param voltage: (V) one DMM reading across the pickoff resistor
+    :param hv: (V) applied HV
+    :return: (current in A, resistance in Ohm) of the component
+    """
+    resistance, _ = resistances(voltage, hv, r_pickoff=r_pickoff)
+    return float(currents(voltage, r_pickoff)), float(resistance)
@@ -16,7 +16,10 @@ enum Order {
   PAUSE_TEST=10,
   DATA_UPDATE=11,
   HV_UPDATED=12,
-  OPEN_RELAYS=13
+  OPEN_RELAYS=13,
+  SEQ=14,
+  ACK=15,
+  NACK=16
 
 };
 
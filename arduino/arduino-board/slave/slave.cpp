@@ -8,6 +8,8 @@
 
 bool is_connected = false;  ///< True if the connection with the master is available
 int8_t motor_speed = 0;
+bool is_sequenced = false;  ///< True if the order being handled was prefixed by SEQ
+uint8_t current_seq = 0;    ///< Sequence number of the order being handled
 
 
 void setup() {
@@ -49,6 +51,14 @@ void loop() {
   if (Serial.available() > 0) {
     // The first byte received is the instruction
     Order order_received = read_order();
+    is_sequenced = false;
+    if (order_received == SEQ) {
+      // SEQ <n> <order>: the acknowledgement of <order> carries <n>
+      current_seq = (uint8_t)read_i8();
+      is_sequenced = true;
+      wait_for_bytes(1, 100);
+      order_received = read_order();
+    }
     Serial.print(">> Arduino: Received order");
     Serial.println((int)order_received);
     Serial.flush();
@@ -80,7 +90,7 @@ void loop() {
           }
         case OPEN_RELAYS:
           {
-            int relay_curent = read_i8();
+            // No parameter: reading one here would swallow the next (pipelined) order
             for (int i=0; i<8; i++){
               digitalWrite(RELAY_CHANNEL[i], LOW);
             }
@@ -125,12 +135,23 @@ void loop() {
 
         // Unknown order
         default:
-          write_order(ERROR);
+          if (is_sequenced) {
+            write_order(NACK);
+            write_i8(current_seq);
+          } else {
+            write_order(ERROR);
+          }
           write_i16(404);
           return;
       }
     }
-    write_order(RECEIVED);  // Confirm the reception
+    // Confirm the reception
+    if (is_sequenced) {
+      write_order(ACK);
+      write_i8(current_seq);
+    } else {
+      write_order(RECEIVED);
+    }
   }
 }
 
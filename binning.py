@@ -0,0 +1,87 @@
+import string
+from typing import List, Sequence
+
+import numpy as np
+
+TARGET_RESISTANCE = 5000e6  # 5000 MΩ
+BIN_PERCENT_STEP = 0.002    # 0.2%
+BIN_RANGE = 0.01            # ±1.0%
+BIN_LABELS = list(string.ascii_uppercase)
+PASS_TOLERANCE = 500e6      # ±500 MΩ, the green light of the GUI
+NO_BIN = "-"                # label of NaN / infinite values (no fit)
+
+
+class BinSpec:
+    """
+    Sorting bins around a target value: one edge every ``step`` (relative) within ±``range``,
+    labelled by distance to the target (A is the target itself, then the closest edges,
+    the one below the target first). A value gets the label of its nearest edge;
+    when two edges are equally close, the earlier label wins. NaN and infinite
+    values get no bin (NO_BIN).
+
+    The edges are computed once; :meth:`assign` labels whole arrays with one searchsorted.
+
+    :param target: value at the center of the bins (e.g. Ohm)
+    :param step: relative distance between two edges
+    :param bin_range: relative half width covered by the edges
+    :param labels: one label per edge, in order of distance to the target
+    """
+
+    def __init__(self, target: float, step: float, bin_range: float, labels: Sequence[str] = BIN_LABELS):
+        range_steps = int(bin_range / step)
+        edges = [target * (1 + i * step) for i in range(-range_steps, range_steps + 1)]
+        if len(edges) > len(labels):
+            raise ValueError(f"{len(edges)} edges but only {len(labels)} labels")
+        self.target = target
+        self.step = step
+        self.bin_range = bin_range
+        # Edges in label order (stable sort: below the target before above)
+        self.edges: List[float] = sorted(edges, key=lambda x: abs(x - target))
+        self.labels = np.array(labels[: len(self.edges)])
+        # Ascending copy for searchsorted, with the label index of each edge
+        self._rank = np.argsort(self.edges, kind="stable")
+        self._ascending = np.asarray(self.edges)[self._rank]
+
+    def label_indices(self, values) -> np.ndarray:
+        """
+        :param values: array-like of values
+        :return: index in self.labels of the bin of each value, -1 for NaN / infinite values
+        """
+        values = np.asarray(values, dtype=float)
+        last = len(self._ascending) - 1
+        upper = np.searchsorted(self._ascending, values)
+        lower = np.clip(upper - 1, 0, last)
+        upper = np.clip(upper, 0, last)
+        lower_rank = self._rank[lower]
+        upper_rank = self._rank[upper]
+        lower_distance = np.abs(values - self._ascending[lower])
+        upper_distance = np.abs(values - self._ascending[upper])
+        tie_rank = np.minimum(lower_rank, upper_rank)
+        ranks = np.where(lower_distance < upper_distance, lower_rank, np.where(upper_distance < lower_distance, upper_rank, tie_rank))
+        return np.where(np.isfinite(values), ranks, -1)
+
+    def assign(self, values) -> np.ndarray:
+        """
+        :param values: array-like of values
+        :return: array of labels, NO_BIN for NaN / infinite values
+        """
+        indices = self.label_indices(values)
+        return np.where(indices >= 0, self.labels[np.maximum(indices, 0)], NO_BIN)
+
+    def label(self, value: float) -> str:
+        return str(self.assign(value))
+
+
+RESISTOR_BINS = BinSpec(TARGET_RESISTANCE, BIN_PERCENT_STEP, BIN_RANGE)
+# Other components get their own BinSpec, e.g. BinSpec(target, step, bin_range) for a varistor spec
+SPECS = {"resistor": RESISTOR_BINS}
+
+
+def passes(values, target: float = TARGET_RESISTANCE, tolerance: float = PASS_TOLERANCE) -> np.ndarray:
+    """
+    :param values: array-like of resistances
+    :return: boolean array, True where the value is within target ± tolerance (NaN fails)
+    """
+    values = np.asarray(values, dtype=float)
+    with np.errstate(invalid="ignore"):
+        return np.abs(values - target) <= tolerance
@@ -0,0 +1,48 @@
+import threading
+import time
+from typing import Optional
+
+
+class RealClock:
+    """
+    Wall clock: time() and sleep() of the time module.
+    """
+
+    def time(self) -> float:
+        return time.time()
+
+    def sleep(self, seconds: float) -> None:
+        if seconds > 0:
+            time.sleep(seconds)
+
+
+class VirtualClock:
+    """
+    Simulated clock: sleep() advances the time instantly instead of waiting.
+
+    Use it with the simulated devices (simulation package) sharing the same clock,
+    so a full procedure runs in the time it takes to execute the code.
+
+    :param start: initial time (s since epoch), the current time if None
+    """
+
+    def __init__(self, start: Optional[float] = None):
+        self.now = time.time() if start is None else start
+        self.start = self.now
+        self.lock = threading.Lock()
+        self.n_sleeps = 0
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        if seconds > 0:
+            with self.lock:
+                self.now += seconds
+                self.n_sleeps += 1
+
+    def elapsed(self) -> float:
+        """
+        :return: virtual seconds since the clock was created
+        """
+        return self.now - self.start
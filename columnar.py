@@ -0,0 +1,72 @@
+import json
+import os
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+
+# One field per column of TestingProcess.data, plus when the point was measured
+RESULT_DTYPE = np.dtype(
+    [
+        ("DAC Value", "<i2"),
+        ("Voltage Step [V]", "<f8"),
+        ("Relay", "<i1"),
+        ("Measured Voltage [V]", "<f8"),
+        ("Voltage Error [V]", "<f8"),
+        ("Timestamp [s]", "<f8"),
+    ]
+)
+
+
+def columnar_paths(file_path: str) -> Tuple[str, str]:
+    """
+    :param file_path: CSV the results are saved to
+    :return: (array file, metadata file) kept next to it
+    """
+    base = os.path.splitext(file_path)[0]
+    return base + ".npy", base + ".meta.json"
+
+
+def to_array(rows: Iterable[dict]) -> np.ndarray:
+    """
+    :param rows: measured points, as in TestingProcess.data
+    :return: structured array with RESULT_DTYPE
+    """
+    rows = list(rows)
+    array = np.zeros(len(rows), dtype=RESULT_DTYPE)
+    for name in RESULT_DTYPE.names:
+        array[name] = [row.get(name, np.nan) for row in rows]
+    return array
+
+
+def save_columnar(file_path: str, array: np.ndarray, metadata: Optional[dict] = None) -> Tuple[str, str]:
+    """
+    Saves results as a NumPy structured array (.npy) and their metadata (test info, plan...) as JSON.
+
+    :param file_path: CSV the results belong to, the files are saved next to it
+    :param array: structured array with RESULT_DTYPE, see to_array
+    :param metadata: JSON serializable information about the test
+    :return: (array file, metadata file)
+    """
+    array_path, metadata_path = columnar_paths(file_path)
+    np.save(array_path, array, allow_pickle=False)
+    metadata = dict(metadata or {})
+    metadata["columns"] = list(RESULT_DTYPE.names)
+    metadata["n_points"] = len(array)
+    with open(metadata_path, "w") as metadata_file:
+        json.dump(metadata, metadata_file, indent=2, default=str)
+    return array_path, metadata_path
+
+
+def load_columnar(path: str, mmap: bool = True) -> Tuple[np.ndarray, dict]:
+    """
+    :param path: .npy file, or the CSV it was saved next to
+    :param mmap: memory map the array instead of reading it
+    :return: (structured array, metadata)
+    """
+    array_path, metadata_path = columnar_paths(path)
+    array = np.load(array_path, mmap_mode="r" if mmap else None, allow_pickle=False)
+    metadata = {}
+    if os.path.exists(metadata_path):
+        with open(metadata_path) as metadata_file:
+            metadata = json.load(metadata_file)
+    return array, metadata
@@ -0,0 +1,175 @@
+import json
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+import numpy as np
+
+from testplan import (
+    ACQUISITION,
+    DWELL,
+    HV_SETTLE_PHASE,
+    PAUSE,
+    PHASES,
+    RELAY_SETTLE_PHASE,
+    SERIAL,
+    SET_HV,
+    STREAM,
+    TestPlan,
+    compile_plan,
+)
+
+
+def save_timings(path: str, timings: List[dict], stand: Optional[str] = None, plan: Optional[str] = None) -> None:
+    """
+    :param path: timing file (JSON) to write
+    :param timings: phase timings recorded by testplan.PlanExecutor
+    :param stand: stand the timings were recorded on
+    :param plan: name of the plan that was run
+    """
+    with open(path, "w") as timing_file:
+        json.dump({"stand": stand, "plan": plan, "timings": timings}, timing_file)
+
+
+def load_timings(paths: Iterable[str], stand: Optional[str] = None) -> List[dict]:
+    """
+    :param paths: timing files written by save_timings
+    :param stand: only keep the files recorded on this stand, all if None
+    :return: phase timings of all the files
+    """
+    timings = []
+    for path in paths:
+        with open(path) as timing_file:
+            content = json.load(timing_file)
+        if stand is None or str(content.get("stand")) == str(stand):
+            timings.extend(content["timings"])
+    return timings
+
+
+class Estimate(NamedTuple):
+    total: float  # (s)
+    phases: Dict[str, float]  # (s) per phase, see testplan.PHASES
+    n_points: int
+    n_pauses: int
+
+
+class CostModel:
+    """
+    Predicts how long a plan takes on a stand.
+
+    Per HV step: a serial round trip and the HV settle; per channel: a serial round trip,
+    the relay settle, the acquisition (overhead + time per reading) and the dwell;
+    plus the pauses, placed like PlanExecutor does.
+
+    The default coefficients are the worst case of a plan (settle caps, maximum sample
+    count); :meth:`fit` learns them from the timings of earlier runs.
+
+    :param serial: (s) per order round trip
+    :param hv_settle: (s) per HV step, the cap of the plan if None
+    :param relay_settle: (s) per channel, the cap of the plan if None
+    :param reading_time: (s) per DMM reading
+    :param acquisition_overhead: (s) per acquisition
+    :param readings: mean readings per measurement, the plan maximum if None
+    """
+
+    def __init__(
+        self,
+        serial: float = 0.05,
+        hv_settle: Optional[float] = None,
+        relay_settle: Optional[float] = None,
+        reading_time: float = 0.2,
+        acquisition_overhead: float = 0.05,
+        readings: Optional[float] = None,
+    ):
+        self.serial = serial
+        self.hv_settle = hv_settle
+        self.relay_settle = relay_settle
+        self.reading_time = reading_time
+        self.acquisition_overhead = acquisition_overhead
+        self.readings = readings
+
+    @classmethod
+    def fit(cls, timings: List[dict]) -> "CostModel":
+        """
+        :param timings: phase timings, see load_timings
+        :return: (CostModel) with the coefficients seen in the timings, defaults for phases never seen
+        """
+        model = cls()
+        durations = {phase: [] for phase in PHASES}
+        acquisitions = []
+        for timing in timings:
+            durations[timing["phase"]].append(timing["duration"])
+            if timing["phase"] == ACQUISITION and timing["readings"] > 0:
+                acquisitions.append((timing["readings"], timing["duration"]))
+        if durations[SERIAL]:
+            model.serial = float(np.mean(durations[SERIAL]))
+        if durations[HV_SETTLE_PHASE]:
+            model.hv_settle = float(np.mean(durations[HV_SETTLE_PHASE]))
+        if durations[RELAY_SETTLE_PHASE]:
+            model.relay_settle = float(np.mean(durations[RELAY_SETTLE_PHASE]))
+        if acquisitions:
+            readings, seconds = np.array(acquisitions, dtype=float).T
+            model.readings = float(readings.mean())
+            if len(np.unique(readings)) > 1:
+                # duration = overhead + readings * reading_time
+                model.reading_time, model.acquisition_overhead = (float(c) for c in np.polyfit(readings, seconds, 1))
+                model.acquisition_overhead = max(model.acquisition_overhead, 0.0)
+            else:
+                model.reading_time = float(seconds.mean() / readings[0])
+                model.acquisition_overhead = 0.0
+        return model
+
+    def _readings(self, plan: TestPlan) -> float:
+        sampling = plan.sampling
+        if sampling.target_sem is None or self.readings is None:
+            return sampling.max_count
+        return min(max(self.readings, sampling.min_count), sampling.max_count)
+
+    def estimate(self, plan: TestPlan) -> Estimate:
+        """
+        :param plan: (TestPlan)
+        :return: (Estimate) predicted duration, per phase
+        """
+        hv_settle = plan.hv_settle.max_wait if self.hv_settle is None else min(self.hv_settle, plan.hv_settle.max_wait)
+        relay_settle = (
+            plan.relay_settle.max_wait if self.relay_settle is None else min(self.relay_settle, plan.relay_settle.max_wait)
+        )
+        if plan.stream is None:
+            acquisition = self.acquisition_overhead + self._readings(plan) * self.reading_time
+            dwell = plan.dwell
+        else:
+            samples = plan.stream["samples"]
+            acquisition = self.acquisition_overhead + samples * (self.reading_time + plan.stream.get("delay", 0))
+            dwell = 0.0
+
+        phases = {phase: 0.0 for phase in PHASES}
+        elapsed = 0.0
+        last_pause = 0.0
+        n_points = n_pauses = 0
+        for step in compile_plan(plan):
+            if step.kind == SET_HV:
+                if plan.pause_every is not None and elapsed - last_pause > plan.pause_every:
+                    phases[PAUSE] += plan.pause_duration
+                    elapsed += plan.pause_duration
+                    last_pause = elapsed
+                    n_pauses += 1
+                costs = {SERIAL: self.serial, HV_SETTLE_PHASE: hv_settle}
+            else:
+                costs = {SERIAL: self.serial, RELAY_SETTLE_PHASE: relay_settle, ACQUISITION: acquisition, DWELL: dwell}
+                n_points += 1 if step.kind != STREAM else plan.stream["samples"]
+            for phase, cost in costs.items():
+                phases[phase] += cost
+                elapsed += cost
+        return Estimate(elapsed, phases, n_points, n_pauses)
+
+
+def format_estimate(plan: TestPlan, estimate: Estimate) -> str:
+    """
+    :return: printable breakdown of an estimate
+    """
+    lines = [f"Plan {plan.name}: {estimate.n_points} points, {estimate.n_pauses} pauses"]
+    for phase in PHASES:
+        seconds = estimate.phases[phase]
+        share = 100 * seconds / estimate.total if estimate.total else 0
+        lines.append(f"  {phase:<13} {seconds:9.1f} s  {share:5.1f} %")
+    hours, rest = divmod(int(round(estimate.total)), 3600)
+    lines.append(f"  {'total':<13} {estimate.total:9.1f} s  ({hours} h {rest // 60:02d} min)")
+    return "\n".join(lines)
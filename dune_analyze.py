@@ -0,0 +1,228 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from analysis import R_PICKOFF, VOLTS_PER_UNIT, fit_run
+from binning import BIN_PERCENT_STEP, BIN_RANGE, PASS_TOLERANCE, TARGET_RESISTANCE, BinSpec, passes
+from results_index import expand_paths, file_hash
+from results_loader import load_results
+
+# Bump when the cached fits change meaning
+CACHE_VERSION = 2
+
+
+def settings_key(volts_per_unit: float = VOLTS_PER_UNIT, r_pickoff: float = R_PICKOFF) -> str:
+    """
+    :return: short hash of everything the cached fits depend on besides the file content
+    """
+    settings = json.dumps([CACHE_VERSION, volts_per_unit, r_pickoff])
+    return hashlib.sha1(settings.encode()).hexdigest()[:12]
+
+
+def cache_paths(cache_dir: str, sha1: str, key: str) -> Tuple[str, str]:
+    """
+    :return: (fits file, test info file) of a results file content
+    """
+    base = os.path.join(cache_dir, f"{sha1}-{key}")
+    return base + ".npy", base + ".json"
+
+
+def analyze_file(path: str, cache_dir: Optional[str], volts_per_unit: float = VOLTS_PER_UNIT, r_pickoff: float = R_PICKOFF):
+    """
+    Fits every channel of a results file, or reads the fits cached for the same content.
+    Runs in the worker processes.
+
+    :param path: results CSV
+    :param cache_dir: folder of the cached fits, None for no cache
+    :return: (path, test info, fits with FIT_DTYPE, True if read from the cache), or (path, exception)
+    """
+    try:
+        if cache_dir is not None:
+            fits_path, info_path = cache_paths(cache_dir, file_hash(path), settings_key(volts_per_unit, r_pickoff))
+            if os.path.exists(fits_path) and os.path.exists(info_path):
+                with open(info_path) as info_file:
+                    test_info = json.load(info_file)
+                return path, test_info, np.load(fits_path, allow_pickle=False), True
+        test_info, array = load_results(path)
+        fits = fit_run(array, test_info=test_info, volts_per_unit=volts_per_unit, r_pickoff=r_pickoff)
+        if cache_dir is not None:
+            # Written under a temporary name first: another run may read the cache at the same time
+            np.save(fits_path + ".tmp.npy", fits, allow_pickle=False)
+            os.replace(fits_path + ".tmp.npy", fits_path)
+            with open(info_path + ".tmp", "w") as info_file:
+                json.dump(test_info, info_file)
+            os.replace(info_path + ".tmp", info_path)
+        return path, test_info, fits, False
+    except (OSError, ValueError, IndexError) as e:
+        return path, e
+
+
+def analyze(
+    paths: Iterable[str],
+    cache_dir: Optional[str] = None,
+    workers: Optional[int] = None,
+    volts_per_unit: float = VOLTS_PER_UNIT,
+    r_pickoff: float = R_PICKOFF,
+    progress: bool = True,
+) -> List[tuple]:
+    """
+    Fits every results file, spread over a process pool.
+
+    :param paths: results CSV files, glob patterns and folders
+    :param cache_dir: folder of the cached fits (created), None for no cache
+    :param workers: worker processes, os.cpu_count() if None
+    :param progress: print the progress
+    :return: (path, test info, fits) of every file that could be read, in path order
+    """
+    files = expand_paths(paths)
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(files)))
+    runs = []
+    n_cached = n_failed = 0
+    report_every = max(1, len(files) // 100)
+    with ProcessPoolExecutor(workers) as executor:
+        results = executor.map(
+            analyze_file,
+            files,
+            [cache_dir] * len(files),
+            [volts_per_unit] * len(files),
+            [r_pickoff] * len(files),
+            chunksize=max(1, len(files) // (16 * workers)),
+        )
+        for done, result in enumerate(results, 1):
+            if len(result) == 2:
+                print(f"\nSkipping {result[0]}: {result[1]}")
+                n_failed += 1
+            else:
+                path, test_info, fits, cached = result
+                runs.append((path, test_info, fits))
+                n_cached += cached
+            if progress and (done % report_every == 0 or done == len(files)):
+                print(f"\r{done}/{len(files)} files, {n_cached} cached, {n_failed} failed", end="", flush=True)
+    if progress:
+        print()
+    return runs
+
+
+def summarize(runs: List[tuple], spec: BinSpec, tolerance: float = PASS_TOLERANCE) -> Tuple[List[dict], List[dict]]:
+    """
+    Bins and pass/fail of every channel, from the fits. Cheap: done again on every call,
+    so changing the bin spec or the tolerance needs no new fit.
+
+    :param runs: result of analyze
+    :param spec: bins of the resistances
+    :param tolerance: (Ohm) a channel passes within spec.target ± tolerance
+    :return: (one row per run, one row per channel of every run)
+    """
+    if not runs:
+        return [], []
+    fits = np.concatenate([fits for _, _, fits in runs])
+    run_index = np.repeat(np.arange(len(runs)), [len(fits) for _, _, fits in runs])
+    labels = spec.assign(fits["resistance"])
+    passed = passes(fits["resistance"], spec.target, tolerance)
+    n_passed = np.bincount(run_index, weights=passed, minlength=len(runs)).astype(int)
+    # Every measured channel counts, the unfitted ones (NaN, e.g. open) fail
+    n_channels = np.bincount(run_index, minlength=len(runs))
+    n_fitted = np.bincount(run_index, weights=np.isfinite(fits["resistance"]), minlength=len(runs)).astype(int)
+
+    summary = []
+    for i, (path, test_info, _) in enumerate(runs):
+        summary.append(
+            {
+                "Stand Number": test_info.get("Stand Number", ""),
+                "Dunk Board": test_info.get("Dunk Board", ""),
+                "Timestamp": test_info.get("Timestamp", ""),
+                "Tester Name": test_info.get("Tester Name", ""),
+                "Channels": int(n_channels[i]),
+                "Fitted": int(n_fitted[i]),
+                "Passed": int(n_passed[i]),
+                "Result": "PASS" if n_channels[i] and n_fitted[i] == n_channels[i] and n_passed[i] == n_channels[i] else "FAIL",
+                "File": path,
+            }
+        )
+    channels = []
+    for fit, run, label, ok in zip(fits, run_index, labels, passed):
+        test_info = runs[run][1]
+        channels.append(
+            {
+                "Dunk Board": test_info.get("Dunk Board", ""),
+                "Stand Number": test_info.get("Stand Number", ""),
+                "Timestamp": test_info.get("Timestamp", ""),
+                "Channel": int(fit["channel"]),
+                "Points": int(fit["n"]),
+                "Resistance [MOhm]": f"{fit['resistance'] / 1e6:.3f}",
+                "Resistance Error [MOhm]": f"{fit['resistance_err'] / 1e6:.3f}",
+                "Reduced Chi2": f"{fit['chi2']:.3g}",
+                "Bin": str(label),
+                "Result": "PASS" if ok else "FAIL",
+            }
+        )
+    return summary, channels
+
+
+def _write_csv(path: str, rows: List[dict]) -> None:
+    with open(path, "w", newline="") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def write_reports(out_dir: str, summary: List[dict], channels: List[dict]) -> None:
+    """
+    Writes summary.csv (one row per run), channels.csv (every channel) and boards/<board>.csv.
+    """
+    if not summary:
+        return
+    os.makedirs(os.path.join(out_dir, "boards"), exist_ok=True)
+    _write_csv(os.path.join(out_dir, "summary.csv"), summary)
+    if not channels:
+        return
+    _write_csv(os.path.join(out_dir, "channels.csv"), channels)
+    boards = {}
+    for row in channels:
+        boards.setdefault(row["Dunk Board"], []).append(row)
+    for board, rows in boards.items():
+        name = "".join(c if c.isalnum() or c in "-_." else "_" for c in board) or "unknown"
+        _write_csv(os.path.join(out_dir, "boards", f"{name}.csv"), rows)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Fit, bin and pass/fail every board of past WM_Comp_test runs")
+    parser.add_argument("paths", nargs="+", help="Results files, folders or glob patterns")
+    parser.add_argument("--out", default="analysis", help="Folder of the summary and per-board tables")
+    parser.add_argument("--cache", default=None, help="Folder of the cached fits (default: <out>/cache)")
+    parser.add_argument("--no-cache", action="store_true", default=False, help="Fit every file again")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per core)")
+    parser.add_argument("--target", type=float, default=TARGET_RESISTANCE / 1e6, help="Target resistance (MOhm)")
+    parser.add_argument("--step", type=float, default=BIN_PERCENT_STEP, help="Relative bin step")
+    parser.add_argument("--range", type=float, default=BIN_RANGE, help="Relative half width of the bins")
+    parser.add_argument("--tolerance", type=float, default=PASS_TOLERANCE / 1e6, help="Pass tolerance (MOhm)")
+    parser.add_argument("--volts-per-unit", type=float, default=VOLTS_PER_UNIT, help="HV volts per DAC unit")
+    parser.add_argument("--quiet", action="store_true", default=False, help="No progress output")
+    args = parser.parse_args(argv)
+
+    spec = BinSpec(args.target * 1e6, args.step, args.range)
+    cache_dir = None if args.no_cache else args.cache or os.path.join(args.out, "cache")
+    runs = analyze(args.paths, cache_dir, args.workers, args.volts_per_unit, progress=not args.quiet)
+    summary, channels = summarize(runs, spec, args.tolerance * 1e6)
+    write_reports(args.out, summary, channels)
+
+    failed = [row for row in summary if row["Result"] == "FAIL"]
+    print(f"{len(summary)} runs, {len(summary) - len(failed)} passed, {len(failed)} failed")
+    for row in failed:
+        print(f"  FAIL {row['Dunk Board']} (stand {row['Stand Number']}, {row['Timestamp']}): {row['Passed']}/{row['Channels']} channels in spec")
+    if summary:
+        print(f"Tables written to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -12,6 +12,8 @@ from PyQt5.QtWidgets import (
 from PyQt5.QtCore import QTimer, QThread, pyqtSignal, Qt
 from PyQt5.QtGui import QPixmap, QPainter
 from TestProc01 import TestingProcess
+from analysis import live_values
+from binning import PASS_TOLERANCE, TARGET_RESISTANCE
 from pyqtgraph.exporters import ImageExporter
 from PreTestPopup import TestDialog
 
@@ -125,10 +127,13 @@ class MainWindow(QWidget):
         button_layout = QHBoxLayout()
         self.start_button = QPushButton("Start Test")
         self.stop_button = QPushButton("Stop Test")
+        self.resume_button = QPushButton("Resume Test")
         self.start_button.clicked.connect(self.start_test)
         self.stop_button.clicked.connect(self.stop_test)
+        self.resume_button.clicked.connect(self.resume_test)
         button_layout.addWidget(self.start_button)
         button_layout.addWidget(self.stop_button)
+        button_layout.addWidget(self.resume_button)
         main_layout.addLayout(button_layout)
 
         # File Selection
@@ -148,12 +153,18 @@ class MainWindow(QWidget):
 
     def refresh_ports(self):
         serial_ports = [port.device for port in serial.tools.list_ports.comports()]
+        # Ports that are not listed (e.g. the pty of the emulated Arduino, simulation/arduino.py)
+        if os.environ.get("ARDUINO_PORT"):
+            serial_ports.append(os.environ["ARDUINO_PORT"])
         self.arduino_port_dropdown.clear()
         if serial_ports:
             self.arduino_port_dropdown.addItems(serial_ports)
             
         rm = pyvisa.ResourceManager('@py')
-        visa_resources = rm.list_resources()
+        visa_resources = list(rm.list_resources())
+        # Resources that cannot be discovered (e.g. the simulated DMM of simulation/dmm.py)
+        if os.environ.get("DMM_RESOURCE"):
+            visa_resources.append(os.environ["DMM_RESOURCE"])
         self.dmm_port_dropdown.clear()
         if visa_resources:
             self.dmm_port_dropdown.addItems(visa_resources)
@@ -195,11 +206,33 @@ class MainWindow(QWidget):
         folder_path = self.file_path_display.toPlainText().strip()
         self.testing_process.build_csv_path(folder_path)
         
+        self.run_testing_process(self.testing_process.standardTest)
+        #self.run_testing_process(self.testing_process.relayTest)
+
+    def resume_test(self):
+        """Continues an interrupted test from its journal (saved next to its CSV)."""
+        journal, _ = QFileDialog.getOpenFileName(self, "Select the journal of the test to resume", self.file_path_display.toPlainText().strip(), "Journals (*.journal)")
+        if not journal:
+            return
+
+        arduino_port = self.arduino_port_dropdown.currentText()
+        dmm_port = self.dmm_port_dropdown.currentText()
+        if not arduino_port or not dmm_port:
+            QMessageBox.warning(self, "Error", "Please select both Arduino and DMM ports before starting.")
+            return
+
+        self.is_testing = True
+        self.plot_data = []
+        self.testing_process = TestingProcess(arduino_port, dmm_port)
+        self.testing_process.resume_journal = journal
+        self.run_testing_process(self.testing_process.resumeTest)
+
+    def run_testing_process(self, test):
+        """Runs test (a method of self.testing_process) in its own thread."""
         self.testing_thread = QThread()
         self.testing_process.moveToThread(self.testing_thread)
 
-        self.testing_thread.started.connect(self.testing_process.standardTest)
-        #self.testing_thread.started.connect(self.testing_process.relayTest)
+        self.testing_thread.started.connect(test)
         self.testing_process.relay_updated.connect(self.relay_tab.update_relay_status)
         self.testing_process.voltage_measured.connect(self.update_voltage_plot)
         self.testing_process.voltage_measured.connect(self.update_live_display)
@@ -217,7 +250,8 @@ class MainWindow(QWidget):
         print("Stopping test")
         self.is_testing = False
         if self.testing_process:
-            self.testing_process.stop()
+            # The worker thread stops the stand itself, the Arduino link is not thread safe
+            self.testing_process.request_stop()
 
     def on_test_complete(self):
         """Automatically called when testing finishes."""
@@ -235,12 +269,10 @@ class MainWindow(QWidget):
 
 
     def update_live_display(self,avg_voltage, std_err, input_HV):
-        R_pickoff = 1470000  #1.47 Mohms pickoff
-        
-        current = avg_voltage/R_pickoff
-        resistance = (input_HV - avg_voltage)/current if current != 0 else float('inf')
+        # 1.47 Mohms pickoff, see analysis.py
+        current, resistance = live_values(avg_voltage, input_HV)
         
-        resistance_M = -resistance/1e6
+        resistance_M = resistance/1e6
         current_nA = current *1e9
         
         #update displays
@@ -249,8 +281,8 @@ class MainWindow(QWidget):
         self.resistance_display.setText(f"Resistance: {resistance_M:.2f} Mohms")
         
         # Light logic
-        target = 5000 #Mohms
-        sigma = 500 #Mohms
+        target = TARGET_RESISTANCE/1e6 #Mohms
+        sigma = PASS_TOLERANCE/1e6 #Mohms
         deviation = abs(resistance_M - target)
         
         if deviation <= sigma:
@@ -0,0 +1,102 @@
+import json
+import os
+from typing import List, Optional, Set, Tuple
+
+
+def journal_path(file_path: str) -> str:
+    """
+    :param file_path: CSV the results are saved to
+    :return: journal kept next to it
+    """
+    return os.path.splitext(file_path)[0] + ".journal"
+
+
+class Journal:
+    """
+    Append-only record of a running test, one JSON object per line, written to disk
+    (flush + fsync) as each point finishes, so a crash loses at most the point in progress.
+
+    The first line describes the test (plan, test info, CSV path), then every
+    measured row is followed by a "done" line once its (DAC, channel) step is complete.
+    A resumed test first writes a "resume" line: the rows of the step the crash
+    interrupted (not followed by their "done") are dropped there, the step is measured again.
+
+    :param path: journal file, appended to if it exists
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, "a")
+
+    def _write(self, entry: dict) -> None:
+        self.file.write(json.dumps(entry) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def start(self, plan: str, test_info: dict, file_path: Optional[str], timestamp: Optional[int]) -> None:
+        self._write({"type": "start", "plan": plan, "test_info": test_info, "file_path": file_path, "timestamp": timestamp})
+
+    def row(self, row: dict) -> None:
+        self._write({"type": "row", "row": row})
+
+    def done(self, dac: int, channel: int) -> None:
+        self._write({"type": "done", "dac": dac, "channel": channel})
+
+    def resume(self) -> None:
+        self._write({"type": "resume"})
+
+    def close(self) -> None:
+        if not self.file.closed:
+            self.file.close()
+
+
+class JournalState:
+    """
+    What a journal says about an interrupted test.
+
+    :param path: journal file
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.header: dict = {}
+        self.done: Set[Tuple[int, int]] = set()
+        pending: List[dict] = []
+        rows: List[dict] = []
+        with open(path) as journal_file:
+            for line in journal_file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Line cut by the crash
+                    continue
+                if entry["type"] == "start":
+                    if not self.header:
+                        self.header = entry
+                elif entry["type"] == "row":
+                    pending.append(entry["row"])
+                elif entry["type"] == "done":
+                    self.done.add((entry["dac"], entry["channel"]))
+                    rows += pending
+                    pending = []
+                elif entry["type"] == "resume":
+                    # Rows of the interrupted step, measured again after this line
+                    pending = []
+        # Rows of a step that did not finish are measured again
+        self.rows = rows
+
+    @property
+    def plan(self) -> Optional[str]:
+        return self.header.get("plan")
+
+    @property
+    def test_info(self) -> dict:
+        return self.header.get("test_info") or {}
+
+    @property
+    def file_path(self) -> Optional[str]:
+        return self.header.get("file_path")
+
+    @property
+    def timestamp(self) -> Optional[int]:
+        return self.header.get("timestamp")
@@ -0,0 +1,160 @@
+import argparse
+import csv
+import os
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from binning import BIN_PERCENT_STEP, TARGET_RESISTANCE
+
+# Default matching tolerance: one bin step around the target, 10 MΩ
+MATCH_TOLERANCE = TARGET_RESISTANCE * BIN_PERCENT_STEP
+
+
+def match(values, k: int, tolerance: float = MATCH_TOLERANCE, labels: Optional[Sequence] = None) -> np.ndarray:
+    """
+    Groups parts into sets of k whose resistances match: the spread (max - min) of every
+    set is at most tolerance. As many sets as possible are made, then the total spread is
+    the smallest possible.
+
+    The parts are sorted once; in sorted order the best sets are runs of k neighbours,
+    so a dynamic program over the sorted values (one pass, O(n log n) overall) finds them.
+
+    :param values: resistance of every part (NaN parts are never matched)
+    :param k: parts per set
+    :param tolerance: largest spread of a set, same unit as values
+    :param labels: optional label of every part (e.g. its bin); a set only holds parts of one label
+    :return: set number of every part, -1 for the unmatched ones; sets are numbered by increasing value
+    """
+    if k < 1:
+        raise ValueError(f"Set size must be at least 1, got {k}")
+    values = np.asarray(values, dtype=float)
+    groups = np.full(len(values), -1, dtype=np.int64)
+    finite = np.flatnonzero(np.isfinite(values))
+    if labels is None:
+        order = finite[np.argsort(values[finite], kind="stable")]
+    else:
+        labels = np.asarray(labels)
+        order = finite[np.lexsort((values[finite], labels[finite]))]
+    n = len(order)
+    if n < k:
+        return groups
+
+    ordered = values[order]
+    # Window j holds the sorted parts j .. j + k - 1
+    spread = ordered[k - 1 :] - ordered[: n - k + 1]
+    valid = spread <= tolerance
+    if labels is not None:
+        ordered_labels = labels[order]
+        valid &= ordered_labels[k - 1 :] == ordered_labels[: n - k + 1]
+
+    # count[i], total[i]: most sets and their smallest total spread among the first i sorted parts
+    spread = spread.tolist()
+    valid = valid.tolist()
+    count = [0] * (n + 1)
+    total = [0.0] * (n + 1)
+    take = [False] * (n + 1)
+    for i in range(1, n + 1):
+        count[i], total[i] = count[i - 1], total[i - 1]
+        j = i - k
+        if j >= 0 and valid[j]:
+            c, t = count[j] + 1, total[j] + spread[j]
+            if c > count[i] or (c == count[i] and t < total[i]):
+                count[i], total[i], take[i] = c, t, True
+
+    i = n
+    group = count[n]
+    while i > 0:
+        if take[i]:
+            group -= 1
+            groups[order[i - k : i]] = group
+            i -= k
+        else:
+            i -= 1
+    return groups
+
+
+def load_inventory(path: str, include_failed: bool = False) -> Dict[str, np.ndarray]:
+    """
+    Reads the channels.csv written by dune_analyze.py; only the latest run of each board is kept.
+
+    :param path: channels.csv
+    :param include_failed: also keep the channels that failed
+    :return: dict of arrays 'board', 'channel', 'resistance' (Ohm), 'bin'
+    """
+    latest = {}
+    with open(path, newline="") as csvfile:
+        for row in csv.DictReader(csvfile):
+            board = row["Dunk Board"]
+            timestamp = int(float(row["Timestamp"] or 0))
+            if board not in latest or timestamp > latest[board][0]:
+                latest[board] = (timestamp, [])
+            if timestamp == latest[board][0] and (include_failed or row["Result"] == "PASS"):
+                latest[board][1].append(row)
+    rows = [row for _, board_rows in latest.values() for row in board_rows]
+    return {
+        "board": np.array([row["Dunk Board"] for row in rows], dtype=str),
+        "channel": np.array([int(row["Channel"]) for row in rows], dtype=np.int64),
+        "resistance": np.array([float(row["Resistance [MOhm]"]) * 1e6 for row in rows]),
+        "bin": np.array([row["Bin"] for row in rows], dtype=str),
+    }
+
+
+def pick_lists(inventory: Dict[str, np.ndarray], groups: np.ndarray) -> Dict[str, List[dict]]:
+    """
+    :param inventory: see load_inventory
+    :param groups: result of match
+    :return: {board: rows (channel, resistance, set, set spread)}, for the matched channels of each board
+    """
+    matched = groups >= 0
+    n_groups = int(groups.max()) + 1 if matched.any() else 0
+    resistance = inventory["resistance"]
+    low = np.full(n_groups, np.inf)
+    high = np.full(n_groups, -np.inf)
+    np.minimum.at(low, groups[matched], resistance[matched])
+    np.maximum.at(high, groups[matched], resistance[matched])
+    lists = {}
+    for i in np.flatnonzero(matched)[np.lexsort((inventory["channel"][matched], inventory["board"][matched]))]:
+        group = int(groups[i])
+        lists.setdefault(str(inventory["board"][i]), []).append(
+            {
+                "Channel": int(inventory["channel"][i]),
+                "Resistance [MOhm]": f"{resistance[i] / 1e6:.3f}",
+                "Bin": str(inventory["bin"][i]),
+                "Set": group,
+                "Set Spread [MOhm]": f"{(high[group] - low[group]) / 1e6:.3f}",
+            }
+        )
+    return lists
+
+
+def write_pick_lists(out_dir: str, lists: Dict[str, List[dict]]) -> None:
+    """
+    Writes <board>.csv for every board with matched channels.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    for board, rows in lists.items():
+        name = "".join(c if c.isalnum() or c in "-_." else "_" for c in board) or "unknown"
+        with open(os.path.join(out_dir, f"{name}.csv"), "w", newline="") as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Group fitted resistors into matched sets and write pick lists per dunk board")
+    parser.add_argument("channels", help="channels.csv written by dune_analyze.py")
+    parser.add_argument("-k", type=int, default=2, help="Resistors per set")
+    parser.add_argument("--tolerance", type=float, default=MATCH_TOLERANCE / 1e6, help="Largest spread of a set (MOhm)")
+    parser.add_argument("--same-bin", action="store_true", default=False, help="Only match resistors of the same bin")
+    parser.add_argument("--include-failed", action="store_true", default=False, help="Also match channels out of spec")
+    parser.add_argument("--out", default="picklists", help="Folder of the pick lists")
+    args = parser.parse_args()
+
+    inventory = load_inventory(args.channels, args.include_failed)
+    groups = match(inventory["resistance"], args.k, args.tolerance * 1e6, inventory["bin"] if args.same_bin else None)
+    lists = pick_lists(inventory, groups)
+    write_pick_lists(args.out, lists)
+    n_sets = int(groups.max()) + 1 if len(groups) else 0
+    print(f"{len(groups)} resistors, {n_sets} sets of {args.k}, {int((groups < 0).sum())} unmatched")
+    print(f"Pick lists for {len(lists)} boards written to {args.out}")
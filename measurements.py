@@ -0,0 +1,106 @@
+from typing import Iterable, Iterator, Union
+
+import numpy as np
+
+from columnar import RESULT_DTYPE
+
+
+class MeasurementRecord:
+    """
+    View of one point of a MeasurementStore, read like the dicts TestingProcess.data used to hold:
+    ``record['Measured Voltage [V]']``.
+    """
+
+    __slots__ = ("store", "index")
+
+    def __init__(self, store: "MeasurementStore", index: int):
+        self.store = store
+        self.index = index
+
+    def __getitem__(self, key: str):
+        return self.store.buffer[key][self.index].item()
+
+    def get(self, key: str, default=None):
+        return self[key] if key in RESULT_DTYPE.names else default
+
+    def keys(self):
+        return RESULT_DTYPE.names
+
+    def to_dict(self) -> dict:
+        return {name: self[name] for name in RESULT_DTYPE.names}
+
+    def __repr__(self) -> str:
+        return f"MeasurementRecord({self.to_dict()})"
+
+
+class MeasurementStore:
+    """
+    Measured points of a test, one NumPy column per field of columnar.RESULT_DTYPE
+    (about 35 bytes per point), preallocated and doubled when full.
+
+    Appended to like a list of dicts; ``store[i]`` is a MeasurementRecord,
+    ``store.column(name)`` and ``store.array`` are views on the filled part (no copy).
+
+    :param capacity: points preallocated
+    """
+
+    def __init__(self, capacity: int = 256):
+        self.buffer = np.zeros(max(capacity, 1), dtype=RESULT_DTYPE)
+        self.n = 0
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[dict]) -> "MeasurementStore":
+        store = cls()
+        store.extend(rows)
+        return store
+
+    def append(self, row: dict) -> None:
+        """
+        :param row: point with (some of) the RESULT_DTYPE fields as keys, missing fields are 0
+        """
+        if self.n == len(self.buffer):
+            self.buffer = np.resize(self.buffer, 2 * len(self.buffer))
+            self.buffer[self.n :] = 0
+        point = self.buffer[self.n]
+        for name in RESULT_DTYPE.names:
+            if name in row:
+                point[name] = row[name]
+        self.n += 1
+
+    def extend(self, rows: Iterable[dict]) -> None:
+        for row in rows:
+            self.append(row)
+
+    def clear(self) -> None:
+        self.n = 0
+        self.buffer[:] = 0
+
+    @property
+    def array(self) -> np.ndarray:
+        """
+        Structured array of the points measured so far (a view, valid until the next append).
+        """
+        return self.buffer[: self.n]
+
+    def column(self, name: str) -> np.ndarray:
+        """
+        :param name: field of RESULT_DTYPE, e.g. 'Measured Voltage [V]'
+        :return: view of that column for the points measured so far
+        """
+        return self.buffer[name][: self.n]
+
+    def __len__(self) -> int:
+        return self.n
+
+    def __getitem__(self, index: Union[int, slice]):
+        if isinstance(index, slice):
+            return self.array[index]
+        if index < 0:
+            index += self.n
+        if not 0 <= index < self.n:
+            raise IndexError("measurement index out of range")
+        return MeasurementRecord(self, index)
+
+    def __iter__(self) -> Iterator[MeasurementRecord]:
+        for index in range(self.n):
+            yield MeasurementRecord(self, index)
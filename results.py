@@ -0,0 +1,88 @@
+import csv
+import time
+from typing import Iterable, List
+
+
+def header_rows(test_info: dict, timestamp) -> List[list]:
+    """
+    :return: the three header rows of a WM_Comp_test_*.csv file
+    """
+    return [
+        ["ID:", f"{test_info['Stand Number']}_{test_info['Dunk Board']}_{timestamp}", "User:", test_info['Tester Name']],
+        ["Calibration Channel (-1 if not calib):", test_info['Calib Channel'], "Calibration Value (GOhm):", test_info['Calib Value']],
+        ['HV Index', 'CHANNEL', 'Voltage', 'Error'],
+    ]
+
+
+def result_row(row: dict) -> list:
+    """
+    :param row: measured point, as in TestingProcess.data
+    :return: the CSV row
+    """
+    return [row['DAC Value'], row['Relay'], row['Measured Voltage [V]'], row['Voltage Error [V]']]
+
+
+class ResultsWriter:
+    """
+    Writes a WM_Comp_test_*.csv file as the test goes: the header when opened,
+    then one row per measured point.
+
+    :param path: CSV file, overwritten
+    :param test_info: test information from the pre-test popup
+    :param timestamp: start of the test (s since epoch), part of the ID
+    :param flush_interval: (s) rows are flushed to disk at most this often, 0 for every row
+    """
+
+    def __init__(self, path: str, test_info: dict, timestamp, flush_interval: float = 0):
+        self.path = path
+        self.flush_interval = flush_interval
+        rows = header_rows(test_info, timestamp)
+        self.file = open(path, 'w', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerows(rows)
+        self.file.flush()
+        self.last_flush = time.monotonic()
+        self.n_rows = 0
+
+    @property
+    def closed(self) -> bool:
+        return self.file.closed
+
+    def write_row(self, row: dict) -> None:
+        if self.closed:
+            return
+        self.writer.writerow(result_row(row))
+        self.n_rows += 1
+        if time.monotonic() - self.last_flush >= self.flush_interval:
+            self.file.flush()
+            self.last_flush = time.monotonic()
+
+    def write_rows(self, rows: Iterable[dict]) -> None:
+        for row in rows:
+            self.write_row(row)
+
+    def close(self) -> None:
+        if not self.closed:
+            self.file.close()
+
+
+def write_results_csv(path: str, test_info: dict, timestamp, rows: Iterable[dict]) -> None:
+    """
+    Writes a whole WM_Comp_test_*.csv file at once.
+    """
+    writer = ResultsWriter(path, test_info, timestamp, flush_interval=float("inf"))
+    try:
+        writer.write_rows(rows)
+    finally:
+        writer.close()
+
+
+def parse_id(run_id: str) -> dict:
+    """
+    :param run_id: "<stand>_<board>_<timestamp>" from the ID row
+    :return: dict with 'Stand Number', 'Dunk Board' and 'Timestamp'
+    """
+    stand, _, rest = run_id.partition('_')
+    board, _, timestamp = rest.rpartition('_')
+    return {'Stand Number': stand, 'Dunk Board': board, 'Timestamp': timestamp}
+
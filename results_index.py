@@ -0,0 +1,259 @@
+import argparse
+import glob
+import hashlib
+import os
+import sqlite3
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+from analysis import VOLTS_PER_UNIT, fit_run, resistances
+from binning import RESISTOR_BINS, passes
+from results_loader import load_results
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    sha1 TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE REFERENCES files(path) ON DELETE CASCADE,
+    stand TEXT,
+    board TEXT,
+    timestamp INTEGER,
+    user TEXT,
+    calib_channel INTEGER,
+    calib_value REAL
+);
+CREATE TABLE IF NOT EXISTS points (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    dac INTEGER NOT NULL,
+    channel INTEGER NOT NULL,
+    voltage REAL NOT NULL,
+    error REAL NOT NULL,
+    resistance REAL
+);
+CREATE TABLE IF NOT EXISTS channels (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    channel INTEGER NOT NULL,
+    n INTEGER,
+    resistance REAL,
+    resistance_err REAL,
+    bin TEXT,
+    passed INTEGER,
+    PRIMARY KEY (run_id, channel)
+);
+CREATE INDEX IF NOT EXISTS runs_board ON runs(board);
+CREATE INDEX IF NOT EXISTS runs_stand ON runs(stand);
+CREATE INDEX IF NOT EXISTS runs_timestamp ON runs(timestamp);
+CREATE INDEX IF NOT EXISTS points_run ON points(run_id, channel);
+CREATE INDEX IF NOT EXISTS channels_bin ON channels(bin);
+"""
+
+
+def _to_int(value, default=None):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return default
+
+
+def _to_float(value, default=None):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def file_hash(path: str) -> str:
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as results_file:
+        for block in iter(lambda: results_file.read(1 << 20), b""):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+class ResultsIndex:
+    """
+    SQLite index of WM_Comp_test_*.csv results: runs (test info), points (with their
+    resistance) and channels (fitted resistance, bin and pass, NULL resistance and bin
+    when the channel could not be fitted), for queries across lots.
+
+    Files are only parsed again when their modification time or size changed,
+    and only re-ingested when their content (SHA-1) changed.
+
+    :param path: database file, created if needed
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self) -> "ResultsIndex":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def needs_update(self, path: str) -> bool:
+        stat = os.stat(path)
+        row = self.connection.execute("SELECT mtime, size FROM files WHERE path = ?", (path,)).fetchone()
+        return row is None or row[0] != stat.st_mtime or row[1] != stat.st_size
+
+    def ingest_file(self, path: str) -> bool:
+        """
+        :param path: results CSV
+        :return: True if the file was (re)loaded, False if it was already up to date
+        """
+        path = os.path.abspath(path)
+        if not self.needs_update(path):
+            return False
+        stat = os.stat(path)
+        sha1 = file_hash(path)
+        row = self.connection.execute("SELECT sha1 FROM files WHERE path = ?", (path,)).fetchone()
+        with self.connection:
+            if row is not None and row[0] == sha1:
+                # Touched but not changed
+                self.connection.execute("UPDATE files SET mtime = ?, size = ? WHERE path = ?", (stat.st_mtime, stat.st_size, path))
+                return False
+            test_info, array = load_results(path)
+            self.connection.execute("DELETE FROM files WHERE path = ?", (path,))
+            self.connection.execute(
+                "INSERT INTO files (path, mtime, size, sha1) VALUES (?, ?, ?, ?)", (path, stat.st_mtime, stat.st_size, sha1)
+            )
+            self._insert_run(path, test_info, array)
+        return True
+
+    def _insert_run(self, path: str, test_info: dict, array: np.ndarray) -> None:
+        cursor = self.connection.execute(
+            "INSERT INTO runs (path, stand, board, timestamp, user, calib_channel, calib_value) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                path,
+                test_info.get("Stand Number"),
+                test_info.get("Dunk Board"),
+                _to_int(test_info.get("Timestamp")),
+                test_info.get("Tester Name"),
+                _to_int(test_info.get("Calib Channel"), -1),
+                _to_float(test_info.get("Calib Value")),
+            ),
+        )
+        run_id = cursor.lastrowid
+        # Every measured channel is fitted, those without enough points get a NaN fit
+        fits = fit_run(array, test_info=test_info)
+        # Failed readings (blank in old files) are not indexed as points
+        array = array[np.isfinite(array["Measured Voltage [V]"]) & np.isfinite(array["Voltage Error [V]"])]
+        resistance, _ = resistances(array["Measured Voltage [V]"], array["DAC Value"] * VOLTS_PER_UNIT)
+        resistance = np.where(np.isfinite(resistance), resistance, np.nan)
+        self.connection.executemany(
+            "INSERT INTO points (run_id, dac, channel, voltage, error, resistance) VALUES (?, ?, ?, ?, ?, ?)",
+            zip(
+                [run_id] * len(array),
+                array["DAC Value"].tolist(),
+                array["Relay"].tolist(),
+                array["Measured Voltage [V]"].tolist(),
+                array["Voltage Error [V]"].tolist(),
+                [None if np.isnan(r) else r for r in resistance.tolist()],
+            ),
+        )
+        # No bin and no pass without a real fit
+        fitted = np.isfinite(fits["resistance"]) & (fits["n"] >= 2)
+        bins = RESISTOR_BINS.assign(fits["resistance"])
+        passed = passes(fits["resistance"]) & fitted
+        self.connection.executemany(
+            "INSERT INTO channels (run_id, channel, n, resistance, resistance_err, bin, passed) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    run_id,
+                    int(fit["channel"]),
+                    int(fit["n"]),
+                    float(fit["resistance"]) if ok else None,
+                    float(fit["resistance_err"]) if ok else None,
+                    str(label) if ok else None,
+                    int(good),
+                )
+                for fit, label, ok, good in zip(fits, bins, fitted, passed)
+            ],
+        )
+
+    def ingest(self, paths: Iterable[str], prune: bool = False) -> dict:
+        """
+        :param paths: results CSV files, glob patterns and folders (searched for WM_Comp_test_*.csv)
+        :param prune: forget the indexed files that no longer exist
+        :return: counts of the loaded, unchanged and failed files, and of the pruned ones
+        """
+        counts = {"loaded": 0, "unchanged": 0, "failed": 0, "pruned": 0}
+        for path in expand_paths(paths):
+            try:
+                counts["loaded" if self.ingest_file(path) else "unchanged"] += 1
+            except (OSError, ValueError, IndexError) as e:
+                print(f"Skipping {path}: {e}")
+                counts["failed"] += 1
+        if prune:
+            with self.connection:
+                for (path,) in self.connection.execute("SELECT path FROM files").fetchall():
+                    if not os.path.exists(path):
+                        self.connection.execute("DELETE FROM files WHERE path = ?", (path,))
+                        counts["pruned"] += 1
+        return counts
+
+    def query(self, sql: str, parameters=()) -> List[tuple]:
+        return self.connection.execute(sql, parameters).fetchall()
+
+    def board_runs(self, board: str) -> List[tuple]:
+        """
+        :return: (run id, stand, timestamp, path) of every run of a board
+        """
+        return self.query("SELECT id, stand, timestamp, path FROM runs WHERE board = ? ORDER BY timestamp", (board,))
+
+    def channels_in_bin(self, label: str, since: Optional[int] = None) -> List[tuple]:
+        """
+        :param label: bin label
+        :param since: only the runs after this timestamp (s since epoch)
+        :return: (board, channel, resistance, timestamp) of every channel binned label
+        """
+        return self.query(
+            "SELECT runs.board, channels.channel, channels.resistance, runs.timestamp FROM channels "
+            "JOIN runs ON runs.id = channels.run_id WHERE channels.bin = ? AND runs.timestamp >= ? ORDER BY runs.timestamp",
+            (label, since or 0),
+        )
+
+
+def expand_paths(paths: Iterable[str]) -> List[str]:
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "**", "WM_Comp_test_*.csv"), recursive=True)))
+        elif glob.has_magic(path):
+            files.extend(sorted(glob.glob(path, recursive=True)))
+        else:
+            files.append(path)
+    return [path for path in files if not path.endswith("_settling.csv")]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index WM_Comp_test results in an SQLite database")
+    parser.add_argument("paths", nargs="*", help="Results files or folders to ingest")
+    parser.add_argument("--db", default="results.sqlite", help="Database file")
+    parser.add_argument("--prune", action="store_true", default=False, help="Forget files that no longer exist")
+    parser.add_argument("--board", default=None, help="List the runs of a board")
+    parser.add_argument("--bin", default=None, help="List the channels in a bin")
+    args = parser.parse_args()
+
+    with ResultsIndex(args.db) as index:
+        if args.paths or args.prune:
+            counts = index.ingest(args.paths, prune=args.prune)
+            print(", ".join(f"{count} {name}" for name, count in counts.items()))
+        if args.board:
+            for run in index.board_runs(args.board):
+                print(*run)
+        if args.bin:
+            for channel in index.channels_in_bin(args.bin):
+                print(*channel)
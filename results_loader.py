@@ -0,0 +1,159 @@
+import csv
+import glob
+import mmap
+import os
+import re
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from results import parse_id
+
+# Column names of the data block: standard format, then the pre-standard one (TestingProcess.data keys)
+COLUMNS = {
+    "HV Index": "DAC Value",
+    "DAC Value": "DAC Value",
+    "Voltage Step [V]": "Voltage Step [V]",
+    "CHANNEL": "Relay",
+    "Relay": "Relay",
+    "Voltage": "Measured Voltage [V]",
+    "Measured Voltage [V]": "Measured Voltage [V]",
+    "Error": "Voltage Error [V]",
+    "Voltage Error [V]": "Voltage Error [V]",
+}
+FIELD_TYPES = {
+    "DAC Value": "<i2",
+    "Voltage Step [V]": "<f8",
+    "Relay": "<i1",
+    "Measured Voltage [V]": "<f8",
+    "Voltage Error [V]": "<f8",
+}
+FILE_NAME = re.compile(r"WM_Comp_test_(?P<stand>[^_]*)_(?P<board>.*)_(?P<timestamp>\d+)\.csv$")
+
+
+def _metadata(lines: List[List[str]], path: str) -> dict:
+    metadata = {}
+    match = FILE_NAME.search(os.path.basename(path))
+    if match:
+        metadata.update({"Stand Number": match["stand"], "Dunk Board": match["board"], "Timestamp": match["timestamp"]})
+    for row in lines:
+        if row[:1] == ["ID:"] and len(row) > 1:
+            metadata.update(parse_id(row[1]))
+            metadata["Tester Name"] = row[3] if len(row) > 3 else ""
+        elif row and row[0].startswith("Calibration Channel"):
+            metadata["Calib Channel"] = row[1] if len(row) > 1 else "-1"
+            metadata["Calib Value"] = row[3] if len(row) > 3 else ""
+    return metadata
+
+
+def _decode_block(block: bytes, n_columns: int) -> np.ndarray:
+    # Rows become one comma separated list of numbers, parsed in C
+    text = block.replace(b"\r", b"").strip().replace(b"\n", b",").decode("ascii")
+    if not text:
+        return np.zeros((0, n_columns))
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        try:
+            values = np.fromstring(text, sep=",")
+            if values.size % n_columns == 0:
+                return values.reshape(-1, n_columns)
+        except (DeprecationWarning, ValueError):
+            pass
+    # Blank fields (failed readings, written as None by TestProc_old.py) or malformed lines: slower, line by line
+    return np.genfromtxt(block.decode("ascii", errors="replace").splitlines(), delimiter=",", ndmin=2, invalid_raise=False)
+
+
+def load_results(path: str) -> Tuple[dict, np.ndarray]:
+    """
+    Loads a WM_Comp_test_*.csv file: the standard format (ID and calibration rows,
+    then 'HV Index,CHANNEL,Voltage,Error') or the pre-standard one written by TestProc_old.py
+    (blank fields for failed readings, which load as NaN). Files with only a header of
+    TestingProcess.data keys also load, the stand, board and timestamp then come from the file name.
+
+    :param path: results CSV
+    :return: (metadata dict with the test info keys and 'Format', structured array
+        with the fields 'DAC Value', 'Relay', 'Measured Voltage [V]', 'Voltage Error [V]',
+        plus 'Voltage Step [V]' if the file has it)
+    """
+    with open(path, "rb") as results_file:
+        if os.fstat(results_file.fileno()).st_size == 0:
+            raise ValueError(f"{path} is empty")
+        with mmap.mmap(results_file.fileno(), 0, access=mmap.ACCESS_READ) as content:
+            # The header line is the first one starting with a known column name
+            start = 0
+            header = None
+            while start < len(content):
+                end = content.find(b"\n", start)
+                end = len(content) if end < 0 else end + 1
+                line = content[start:end].decode("utf-8", errors="replace").strip()
+                first = line.split(",", 1)[0].strip()
+                if first in COLUMNS:
+                    header = next(csv.reader([line]))
+                    break
+                start = end
+            if header is None:
+                raise ValueError(f"{path} is not a WM_Comp_test results file")
+            metadata_rows = list(csv.reader(content[:start].decode("utf-8", errors="replace").splitlines()))
+            values = _decode_block(content[end:], len(header))
+
+    metadata = _metadata(metadata_rows, path)
+    metadata["Format"] = "standard" if header[0] == "HV Index" else "pre-standard"
+    fields = [COLUMNS.get(name.strip()) for name in header]
+    if None in fields or "Relay" not in fields or "Measured Voltage [V]" not in fields:
+        raise ValueError(f"{path}: unknown columns {header}")
+    # Rows without a DAC value or relay cannot be placed
+    integers = [column for column, name in enumerate(fields) if FIELD_TYPES.get(name, "").startswith("<i")]
+    values = values[np.isfinite(values[:, integers]).all(axis=1)]
+    dtype = [(name, FIELD_TYPES[name]) for name in FIELD_TYPES if name in fields]
+    if "Voltage Error [V]" not in fields:
+        dtype.append(("Voltage Error [V]", "<f8"))
+    array = np.zeros(len(values), dtype=dtype)
+    for column, name in enumerate(fields):
+        array[name] = values[:, column]
+    return metadata, array
+
+
+def _load_or_error(path: str):
+    try:
+        return path, load_results(path)
+    except (OSError, ValueError) as e:
+        return path, e
+
+
+def load_directory(
+    folder: str, pattern: str = "WM_Comp_test_*.csv", processes: Optional[int] = None, min_files_per_process: int = 64
+) -> Dict[str, Tuple[dict, np.ndarray]]:
+    """
+    Loads every results file of a folder (and its subfolders), in a process pool when there are many.
+
+    :param folder: folder to search
+    :param pattern: file name pattern
+    :param processes: worker processes, os.cpu_count() if None, 1 to load in this process
+    :param min_files_per_process: below this many files per worker, fewer workers are started
+    :return: {path: (metadata, array)}, files that cannot be read are reported and left out
+    """
+    paths = sorted(
+        path
+        for path in glob.glob(os.path.join(folder, "**", pattern), recursive=True)
+        if not path.endswith("_settling.csv")
+    )
+    processes = os.cpu_count() or 1 if processes is None else processes
+    processes = max(1, min(processes, len(paths) // min_files_per_process))
+    if processes == 1:
+        loaded = map(_load_or_error, paths)
+    else:
+        executor = ProcessPoolExecutor(processes)
+        loaded = executor.map(_load_or_error, paths, chunksize=max(1, len(paths) // (4 * processes)))
+    runs = {}
+    try:
+        for path, result in loaded:
+            if isinstance(result, Exception):
+                print(f"Skipping {path}: {result}")
+            else:
+                runs[path] = result
+    finally:
+        if processes > 1:
+            executor.shutdown()
+    return runs
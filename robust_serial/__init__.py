@@ -4,12 +4,19 @@ from .robust_serial import (
     read_i8,
     read_i16,
     read_i32,
+    read_array,
     read_order,
     write_i8,
+    write_i8_array,
     write_i16,
+    write_i16_array,
     write_i32,
+    write_i32_array,
     write_order,
+    write_orders,
 )
+from .decoder import DebugLine, FrameDecoder, FrameReader, Message
+from .pipeline import ArduinoError, CommandResult, CommandWindow
 
 __version__ = "0.2"
 
@@ -24,4 +31,16 @@ __all__ = [
     "write_i16",
     "write_i32",
     "decode_order",
+    "write_orders",
+    "write_i8_array",
+    "write_i16_array",
+    "write_i32_array",
+    "read_array",
+    "FrameDecoder",
+    "FrameReader",
+    "Message",
+    "DebugLine",
+    "CommandWindow",
+    "CommandResult",
+    "ArduinoError",
 ]
@@ -0,0 +1,259 @@
+"""
+asyncio version of the protocol.
+
+One event loop can drive several stands: every port gets an :class:`ArduinoProtocol`
+and nothing polls, the loop only wakes up when bytes arrive::
+
+    async def main():
+        stands = [await open_serial_connection(port) for port in ("/dev/ttyACM0", "/dev/ttyACM1")]
+        await asyncio.gather(*(stand.handshake() for stand in stands))
+        await asyncio.gather(*(stand.send_order(Order.HV_SET, 13) for stand in stands))
+"""
+import asyncio
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional, Tuple
+
+import serial
+
+from .decoder import FrameDecoder, Message
+from .pipeline import ArduinoError, CommandResult
+from .robust_serial import Order, pack_orders
+
+
+class ArduinoProtocol(asyncio.Protocol):
+    """
+    asyncio protocol speaking the robust_serial orders.
+
+    :param window_size: maximum number of sequenced orders in flight
+    :param payloads: payload struct format for each order the device can send (see decoder.PAYLOADS)
+    :param backlog: received messages kept for a later wait_for when nobody waits for them
+    """
+
+    def __init__(self, window_size: int = 8, payloads: Optional[Dict[Order, str]] = None, backlog: int = 64):
+        self.decoder = FrameDecoder(payloads)
+        self.transport: Optional[asyncio.BaseTransport] = None
+        self.window = asyncio.Semaphore(window_size)
+        self.next_seq = 0
+        # seq -> (order, replies, future)
+        self.outstanding: "OrderedDict[int, Tuple[Order, List[Message], asyncio.Future]]" = OrderedDict()
+        self.waiters: List[Tuple[Order, asyncio.Future]] = []
+        # Messages no waiter took yet (oldest dropped first), so a reply arriving before wait_for is not lost
+        self.unclaimed: deque = deque(maxlen=backlog)
+        self.closed: Optional[asyncio.Future] = None
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self.transport = transport
+        self.closed = asyncio.get_running_loop().create_future()
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        error = exc or ConnectionError("Connection to the Arduino closed")
+        for _, _, future in self.outstanding.values():
+            if not future.done():
+                future.set_exception(error)
+        self.outstanding.clear()
+        for _, future in self.waiters:
+            if not future.done():
+                future.set_exception(error)
+        self.waiters = []
+        if self.closed is not None and not self.closed.done():
+            self.closed.set_result(None)
+
+    def data_received(self, data: bytes) -> None:
+        for message in self.decoder.feed(data):
+            if isinstance(message, Message):
+                self._dispatch(message)
+
+    def _dispatch(self, message: Message) -> None:
+        if message.order == Order.ACK:
+            self._complete(message.value, None)
+            return
+        if message.order == Order.NACK:
+            self._complete(*message.value)
+            return
+        if self.outstanding:
+            next(iter(self.outstanding.values()))[1].append(message)
+
+        waiters, self.waiters = self.waiters, []
+        claimed = False
+        for order, future in waiters:
+            if future.done():
+                continue
+            if message.order == order and not claimed:
+                future.set_result(message)
+                claimed = True
+            elif message.order == Order.ERROR:
+                future.set_exception(RuntimeError(f"Arduino returned error {message.value} while waiting for {order.name}"))
+                claimed = True
+            else:
+                self.waiters.append((order, future))
+        if not claimed:
+            self.unclaimed.append(message)
+
+    def _complete(self, seq: int, error_code: Optional[int]) -> None:
+        if seq not in self.outstanding:
+            return
+        while True:
+            pending_seq, (order, replies, future) = self.outstanding.popitem(last=False)
+            if pending_seq == seq:
+                break
+            if not future.done():
+                future.set_exception(RuntimeError(f"No acknowledgement for {order.name} (seq {pending_seq})"))
+        if future.done():
+            return
+        if error_code is None:
+            future.set_result(CommandResult(seq, order, replies))
+        else:
+            future.set_exception(ArduinoError(seq, order, error_code))
+
+    def write_order(self, order: Order, value: Optional[int] = None) -> None:
+        """
+        Send an order without sequence number (e.g. for the handshake).
+
+        :param order: (Order Enum Object)
+        :param value: (uint8_t) optional parameter
+        """
+        self.transport.write(bytes(pack_orders([(order, value)])))
+
+    async def send_order(self, order: Order, value: Optional[int] = None, timeout: Optional[float] = None) -> CommandResult:
+        """
+        Send a sequenced order and wait for its acknowledgement.
+        Other orders can be sent concurrently, up to ``window_size`` are in flight.
+
+        :param order: (Order Enum Object)
+        :param value: (uint8_t) optional parameter
+        :param timeout: (float) seconds, None to wait forever
+        :return: (CommandResult)
+        :raises ValueError: if value does not fit in a uint8_t, nothing is sent
+        """
+        async with self.window:
+            seq = self.next_seq
+            # Packed first: an invalid value (ValueError) leaves no order in flight
+            buffer = bytes(pack_orders([(Order.SEQ, seq), (order, value)]))
+            self.next_seq = (self.next_seq + 1) % 256
+            future = asyncio.get_running_loop().create_future()
+            self.outstanding[seq] = (order, [], future)
+            self.transport.write(buffer)
+            try:
+                return await asyncio.wait_for(future, timeout)
+            finally:
+                self.outstanding.pop(seq, None)
+
+    async def wait_for(self, order: Order, timeout: Optional[float] = None) -> Message:
+        """
+        Wait until the given order is received. A matching message received earlier
+        that no one waited for is returned at once (oldest first).
+
+        :param order: (Order Enum Object) the order to wait for
+        :param timeout: (float) seconds, None to wait forever
+        :return: (Message)
+        """
+        for message in self.unclaimed:
+            if message.order == order:
+                self.unclaimed.remove(message)
+                return message
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.append((order, future))
+        return await asyncio.wait_for(future, timeout)
+
+    async def handshake(self, retry_delay: float = 2) -> None:
+        """
+        Say HELLO until the Arduino answers, then confirm the connection.
+
+        :param retry_delay: (float) seconds between two HELLO
+        """
+        while True:
+            hello = asyncio.ensure_future(self.wait_for(Order.HELLO))
+            already_connected = asyncio.ensure_future(self.wait_for(Order.ALREADY_CONNECTED))
+            self.write_order(Order.HELLO)
+            done, pending = await asyncio.wait({hello, already_connected}, timeout=retry_delay, return_when=asyncio.FIRST_COMPLETED)
+            for future in pending:
+                future.cancel()
+            if done:
+                self.write_order(Order.ALREADY_CONNECTED)
+                return
+
+    def close(self) -> None:
+        if self.transport is not None:
+            self.transport.close()
+
+
+class _SerialTransport(asyncio.Transport):
+    """
+    Minimal transport over a pyserial port, used when pyserial-asyncio is not installed.
+    Relies on loop.add_reader(), so it only works with selector event loops (Linux, macOS).
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, protocol: asyncio.Protocol, serial_file: serial.Serial):
+        super().__init__()
+        self.loop = loop
+        self.protocol = protocol
+        self.serial_file = serial_file
+        self.closing = False
+        loop.add_reader(serial_file.fileno(), self._read_ready)
+        loop.call_soon(protocol.connection_made, self)
+
+    def _read_ready(self) -> None:
+        try:
+            data = self.serial_file.read(max(1, self.serial_file.in_waiting))
+        except serial.SerialException as e:
+            self._close(e)
+            return
+        if data:
+            self.protocol.data_received(data)
+
+    def write(self, data: bytes) -> None:
+        self.serial_file.write(data)
+
+    def is_closing(self) -> bool:
+        return self.closing
+
+    def close(self) -> None:
+        self._close(None)
+
+    def _close(self, exc: Optional[Exception]) -> None:
+        if self.closing:
+            return
+        self.closing = True
+        self.loop.remove_reader(self.serial_file.fileno())
+        self.serial_file.close()
+        self.loop.call_soon(self.protocol.connection_lost, exc)
+
+
+async def open_serial_connection(serial_port: str, baudrate: int = 115200, window_size: int = 8) -> ArduinoProtocol:
+    """
+    :param serial_port: (str) e.g. "/dev/ttyACM0"
+    :param baudrate:
+    :param window_size: maximum number of sequenced orders in flight
+    :return: (ArduinoProtocol) connected to the port
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        import serial_asyncio
+    except ImportError:
+        serial_asyncio = None
+
+    if serial_asyncio is not None:
+        _, protocol = await serial_asyncio.create_serial_connection(
+            loop, lambda: ArduinoProtocol(window_size), serial_port, baudrate=baudrate
+        )
+        return protocol
+
+    serial_file = serial.Serial(port=serial_port, baudrate=baudrate, timeout=0)
+    protocol = ArduinoProtocol(window_size)
+    _SerialTransport(loop, protocol, serial_file)
+    await asyncio.sleep(0)  # let connection_made run
+    return protocol
+
+
+async def open_socket_connection(host: str, port: int, window_size: int = 8) -> ArduinoProtocol:
+    """
+    Same protocol over TCP (see examples/socket_example.py).
+
+    :param host: (str)
+    :param port: (int)
+    :param window_size: maximum number of sequenced orders in flight
+    :return: (ArduinoProtocol) connected to the socket
+    """
+    loop = asyncio.get_running_loop()
+    _, protocol = await loop.create_connection(lambda: ArduinoProtocol(window_size), host, port)
+    return protocol
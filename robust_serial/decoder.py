@@ -0,0 +1,237 @@
+import logging
+import struct
+import time
+from typing import BinaryIO, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from .robust_serial import Order
+
+# Debug text printed by the firmware (Serial.print / Serial.println) ends up here
+arduino_log = logging.getLogger("robust_serial.arduino")
+
+# Payload layout of every order the Arduino can send back (see slave.cpp)
+PAYLOADS: Dict[Order, str] = {
+    Order.HELLO: "",
+    Order.ALREADY_CONNECTED: "",
+    Order.RECEIVED: "",
+    Order.READY_RELAY: "",
+    Order.HV_UPDATED: "<B",
+    Order.ERROR: "<h",
+    Order.ACK: "<B",
+    Order.NACK: "<Bh",
+}
+
+_NEWLINE = 0x0A
+_CARRIAGE_RETURN = 0x0D
+_FIRST_PRINTABLE = 0x20
+
+
+class Message(NamedTuple):
+    """
+    A complete binary order received from the Arduino.
+
+    :param order: (Order Enum Object)
+    :param value: decoded payload, None for orders without payload
+    """
+
+    order: Order
+    value: Optional[Union[int, Tuple[int, ...]]] = None
+
+
+class DebugLine(NamedTuple):
+    """
+    One line of ASCII debug text printed by the firmware.
+    """
+
+    text: str
+
+
+class UnknownByte(NamedTuple):
+    """
+    A byte that is neither a known order nor printable text.
+    """
+
+    byte: int
+
+
+class FrameDecoder:
+    """
+    Incremental decoder for the Arduino -> computer stream.
+
+    Bytes are fed in whatever chunks the serial port returns them,
+    complete messages are returned as soon as they are available.
+    Binary orders and their payloads become :class:`Message`, the ASCII
+    debug prints become :class:`DebugLine` (and are logged on ``robust_serial.arduino``).
+
+    :param payloads: payload struct format for each order the device can send
+    :param log_debug: whether to forward debug lines to the logger
+    :param buffer_size: initial size of the ring buffer (it grows if needed)
+    """
+
+    IDLE = 0
+    PAYLOAD = 1
+    TEXT = 2
+
+    def __init__(self, payloads: Optional[Dict[Order, str]] = None, log_debug: bool = True, buffer_size: int = 256):
+        payloads = PAYLOADS if payloads is None else payloads
+        self.structs = {order.value: struct.Struct(fmt) for order, fmt in payloads.items()}
+        self.log_debug = log_debug
+        self.buffer = bytearray(buffer_size)
+        self.head = 0  # next byte to decode
+        self.tail = 0  # next free slot
+        self.state = self.IDLE
+        self.pending_order = None
+        self.text = bytearray()
+
+    def __len__(self) -> int:
+        """
+        Number of buffered bytes not yet decoded.
+        """
+        return (self.tail - self.head) % len(self.buffer)
+
+    def reset(self) -> None:
+        """
+        Drop everything buffered (e.g. after serial_file.reset_input_buffer()).
+        """
+        self.head = self.tail = 0
+        self.state = self.IDLE
+        self.pending_order = None
+        self.text.clear()
+
+    def _grow(self, needed: int) -> None:
+        size = len(self.buffer)
+        while size - 1 < needed:
+            size *= 2
+        data = self._peek(len(self))
+        self.buffer = bytearray(size)
+        self.buffer[: len(data)] = data
+        self.head, self.tail = 0, len(data)
+
+    def _peek(self, n: int) -> bytes:
+        end = self.head + n
+        if end <= len(self.buffer):
+            return bytes(self.buffer[self.head : end])
+        return bytes(self.buffer[self.head :] + self.buffer[: end - len(self.buffer)])
+
+    def _consume(self, n: int) -> bytes:
+        data = self._peek(n)
+        self.head = (self.head + n) % len(self.buffer)
+        return data
+
+    def _write(self, data: bytes) -> None:
+        if len(self) + len(data) >= len(self.buffer):
+            self._grow(len(self) + len(data))
+        size = len(self.buffer)
+        first = min(len(data), size - self.tail)
+        self.buffer[self.tail : self.tail + first] = data[:first]
+        if first < len(data):
+            self.buffer[: len(data) - first] = data[first:]
+        self.tail = (self.tail + len(data)) % size
+
+    def feed(self, data: bytes) -> List[Union[Message, DebugLine, UnknownByte]]:
+        """
+        :param data: raw bytes read from the serial port
+        :return: list of messages completed by these bytes
+        """
+        if data:
+            self._write(data)
+        return list(self._decode())
+
+    def _decode(self) -> Iterator[Union[Message, DebugLine, UnknownByte]]:
+        while len(self):
+            if self.state == self.PAYLOAD:
+                unpacker = self.structs[self.pending_order.value]
+                if len(self) < unpacker.size:
+                    return
+                values = unpacker.unpack(self._consume(unpacker.size))
+                self.state = self.IDLE
+                yield Message(self.pending_order, values[0] if len(values) == 1 else values)
+            elif self.state == self.TEXT:
+                byte = self._consume(1)[0]
+                if byte == _NEWLINE:
+                    self.state = self.IDLE
+                    yield self._flush_text()
+                elif byte != _CARRIAGE_RETURN:
+                    self.text.append(byte)
+            else:
+                byte = self._consume(1)[0]
+                if byte in self.structs:
+                    order = Order(byte)
+                    if self.structs[byte].size:
+                        self.pending_order = order
+                        self.state = self.PAYLOAD
+                    else:
+                        yield Message(order)
+                elif byte >= _FIRST_PRINTABLE:
+                    self.text.append(byte)
+                    self.state = self.TEXT
+                elif byte not in (_NEWLINE, _CARRIAGE_RETURN):
+                    yield UnknownByte(byte)
+
+    def _flush_text(self) -> DebugLine:
+        line = DebugLine(self.text.decode("ascii", errors="replace"))
+        self.text.clear()
+        if self.log_debug:
+            arduino_log.debug(line.text)
+        return line
+
+
+class FrameReader:
+    """
+    Reads from a serial file through a :class:`FrameDecoder`.
+
+    Every read takes all the bytes waiting on the port in one call
+    (at least one byte, bounded by the port timeout).
+
+    :param f: file handler or serial file
+    :param decoder: (FrameDecoder) a new one is created if None
+    """
+
+    def __init__(self, f: BinaryIO, decoder: Optional[FrameDecoder] = None):
+        self.f = f
+        self.decoder = FrameDecoder() if decoder is None else decoder
+        self.messages: List[Union[Message, DebugLine, UnknownByte]] = []
+
+    def poll(self) -> List[Union[Message, DebugLine, UnknownByte]]:
+        """
+        Read what is available and return the messages decoded so far.
+        """
+        n_bytes = max(1, getattr(self.f, "in_waiting", 0))
+        self.messages.extend(self.decoder.feed(self.f.read(n_bytes)))
+        messages, self.messages = self.messages, []
+        return messages
+
+    def reset(self) -> None:
+        """
+        Flush the serial input buffer and forget any partial message.
+        """
+        if hasattr(self.f, "reset_input_buffer"):
+            self.f.reset_input_buffer()
+        self.decoder.reset()
+        self.messages = []
+
+    def wait_for(self, order: Order, timeout: Optional[float] = None, clock=None) -> Optional[Message]:
+        """
+        Read until the given order is received.
+
+        Debug lines are logged, other orders are skipped,
+        an ERROR from the Arduino raises a RuntimeError.
+
+        :param order: (Order Enum Object) the order to wait for
+        :param timeout: (float) seconds, None to wait forever
+        :param clock: object with a ``time()`` method, defaults to the time module
+        :return: the matching message, None on timeout
+        """
+        clock = time if clock is None else clock
+        deadline = None if timeout is None else clock.time() + timeout
+        while deadline is None or clock.time() < deadline:
+            messages = self.poll()
+            for i, message in enumerate(messages):
+                if not isinstance(message, Message):
+                    continue
+                if message.order == order:
+                    self.messages = messages[i + 1 :] + self.messages
+                    return message
+                if message.order == Order.ERROR:
+                    self.messages = messages[i + 1 :] + self.messages
+                    raise RuntimeError(f"Arduino returned error {message.value} while waiting for {order.name}")
+        return None
@@ -0,0 +1,188 @@
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import BinaryIO, List, NamedTuple, Optional
+
+from .decoder import FrameReader, Message
+from .robust_serial import Order, pack_orders
+
+
+class ArduinoError(RuntimeError):
+    """
+    The Arduino rejected a sequenced order (NACK).
+
+    :param seq: sequence number of the order
+    :param order: (Order Enum Object) the order that failed
+    :param code: error code sent by the firmware (404 for unknown orders)
+    """
+
+    def __init__(self, seq: int, order: Order, code: int):
+        super().__init__(f"Arduino returned error {code} for {order.name} (seq {seq})")
+        self.seq = seq
+        self.order = order
+        self.code = code
+
+
+class CommandResult(NamedTuple):
+    """
+    Outcome of a sequenced order.
+
+    :param seq: sequence number of the order
+    :param order: (Order Enum Object) the order that was sent
+    :param replies: messages the Arduino sent while executing it (e.g. HV_UPDATED)
+    """
+
+    seq: int
+    order: Order
+    replies: List[Message]
+
+    def reply(self, order: Order) -> Optional[Message]:
+        """
+        :param order: (Order Enum Object)
+        :return: the first reply of this type, None if there is none
+        """
+        for message in self.replies:
+            if message.order == order:
+                return message
+        return None
+
+
+class _Pending:
+    def __init__(self, seq: int, order: Order):
+        self.seq = seq
+        self.order = order
+        self.replies: List[Message] = []
+        self.future: Future = Future()
+
+
+class CommandWindow:
+    """
+    Sliding window of sequenced orders.
+
+    Each order is prefixed by ``SEQ <n>``; the firmware answers ``ACK <n>``
+    (or ``NACK <n> <code>``) once it is done with it. Up to ``window_size`` orders
+    can be in flight, each one gets a Future that resolves to a :class:`CommandResult`.
+    The Arduino handles orders one at a time, so every reply received before
+    an ACK belongs to the oldest outstanding order.
+
+    There is no background thread: the window reads the serial port
+    whenever a caller waits on it (:meth:`wait`, :meth:`submit` when the window is full).
+
+    :param f: file handler or serial file
+    :param window_size: maximum number of orders in flight (the Arduino RX buffer is 64 bytes)
+    :param reader: (FrameReader) reader to share with other code, a new one is created if None
+    :param clock: object with a ``time()`` method, defaults to the time module
+    """
+
+    def __init__(self, f: BinaryIO, window_size: int = 8, reader: Optional[FrameReader] = None, clock=None):
+        self.f = f
+        self.window_size = window_size
+        self.reader = FrameReader(f) if reader is None else reader
+        self.clock = time if clock is None else clock
+        self.next_seq = 0
+        self.outstanding: "OrderedDict[int, _Pending]" = OrderedDict()
+
+    def __len__(self) -> int:
+        """
+        Number of orders in flight.
+        """
+        return len(self.outstanding)
+
+    def submit(self, order: Order, value: Optional[int] = None, timeout: Optional[float] = None) -> Future:
+        """
+        Send an order without waiting for its acknowledgement.
+
+        :param order: (Order Enum Object)
+        :param value: (uint8_t) optional parameter
+        :param timeout: (float) maximum time to wait for a free slot in the window
+        :return: (Future) resolves to a CommandResult, or raises ArduinoError
+        :raises ValueError: if value does not fit in a uint8_t, nothing is sent
+        """
+        deadline = None if timeout is None else self.clock.time() + timeout
+        while len(self.outstanding) >= self.window_size:
+            if deadline is not None and self.clock.time() >= deadline:
+                raise TimeoutError(f"No free slot in the command window to send {order.name}")
+            self.pump()
+
+        # Packed first: an invalid value (ValueError) leaves no order in flight
+        pending = _Pending(self.next_seq, order)
+        buffer = pack_orders([(Order.SEQ, pending.seq), (order, value)])
+        self.next_seq = (self.next_seq + 1) % 256
+        self.outstanding[pending.seq] = pending
+        self.f.write(buffer)
+        return pending.future
+
+    def pump(self) -> None:
+        """
+        Read the serial port once and resolve the orders that are done.
+        """
+        for message in self.reader.poll():
+            if not isinstance(message, Message) or not self.outstanding:
+                continue
+            if message.order == Order.ACK:
+                self._complete(message.value, None)
+            elif message.order == Order.NACK:
+                seq, code = message.value
+                self._complete(seq, code)
+            else:
+                next(iter(self.outstanding.values())).replies.append(message)
+
+    def _complete(self, seq: int, error_code: Optional[int]) -> None:
+        if seq not in self.outstanding:
+            return
+        # Older orders without acknowledgement were lost on the way
+        while True:
+            pending = self.outstanding.popitem(last=False)[1]
+            if pending.seq == seq:
+                break
+            pending.future.set_exception(RuntimeError(f"No acknowledgement for {pending.order.name} (seq {pending.seq})"))
+        if error_code is None:
+            pending.future.set_result(CommandResult(pending.seq, pending.order, pending.replies))
+        else:
+            pending.future.set_exception(ArduinoError(pending.seq, pending.order, error_code))
+
+    def wait(self, future: Future, timeout: Optional[float] = None) -> CommandResult:
+        """
+        Read the serial port until the order is acknowledged.
+
+        :param future: (Future) returned by :meth:`submit`
+        :param timeout: (float) seconds, None to wait forever
+        :return: (CommandResult)
+        """
+        deadline = None if timeout is None else self.clock.time() + timeout
+        while not future.done():
+            if deadline is not None and self.clock.time() >= deadline:
+                raise TimeoutError("No acknowledgement from the Arduino")
+            self.pump()
+        return future.result()
+
+    def wait_all(self, timeout: Optional[float] = None) -> None:
+        """
+        Read the serial port until every order in flight is done.
+
+        :param timeout: (float) seconds, None to wait forever
+        """
+        deadline = None if timeout is None else self.clock.time() + timeout
+        while self.outstanding:
+            if deadline is not None and self.clock.time() >= deadline:
+                raise TimeoutError(f"{len(self.outstanding)} orders still waiting for an acknowledgement")
+            self.pump()
+
+    def send(self, order: Order, value: Optional[int] = None, timeout: Optional[float] = None) -> CommandResult:
+        """
+        Send an order and wait for its acknowledgement.
+
+        :param order: (Order Enum Object)
+        :param value: (uint8_t) optional parameter
+        :param timeout: (float) seconds, None to wait forever
+        :return: (CommandResult)
+        """
+        return self.wait(self.submit(order, value, timeout), timeout)
+
+    def abandon(self) -> None:
+        """
+        Fail every order in flight (e.g. before resetting the input buffer).
+        """
+        while self.outstanding:
+            pending = self.outstanding.popitem(last=False)[1]
+            pending.future.set_exception(RuntimeError(f"{pending.order.name} (seq {pending.seq}) abandoned"))
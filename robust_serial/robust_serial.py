@@ -1,6 +1,8 @@
 import struct
+import sys
 from enum import Enum
-from typing import BinaryIO
+from functools import lru_cache
+from typing import BinaryIO, Iterable, Optional, Sequence, Tuple
 
 
 class Order(Enum):
@@ -22,6 +24,34 @@ class Order(Enum):
     DATA_UPDATE = 11
     HV_UPDATED = 12
     OPEN_RELAYS = 13
+    SEQ = 14  # computer -> arduino: sequence number of the next order
+    ACK = 15  # arduino -> computer: sequenced order done (RECEIVED with its sequence number)
+    NACK = 16  # arduino -> computer: sequenced order failed, followed by the error code
+
+
+# Precompiled (little endian) structs, shared by all the read/write functions
+I8 = struct.Struct("<b")
+U8 = struct.Struct("<B")
+I16 = struct.Struct("<h")
+I32 = struct.Struct("<l")
+
+# dtype name -> (struct code, memoryview format, item size)
+DTYPES = {
+    "i8": ("b", "b", 1),
+    "u8": ("B", "B", 1),
+    "i16": ("h", "h", 2),
+    "i32": ("l", "i", 4),
+}
+
+
+@lru_cache(maxsize=64)
+def array_struct(dtype: str, n: int) -> struct.Struct:
+    """
+    :param dtype: one of "i8", "u8", "i16", "i32"
+    :param n: number of values
+    :return: (struct.Struct) precompiled struct packing n values
+    """
+    return struct.Struct(f"<{n}{DTYPES[dtype][0]}")
 
 def read_order(f: BinaryIO) -> Order:
     """
@@ -51,7 +81,7 @@ def read_i8(f: BinaryIO) -> Order:
     :param f: file handler or serial file
     :return: (int8_t)
     """
-    return struct.unpack("<b", bytearray(f.read(1)))[0]
+    return I8.unpack(f.read(1))[0]
     """
     Read a single unsigned byte from the serial connection and return as int
     """
@@ -65,7 +95,7 @@ def read_i16(f: BinaryIO) -> Order:
     :param f: file handler or serial file
     :return: (int16_t)
     """
-    return struct.unpack("<h", bytearray(f.read(2)))[0]
+    return I16.unpack(f.read(2))[0]
 
 
 def read_i32(f):
@@ -73,7 +103,7 @@ def read_i32(f):
     :param f: file handler or serial file
     :return: (int32_t)
     """
-    return struct.unpack("<l", bytearray(f.read(4)))[0]
+    return I32.unpack(f.read(4))[0]
 
 
 def write_i8(f: BinaryIO, value: int) -> None:
@@ -83,7 +113,7 @@ def write_i8(f: BinaryIO, value: int) -> None:
     """
     #if -128 <= value <= 127:
     if 0 <= value <= 255:
-        f.write(struct.pack("<B", value))
+        f.write(U8.pack(value))
     else:
         print(f"Value error:{value}")
 
@@ -92,10 +122,40 @@ def write_order(f: BinaryIO, order: Order, value: int = None) -> None:
     """
     :param f: file handler or serial file
     :param order: (Order Enum Object)
+    :param value: (uint8_t) optional parameter, sent in the same write as the order
+    """
+    write_orders(f, [(order, value)])
+
+
+def pack_orders(orders: Iterable[Tuple[Order, Optional[int]]]) -> bytearray:
     """
-    write_i8(f, order.value)
-    if value is not None:
-        write_i8(f,value)
+    :param orders: (order, value) pairs, value is None for orders without parameter
+    :return: (bytearray) all the orders and their parameters in one buffer
+    :raises ValueError: if a value does not fit in a uint8_t, nothing is packed
+    """
+    orders = list(orders)
+    buffer = bytearray(len(orders) + sum(value is not None for _, value in orders))
+    offset = 0
+    for order, value in orders:
+        U8.pack_into(buffer, offset, order.value)
+        offset += 1
+        if value is not None:
+            if not 0 <= value <= 255:
+                raise ValueError(f"{order.name} value {value} is not between 0 and 255")
+            U8.pack_into(buffer, offset, value)
+            offset += 1
+    return buffer
+
+
+def write_orders(f: BinaryIO, orders: Iterable[Tuple[Order, Optional[int]]]) -> None:
+    """
+    Send several orders (and their parameters) with a single write.
+
+    :param f: file handler or serial file
+    :param orders: (order, value) pairs, value is None for orders without parameter
+    :raises ValueError: if a value does not fit in a uint8_t, nothing is sent
+    """
+    f.write(pack_orders(orders))
 
 
 def write_i16(f: BinaryIO, value: int) -> None:
@@ -103,7 +163,7 @@ def write_i16(f: BinaryIO, value: int) -> None:
     :param f: file handler or serial file
     :param value: (int16_t)
     """
-    f.write(struct.pack("<h", value))
+    f.write(I16.pack(value))
 
 
 def write_i32(f: BinaryIO, value: int) -> None:
@@ -111,7 +171,52 @@ def write_i32(f: BinaryIO, value: int) -> None:
     :param f: file handler or serial file
     :param value: (int32_t)
     """
-    f.write(struct.pack("<l", value))
+    f.write(I32.pack(value))
+
+
+def write_i8_array(f: BinaryIO, values: Sequence[int]) -> None:
+    """
+    :param f: file handler or serial file
+    :param values: sequence of int8_t, sent with a single write
+    """
+    f.write(array_struct("i8", len(values)).pack(*values))
+
+
+def write_i16_array(f: BinaryIO, values: Sequence[int]) -> None:
+    """
+    :param f: file handler or serial file
+    :param values: sequence of int16_t, sent with a single write
+    """
+    f.write(array_struct("i16", len(values)).pack(*values))
+
+
+def write_i32_array(f: BinaryIO, values: Sequence[int]) -> None:
+    """
+    :param f: file handler or serial file
+    :param values: sequence of int32_t, sent with a single write
+    """
+    f.write(array_struct("i32", len(values)).pack(*values))
+
+
+def read_array(f: BinaryIO, dtype: str, n: int) -> Sequence[int]:
+    """
+    Read n values with a single read.
+
+    On little endian machines the result is a memoryview over the bytes
+    that were read (no copy), otherwise the values are unpacked into a tuple.
+
+    :param f: file handler or serial file
+    :param dtype: one of "i8", "u8", "i16", "i32"
+    :param n: number of values to read
+    :return: sequence of ints
+    """
+    _, view_format, size = DTYPES[dtype]
+    data = f.read(n * size)
+    if len(data) != n * size:
+        raise RuntimeError(f"Failed to read {n} {dtype} values from serial. Got {len(data)} bytes")
+    if sys.byteorder == "little":
+        return memoryview(data).cast(view_format)
+    return array_struct(dtype, n).unpack(data)
 
 
 def decode_order(f: BinaryIO, byte: int, debug: bool = False) -> None:
@@ -1,8 +1,9 @@
 import glob
+import os
 import queue
 import sys
 from typing import List, Optional
-from robust_serial import write_order, Order
+from robust_serial import write_orders, Order
 import serial
 import serial.tools.list_ports
 
@@ -72,7 +73,8 @@ def open_serial_port(
 ) -> serial.Serial:
     """
     Try to open serial port with Arduino
-    If not port is specified, it will be automatically detected
+    If not port is specified, the ARDUINO_PORT environment variable is used
+    (e.g. the pty of simulation/arduino.py), otherwise it will be automatically detected
 
     :param serial_port:
     :param baudrate:
@@ -82,7 +84,7 @@ def open_serial_port(
     """
     # Open serial port (for communication with Arduino)
     if serial_port is None:
-        serial_port = get_serial_ports()[0]
+        serial_port = os.environ.get("ARDUINO_PORT") or get_serial_ports()[0]
     # timeout=0 non-blocking mode, return immediately in any case, returning zero or more,
     # up to the requested number of bytes
     return serial.Serial(port=serial_port, baudrate=baudrate, timeout=timeout, writeTimeout=write_timeout)
@@ -95,13 +97,9 @@ def setRelay(serial_conn, current_relay: int) -> None:
     :param current_relay: The relay to be closed (activated)
     """
     print(f"Entered setRelay for {current_relay}")
-    # close (deactivate) all relays
-    for relay in range(8):
-        print(f"closing relay {relay}")
-        write_order(serial_conn, Order.RELAY, relay)
-    
-    # open (activate) the current relay
-    print(f"opening relay {current_relay}")
-    write_order(serial_conn, Order.RELAY, current_relay)
+    # close (deactivate) all relays, then open (activate) the current relay, in one write
+    orders = [(Order.RELAY, relay) for relay in range(8)]
+    orders.append((Order.RELAY, current_relay))
+    write_orders(serial_conn, orders)
 
     print(f"Relay {current_relay} activated.")
@@ -0,0 +1,92 @@
+import math
+from typing import Callable, Iterable, Optional
+
+
+class RunningStats:
+    """
+    Mean and standard deviation updated one reading at a time (Welford's algorithm).
+    """
+
+    __slots__ = ("n", "mean", "m2")
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, value: float) -> None:
+        self.n += 1
+        delta = value - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (value - self.mean)
+
+    def extend(self, values: Iterable[float]) -> None:
+        for value in values:
+            self.add(value)
+
+    @property
+    def variance(self) -> float:
+        """
+        Sample variance (n - 1), 0 with less than 2 readings.
+        """
+        return self.m2 / (self.n - 1) if self.n > 1 else 0.0
+
+    @property
+    def sdev(self) -> float:
+        return math.sqrt(self.variance)
+
+    @property
+    def sem(self) -> float:
+        """
+        Standard error of the mean, infinite with less than 2 readings.
+        """
+        return self.sdev / math.sqrt(self.n) if self.n > 1 else math.inf
+
+
+class SamplePolicy:
+    """
+    How many readings to average for one measurement.
+
+    With a target_sem, readings are added chunk by chunk until the standard error of
+    the mean is below the target, within [min_count, max_count]: quiet channels stop
+    at min_count, noisy ones get more readings. Without, exactly max_count readings are taken.
+
+    :param target_sem: (V) standard error of the mean to reach, None for a fixed count
+    :param min_count: readings always taken
+    :param max_count: readings never exceeded
+    :param chunk: readings added at once once min_count is reached
+    """
+
+    def __init__(self, target_sem: Optional[float] = None, min_count: int = 10, max_count: int = 10, chunk: int = 5):
+        self.target_sem = target_sem
+        self.min_count = min(min_count, max_count)
+        self.max_count = max_count
+        self.chunk = chunk
+
+
+FIXED_SAMPLING = SamplePolicy()
+# Never fewer readings than the fixed 10 reading mean it replaces, up to 20 on noisy channels
+SEQUENTIAL_SAMPLING = SamplePolicy(target_sem=10e-6, min_count=10, max_count=20)
+
+
+def measure(meter, policy: SamplePolicy, on_reading: Optional[Callable[[float], None]] = None) -> RunningStats:
+    """
+    :param meter: (sdm3055.SDM3055) configured for DC voltage
+    :param policy: (SamplePolicy)
+    :param on_reading: called with every reading (V), e.g. to display them live
+    :return: (RunningStats) of the readings taken
+    """
+    stats = RunningStats()
+    count = policy.max_count if policy.target_sem is None else policy.min_count
+    while count > 0:
+        readings = meter.acquire(count)
+        if not readings:
+            break
+        for value in readings:
+            stats.add(value)
+            if on_reading is not None:
+                on_reading(value)
+        if policy.target_sem is None or stats.sem <= policy.target_sem:
+            break
+        count = min(policy.chunk, policy.max_count - stats.n)
+    return stats
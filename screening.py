@@ -0,0 +1,183 @@
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from analysis import R_PICKOFF, component_voltages, currents
+from binning import PASS_TOLERANCE, TARGET_RESISTANCE
+
+
+class ScreenPolicy:
+    """
+    When to give up on a channel (or a whole board) before the end of the plan.
+
+    Each measured point gives a conductance G = I / U = (|V| / R_pickoff) / (HV - |V|) and its error.
+    A channel is rejected once the weighted mean of its points is out of the
+    target ± tolerance resistance range by more than ``confidence`` standard errors
+    (the standard error is scaled up when the points scatter more than their errors say),
+    after at least ``min_points`` points. Open channels (no current) are rejected the same way.
+
+    :param target: (Ohm) expected resistance
+    :param tolerance: (Ohm) channels within target ± tolerance pass (the green light of the GUI)
+    :param confidence: standard errors the estimate must be out of spec by
+    :param min_points: points measured on a channel before it can be rejected
+    :param abort_fraction: the board is aborted once this fraction of its channels is rejected, None to never abort
+    :param r_pickoff: (Ohm) pickoff resistor, see analysis.R_PICKOFF
+    :param min_error: (V) smallest voltage error used, the DMM resolution
+    """
+
+    def __init__(
+        self,
+        target: float = TARGET_RESISTANCE,
+        tolerance: float = PASS_TOLERANCE,
+        confidence: float = 3.0,
+        min_points: int = 2,
+        abort_fraction: Optional[float] = 0.5,
+        r_pickoff: float = R_PICKOFF,
+        min_error: float = 1e-6,
+    ):
+        self.target = target
+        self.tolerance = tolerance
+        self.confidence = confidence
+        self.min_points = min_points
+        self.abort_fraction = abort_fraction
+        self.r_pickoff = r_pickoff
+        self.min_error = min_error
+
+
+class ConductanceEstimate:
+    """
+    Inverse variance weighted mean of the conductance of one channel, updated one point at a time.
+    Conductance, unlike resistance, is linear in the measured voltage and stays finite
+    (near 0) for an open channel.
+    """
+
+    __slots__ = ("n", "sw", "swg", "swgg")
+
+    def __init__(self):
+        self.n = 0
+        self.sw = 0.0
+        self.swg = 0.0
+        self.swgg = 0.0
+
+    def add(self, conductance: float, error: float) -> None:
+        w = 1 / error**2
+        self.n += 1
+        self.sw += w
+        self.swg += w * conductance
+        self.swgg += w * conductance**2
+
+    @property
+    def mean(self) -> float:
+        return self.swg / self.sw if self.n else math.nan
+
+    @property
+    def error(self) -> float:
+        """
+        Standard error of the mean, times sqrt(reduced chi square) when that is above 1.
+        """
+        if not self.n:
+            return math.inf
+        error = math.sqrt(1 / self.sw)
+        if self.n > 1:
+            chi2 = max(0.0, self.swgg - self.sw * self.mean**2) / (self.n - 1)
+            error *= math.sqrt(max(1.0, chi2))
+        return error
+
+    @property
+    def resistance(self) -> float:
+        return 1 / self.mean if self.mean > 0 else math.inf
+
+
+class Screen:
+    """
+    Running conductance (resistance) estimate of every channel of a board, and the decisions taken on them.
+
+    With a calibration channel, the estimates are scaled the way analysis.calibrate scales the
+    final fits (the calibration channel reads its known value), and the error of the calibration
+    channel estimate is added to theirs. Nothing is rejected until the calibration channel has
+    ``min_points`` points; the calibration channel itself is never rejected.
+
+    :param policy: (ScreenPolicy)
+    :param channels: channels of the board (1 to 8)
+    :param calibration: (calibration channel, its known resistance in Ohm), see analysis.calibration; None for none
+    """
+
+    def __init__(self, policy: ScreenPolicy, channels: Iterable[int], calibration: Optional[Tuple[int, float]] = None):
+        self.policy = policy
+        self.channels = list(channels)
+        self.calibration = calibration
+        self.estimates: Dict[int, ConductanceEstimate] = {channel: ConductanceEstimate() for channel in self.channels}
+        self.rejected: Dict[int, str] = {}
+
+    def add(self, channel: int, voltage: float, error: float, hv: float) -> Dict[int, str]:
+        """
+        :param channel: relay channel
+        :param voltage: (V) mean voltage across the pickoff resistor, negative as read by the DMM
+        :param error: (V) its error
+        :param hv: (V) applied HV
+        :return: {channel: reason} of the channels this point got rejected, every channel
+            measured so far may be when the calibration channel is updated
+        """
+        estimate = self.estimates.setdefault(channel, ConductanceEstimate())
+        if channel in self.rejected or hv <= 0:
+            return {}
+        policy = self.policy
+        u = float(component_voltages(voltage, hv))
+        if u <= 0:
+            return {}
+        estimate.add(float(currents(voltage, policy.r_pickoff)) / u, max(abs(error), policy.min_error) / policy.r_pickoff / u)
+        if self.calibration is not None and channel == self.calibration[0]:
+            candidates = [other for other in self.estimates if other != channel and other not in self.rejected]
+        else:
+            candidates = [channel]
+        rejected = {}
+        for candidate in candidates:
+            reason = self.verdict(self.estimates[candidate], candidate)
+            if reason is not None:
+                rejected[candidate] = self.rejected[candidate] = reason
+        return rejected
+
+    def scale(self) -> Optional[Tuple[float, float]]:
+        """
+        :return: (factor, relative error) the measured conductances are multiplied by,
+            (1, 0) without calibration, None while the calibration channel is not known well enough
+        """
+        if self.calibration is None:
+            return 1.0, 0.0
+        channel, value = self.calibration
+        reference = self.estimates.get(channel)
+        if reference is None or reference.n < self.policy.min_points or reference.mean <= 0:
+            return None
+        # G_calibrated = G * R_reference_measured / R_reference_known
+        return 1 / (reference.mean * value), reference.error / reference.mean
+
+    def verdict(self, estimate: ConductanceEstimate, channel: Optional[int] = None) -> Optional[str]:
+        policy = self.policy
+        if estimate.n < policy.min_points:
+            return None
+        if self.calibration is not None and channel == self.calibration[0]:
+            return None
+        scale = self.scale()
+        if scale is None:
+            return None
+        factor, relative_error = scale
+        mean = factor * estimate.mean
+        margin = policy.confidence * factor * math.hypot(estimate.error, estimate.mean * relative_error)
+        if mean + margin < 1 / (policy.target + policy.tolerance):
+            # Above spec and not distinguishable from no current at all
+            if mean - margin <= 0:
+                return "open, no current"
+            return f"{1 / mean / 1e6:.0f} MOhm, above spec"
+        if mean - margin > 1 / (policy.target - policy.tolerance):
+            return f"{1 / mean / 1e6:.0f} MOhm, below spec"
+        return None
+
+    @property
+    def abort(self) -> bool:
+        """
+        True once enough channels are rejected to give up on the board.
+        """
+        fraction = self.policy.abort_fraction
+        return fraction is not None and len(self.rejected) >= fraction * len(self.channels)
+
+    def active(self, channels: Iterable[int]) -> List[int]:
+        return [channel for channel in channels if channel not in self.rejected]
@@ -0,0 +1,278 @@
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+def parse_readings(response: str) -> List[float]:
+    """
+    :param response: comma separated readings, optionally as an IEEE 488.2 block ("#<n><length><data>")
+    :return: list of readings (V)
+    """
+    response = response.strip()
+    if response.startswith("#"):
+        n_digits = int(response[1])
+        response = response[2 + n_digits :]
+    return [float(value) for value in response.split(",") if value.strip()]
+
+
+class DMMTimeoutError(RuntimeError):
+    """
+    The DMM did not complete an acquisition before the deadline.
+    """
+
+
+class SDM3055:
+    """
+    Acquisition layer for the Siglent SDM3055 on top of a pyvisa resource.
+
+    The DMM is configured once; readings are taken in bulk: the sample count is set
+    on the instrument and all the readings come back in one query, instead of one
+    configuration and one READ? per reading.
+
+    The configuration last sent (function, range, sample count, trigger delay,
+    statistics state, input impedance) is cached, a configuration command is only
+    written when the requested value differs. The cache is dropped on ``*RST``,
+    on any communication error, on an error reported by the DMM and on reconnection.
+
+    :param resource: pyvisa resource (or simulation.SimulatedResource)
+    :param clock: object with ``time()`` and ``sleep()`` methods, defaults to the time module
+    :param reading_time: expected time (s) per reading, used to size the query timeouts
+    """
+
+    def __init__(self, resource, clock=None, reading_time: float = 0.2):
+        self.resource = resource
+        self.clock = time if clock is None else clock
+        self.reading_time = reading_time
+        self.state: Dict[str, object] = {}
+        self.n_writes = 0
+        self.n_readings = 0
+        self.n_skipped = 0
+
+    # -- communication ------------------------------------------------------
+
+    def write(self, command: str) -> None:
+        try:
+            self.resource.write(command)
+            self.n_writes += 1
+        except Exception:
+            self.invalidate()
+            raise
+
+    def query(self, command: str) -> str:
+        try:
+            return self.resource.query(command)
+        except Exception:
+            self.invalidate()
+            raise
+
+    def invalidate(self) -> None:
+        """
+        Forget the cached configuration, the next configuration calls are all sent.
+        """
+        self.state.clear()
+
+    def reconnect(self, resource) -> None:
+        """
+        :param resource: newly opened pyvisa resource
+        """
+        self.resource = resource
+        self.invalidate()
+
+    def reset(self) -> None:
+        """
+        Resets the DMM to its power-on configuration (``*RST``).
+        """
+        self.invalidate()
+        self.write("*RST")
+
+    def check_errors(self) -> List[str]:
+        """
+        Reads the DMM error queue; if there is any error the cache is dropped,
+        since the failing command may have left the DMM in an unknown state.
+
+        :return: error messages
+        """
+        errors = []
+        while True:
+            error = self.query("SYST:ERR?").strip()
+            if not error or error.startswith(("0,", "+0,")):
+                break
+            errors.append(error)
+        if errors:
+            self.invalidate()
+        return errors
+
+    def _configure(self, key: str, value, command: str) -> None:
+        if key in self.state and self.state[key] == value:
+            self.n_skipped += 1
+            return
+        self.write(command)
+        self.state[key] = value
+
+    # -- configuration ------------------------------------------------------
+
+    def configure_voltage(self, voltage_range: Optional[float] = 2) -> None:
+        """
+        DC voltage, one reading per trigger.
+
+        :param voltage_range: (V) None for auto range
+        """
+        if self.state.get("function") != "VOLT:DC":
+            self.write("CONF:VOLT:DC AUTO")
+            # CONF resets the range, the sample count and the trigger
+            for key in ("range", "sample_count", "trigger_delay"):
+                self.state.pop(key, None)
+            self.state.update(function="VOLT:DC", range=None, sample_count=1)
+        if voltage_range is not None:
+            self._configure("range", voltage_range, f"SENS:VOLT:DC:RANG {voltage_range:g}")
+        else:
+            self._configure("range", None, "SENS:VOLT:DC:RANG:AUTO ON")
+
+    def set_sample_count(self, n: int) -> None:
+        self._configure("sample_count", n, f"SAMP:COUN {n}")
+
+    def set_trigger_delay(self, delay: float) -> None:
+        """
+        :param delay: (s) wait before each reading, sets the spacing of the readings
+        """
+        self._configure("trigger_delay", delay, f"TRIG:DEL {delay:g}")
+
+    def set_statistics(self, enabled: bool) -> None:
+        """
+        :param enabled: whether the DMM computes the statistics (CALC:AVER) of its readings
+        """
+        self._configure("statistics", enabled, f"CALC:AVER:STAT {'ON' if enabled else 'OFF'}")
+
+    def set_input_impedance(self, impedance: str) -> None:
+        """
+        :param impedance: "10M" or "10G"
+        """
+        self._configure("impedance", impedance, f"VOLT:DC:IMP {impedance}")
+
+    # -- acquisition --------------------------------------------------------
+
+    def _query(self, command: str, n_readings: int, delay: float = 0) -> str:
+        # The query returns only once all the readings are taken
+        timeout = self.resource.timeout
+        needed = int(1000 * n_readings * (self.reading_time + delay)) + 2000
+        if timeout is not None and needed > timeout:
+            self.resource.timeout = needed
+        try:
+            return self.query(command)
+        finally:
+            self.resource.timeout = timeout
+
+    def read(self) -> float:
+        """
+        :return: one reading (V)
+        """
+        self.set_sample_count(1)
+        value = parse_readings(self._query("READ?", 1))[0]
+        self.n_readings += 1
+        return value
+
+    def acquire(self, n: int, delay: float = 0) -> List[float]:
+        """
+        Takes n readings and fetches them all with one query.
+
+        :param n: number of readings
+        :param delay: (s) wait before each reading
+        :return: list of readings (V)
+        """
+        self.set_sample_count(n)
+        self.set_trigger_delay(delay)
+        readings = parse_readings(self._query("READ?", n, delay))
+        self.n_readings += len(readings)
+        return readings
+
+    def stream(
+        self, n: int, chunk: int = 10, delay: float = 0, poll_interval: float = 0.05, timeout: Optional[float] = None
+    ) -> Iterator[List[float]]:
+        """
+        Starts an acquisition of n readings and yields them in chunks as the DMM takes them.
+
+        :param n: total number of readings
+        :param chunk: number of readings fetched at once
+        :param delay: (s) wait before each reading
+        :param poll_interval: (s) minimum wait between two polls of the reading memory
+        :param timeout: (s) deadline for the whole acquisition, if None the expected
+            acquisition time + 2 s, or resource.timeout when longer (as for the queries)
+        :return: iterator over lists of readings (V)
+        :raises DMMTimeoutError: if the n readings are not taken before the deadline, the acquisition is aborted
+        """
+        if timeout is None:
+            timeout = n * (self.reading_time + delay) + 2
+            if self.resource.timeout is not None:
+                timeout = max(timeout, self.resource.timeout / 1000)
+        self.set_sample_count(n)
+        self.set_trigger_delay(delay)
+        self.write("INIT")
+        deadline = self.clock.time() + timeout
+        remaining = n
+        while remaining > 0:
+            available = int(self.query("DATA:POIN?"))
+            missing = min(chunk, remaining) - available
+            if missing > 0:
+                now = self.clock.time()
+                if now >= deadline:
+                    self.abort()
+                    raise DMMTimeoutError(f"DMM stream: {n - remaining + max(available, 0)}/{n} readings after {timeout:.1f} s")
+                # Sleep about as long as the missing readings take
+                self.clock.sleep(min(max(poll_interval, missing * (self.reading_time + delay)), deadline - now))
+                continue
+            readings = parse_readings(self.query(f"R? {min(available, remaining)}"))
+            remaining -= len(readings)
+            self.n_readings += len(readings)
+            yield readings
+
+    def abort(self) -> None:
+        """
+        Stops an acquisition started by :meth:`stream`.
+        """
+        self.write("ABOR")
+
+    def wait_statistics(self, n: int, timeout: Optional[float] = None, poll_interval: float = 0.02, max_interval: float = 0.5) -> None:
+        """
+        Waits until the DMM statistics include n readings.
+
+        Sleeps for the expected acquisition time, then polls CALC:AVER:COUN?
+        with an interval doubling from poll_interval up to max_interval.
+
+        :param n: number of readings
+        :param timeout: (s) deadline, twice the expected acquisition time + 2 s if None
+        :param poll_interval: (s) first wait between two polls
+        :param max_interval: (s) longest wait between two polls
+        """
+        expected = n * self.reading_time
+        timeout = 2 * expected + 2 if timeout is None else timeout
+        deadline = self.clock.time() + timeout
+        self.clock.sleep(min(expected, timeout))
+        interval = poll_interval
+        while True:
+            count = int(float(self.query("CALC:AVER:COUN?")))
+            if count >= n:
+                return
+            now = self.clock.time()
+            if now >= deadline:
+                self.abort()
+                raise DMMTimeoutError(f"DMM statistics: {count}/{n} readings after {timeout:.1f} s")
+            self.clock.sleep(min(interval, deadline - now))
+            interval = min(2 * interval, max_interval)
+
+    def statistics(self, n: int, timeout: Optional[float] = None) -> Tuple[float, float]:
+        """
+        Takes n readings and lets the DMM compute their mean and standard deviation.
+        Returns as soon as the n readings are taken.
+
+        :param n: number of readings
+        :param timeout: (s) deadline for the acquisition, see :meth:`wait_statistics`
+        :return: (mean, standard deviation) in V
+        """
+        self.set_sample_count(n)
+        self.set_trigger_delay(0)
+        self.set_statistics(True)
+        self.write("CALC:AVER:CLE")
+        self.write("INIT")
+        self.wait_statistics(n, timeout)
+        response = self.query("CALC:AVER:ALL?").split(",")
+        self.n_readings += n
+        return float(response[0]), float(response[1])
@@ -0,0 +1,103 @@
+import math
+from typing import List, NamedTuple, Optional, Sequence
+
+
+class SettlePolicy:
+    """
+    When to consider the voltage read by the DMM settled after an HV or relay change.
+
+    Readings are taken in chunks of ``chunk`` readings. The last three chunk means
+    m0, m1, m2 approach the final value like an RC exponential: their differences
+    shrink by a constant ratio r = (m2 - m1) / (m1 - m0), and the distance left to
+    the asymptote is (m2 - m1) * r / (1 - r) (Aitken extrapolation). The voltage is
+    settled when that predicted residual is below ``fraction`` times the standard
+    deviation of the readings (pooled over the last three chunks, or the known noise of
+    the meter if that is larger). When the differences are dominated by noise (r not
+    between 0 and 1) the slope criterion is used instead: settled when
+    |m2 - m1| is below ``fraction`` times the standard deviation.
+
+    :param max_wait: (s) safety cap, the step is abandoned as unsettled after that
+    :param min_wait: (s) wait before the first reading
+    :param chunk: readings per chunk
+    :param fraction: allowed residual, as a fraction of the standard deviation of the readings
+    :param noise: (V) known noise of a single reading, 0 if unknown
+    """
+
+    def __init__(self, max_wait: float, min_wait: float = 0, chunk: int = 5, fraction: float = 0.5, noise: float = 0):
+        self.max_wait = max_wait
+        self.min_wait = min_wait
+        self.chunk = chunk
+        self.fraction = fraction
+        self.noise = noise
+
+
+# After an HV_SET and after a relay switch; the caps are the waits used before
+HV_SETTLE = SettlePolicy(max_wait=10, min_wait=0.5)
+RELAY_SETTLE = SettlePolicy(max_wait=2, chunk=3)
+
+
+class SettleResult(NamedTuple):
+    settled: bool
+    elapsed: float  # (s) from the start of the wait
+    n_readings: int
+    last_mean: Optional[float]  # (V) mean of the last chunk
+    residual: Optional[float]  # (V) predicted distance to the final value
+
+
+def predicted_residual(means: Sequence[float]) -> float:
+    """
+    :param means: means of the last three chunks, oldest first
+    :return: (V) predicted distance between the last mean and the final value
+    """
+    m0, m1, m2 = means[-3:]
+    step = m2 - m1
+    previous = m1 - m0
+    if previous != 0:
+        ratio = step / previous
+        if 0 < ratio < 1:
+            return abs(step) * ratio / (1 - ratio)
+    # Not an exponential approach (noise dominated), use the slope
+    return abs(step)
+
+
+def _sdev(values: Sequence[float]) -> float:
+    if len(values) < 2:
+        return 0.0
+    mean = sum(values) / len(values)
+    return math.sqrt(sum((v - mean) ** 2 for v in values) / (len(values) - 1))
+
+
+def wait_settled(meter, policy: SettlePolicy, clock) -> SettleResult:
+    """
+    Takes readings until the voltage is settled or policy.max_wait has passed.
+
+    :param meter: (sdm3055.SDM3055) configured for DC voltage
+    :param policy: (SettlePolicy)
+    :param clock: object with ``time()`` and ``sleep()`` methods
+    :return: (SettleResult)
+    """
+    start = clock.time()
+    clock.sleep(policy.min_wait)
+    means: List[float] = []
+    spreads: List[float] = []
+    n_readings = 0
+    residual = None
+    while True:
+        readings = meter.acquire(policy.chunk)
+        if not readings:
+            # Nothing from the DMM: give up on this wait, unsettled
+            return SettleResult(False, clock.time() - start, n_readings, means[-1] if means else None, residual)
+        n_readings += len(readings)
+        means.append(sum(readings) / len(readings))
+        # Noise of a single reading: pooled spread of the last three chunks (the minimum
+        # would be biased low), never below the known noise of the meter
+        spreads.append(_sdev(readings))
+        recent = spreads[-3:]
+        noise = max(math.sqrt(sum(s**2 for s in recent) / len(recent)), policy.noise)
+        elapsed = clock.time() - start
+        if len(means) >= 3:
+            residual = predicted_residual(means)
+            if residual <= policy.fraction * noise:
+                return SettleResult(True, elapsed, n_readings, means[-1], residual)
+        if elapsed >= policy.max_wait:
+            return SettleResult(False, elapsed, n_readings, means[-1], residual)
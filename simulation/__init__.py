@@ -0,0 +1,13 @@
+from .arduino import ArduinoEmulator, EmulatedSerial, PtyArduino
+from .dmm import SCPIServer, SimulatedDMM, SimulatedResource
+from .stand import StandModel
+
+__all__ = [
+    "ArduinoEmulator",
+    "EmulatedSerial",
+    "PtyArduino",
+    "StandModel",
+    "SimulatedDMM",
+    "SimulatedResource",
+    "SCPIServer",
+]
@@ -0,0 +1,27 @@
+import argparse
+
+from .arduino import ArduinoEmulator, PtyArduino
+from .dmm import SCPIServer, SimulatedDMM
+from .stand import StandModel
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulated test stand: emulated Arduino on a pty and DMM over TCP")
+    parser.add_argument("--dmm-port", type=int, default=5025, help="TCP port of the simulated DMM")
+    parser.add_argument("--reading-time", type=float, default=0.1, help="Seconds per DMM reading")
+    parser.add_argument("--noise", type=float, default=20e-6, help="DMM reading noise (V)")
+    parser.add_argument("--resistance", type=float, default=5000e6, help="Resistance behind every relay (Ohm)")
+    args = parser.parse_args()
+
+    emulator = ArduinoEmulator()
+    stand = StandModel(resistances=[args.resistance] * 8).attach(emulator)
+    pty_arduino = PtyArduino(emulator)
+    pty_arduino.start()
+    server = SCPIServer(SimulatedDMM(stand, reading_time=args.reading_time, noise=args.noise), ("127.0.0.1", args.dmm_port))
+
+    print(f"Arduino: export ARDUINO_PORT={pty_arduino.port}")
+    print(f"DMM:     export DMM_RESOURCE={server.resource_name}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+        pty_arduino.stop()
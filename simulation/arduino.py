@@ -0,0 +1,261 @@
+import argparse
+import os
+import select
+import struct
+import threading
+import time
+import tty
+from typing import Callable, List, Optional
+
+from robust_serial import Order
+
+N_RELAYS = 8
+
+
+class ArduinoEmulator:
+    """
+    Software stand-in for arduino/arduino-board/slave/slave.cpp.
+
+    Bytes written by the computer go to :meth:`receive`, the bytes the firmware
+    would send back (binary orders and its Serial.println debug text) are
+    accumulated in :attr:`output`. The emulator keeps the state of the stand:
+    DAC value of the HV supply and which relay is closed.
+
+    :param boot_hello: send the HELLO the firmware sends from setup() before the computer connects
+    :param debug_prints: include the firmware's debug text in the output
+    """
+
+    def __init__(self, boot_hello: bool = True, debug_prints: bool = True):
+        self.debug_prints = debug_prints
+        self.is_connected = False
+        self.hv_dac = 0
+        self.relay: Optional[int] = None  # closed relay, None if all are open
+        self.output = bytearray()
+        self.lock = threading.Lock()
+        self.listeners: List[Callable[["ArduinoEmulator"], None]] = []
+        self.n_orders = 0
+        self._parser = self._firmware()
+        next(self._parser)
+        if boot_hello:
+            self._write_order(Order.HELLO)
+
+    def receive(self, data: bytes) -> None:
+        """
+        :param data: bytes sent by the computer
+        """
+        with self.lock:
+            for byte in data:
+                self._parser.send(byte)
+
+    def take_output(self, n: Optional[int] = None) -> bytes:
+        """
+        :param n: maximum number of bytes, everything if None
+        :return: bytes sent by the "Arduino", removed from the output buffer
+        """
+        with self.lock:
+            n = len(self.output) if n is None else min(n, len(self.output))
+            data = bytes(self.output[:n])
+            del self.output[:n]
+            return data
+
+    def _write_order(self, order: Order) -> None:
+        self.output.append(order.value)
+
+    def _write_i8(self, value: int) -> None:
+        self.output.append(value & 0xFF)
+
+    def _write_i16(self, value: int) -> None:
+        self.output += struct.pack("<h", value)
+
+    def _println(self, text: str) -> None:
+        if self.debug_prints:
+            self.output += text.encode("ascii") + b"\r\n"
+
+    def _changed(self) -> None:
+        for listener in self.listeners:
+            listener(self)
+
+    def _firmware(self):
+        """
+        Coroutine receiving one byte at a time, mirrors get_messages_from_serial().
+        """
+        while True:
+            order_byte = yield
+            is_sequenced = False
+            seq = 0
+            if order_byte == Order.SEQ.value:
+                seq = yield
+                is_sequenced = True
+                order_byte = yield
+            self.n_orders += 1
+            self._println(f">> Arduino: Received order{order_byte}")
+
+            if order_byte == Order.HELLO.value:
+                if not self.is_connected:
+                    self.is_connected = True
+                    self._write_order(Order.HELLO)
+                else:
+                    self._write_order(Order.ALREADY_CONNECTED)
+            elif order_byte == Order.ALREADY_CONNECTED.value:
+                self.is_connected = True
+            elif order_byte == Order.RELAY.value:
+                relay = yield
+                if relay < N_RELAYS:
+                    self.relay = relay
+                    self._changed()
+                self._println("Sending READY_RELAY")
+                self._write_order(Order.READY_RELAY)
+            elif order_byte == Order.OPEN_RELAYS.value:
+                self.relay = None
+                self._changed()
+                self._write_order(Order.READY_RELAY)
+            elif order_byte == Order.HV_SET.value:
+                self.hv_dac = yield
+                self._changed()
+                self._write_order(Order.HV_UPDATED)
+                self._write_i8(self.hv_dac)
+            elif order_byte == Order.READY_RELAY.value:
+                self._write_order(Order.READY_RELAY)
+                self._println("Sending  READY_RELAY")
+            elif order_byte in (Order.START_TEST.value, Order.PAUSE_TEST.value, Order.DATA_UPDATE.value):
+                pass
+            elif order_byte == Order.HV_UPDATED.value:
+                self._println(">> Arduino: HV_UPDATED received")
+                self._write_order(Order.HV_UPDATED)
+            else:
+                # Unknown order
+                if is_sequenced:
+                    self._write_order(Order.NACK)
+                    self._write_i8(seq)
+                else:
+                    self._write_order(Order.ERROR)
+                self._write_i16(404)
+                continue
+
+            # Confirm the reception
+            if is_sequenced:
+                self._write_order(Order.ACK)
+                self._write_i8(seq)
+            else:
+                self._write_order(Order.RECEIVED)
+
+
+class EmulatedSerial:
+    """
+    In-memory file object connected to an :class:`ArduinoEmulator`.
+
+    Implements the part of the serial.Serial interface used by robust_serial,
+    TestingProcess and the threads. The emulator answers synchronously,
+    so reads never have to wait: if nothing is there, nothing will come.
+    With a clock, an empty read still lets ``timeout`` seconds pass on that clock,
+    like a real port would.
+
+    :param emulator: (ArduinoEmulator) a new one is created if None
+    :param clock: object with a ``sleep()`` method (e.g. clock.VirtualClock), None to never wait
+    """
+
+    def __init__(self, emulator: Optional[ArduinoEmulator] = None, clock=None):
+        self.emulator = ArduinoEmulator() if emulator is None else emulator
+        self.clock = clock
+        self.is_open = True
+        self.timeout = 0.1
+        self.bytes_written = 0
+        self.n_writes = 0
+        self.n_reads = 0
+
+    @property
+    def in_waiting(self) -> int:
+        return len(self.emulator.output)
+
+    def write(self, data: bytes) -> int:
+        self.n_writes += 1
+        self.bytes_written += len(data)
+        self.emulator.receive(data)
+        return len(data)
+
+    def read(self, size: int = 1) -> bytes:
+        self.n_reads += 1
+        data = self.emulator.take_output(size)
+        if not data and self.clock is not None and self.timeout:
+            self.clock.sleep(self.timeout)
+        return data
+
+    def read_until(self, expected: bytes = b"\n", size: Optional[int] = None) -> bytes:
+        data = bytearray()
+        while size is None or len(data) < size:
+            byte = self.read(1)
+            if not byte:
+                break
+            data += byte
+            if data.endswith(expected):
+                break
+        return bytes(data)
+
+    def reset_input_buffer(self) -> None:
+        self.emulator.take_output()
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.is_open = False
+
+
+class PtyArduino(threading.Thread):
+    """
+    Serves an :class:`ArduinoEmulator` on a pseudo terminal.
+
+    :attr:`port` is a device path that can be given to open_serial_port(),
+    TestingProcess or the ARDUINO_PORT environment variable, exactly like /dev/ttyACM0.
+
+    :param emulator: (ArduinoEmulator) a new one is created if None
+    :param baudrate: emulated line speed (bytes are paced at 10 bits per byte), None for no pacing
+    """
+
+    def __init__(self, emulator: Optional[ArduinoEmulator] = None, baudrate: Optional[int] = 115200):
+        super().__init__(daemon=True)
+        self.emulator = ArduinoEmulator() if emulator is None else emulator
+        self.byte_time = 0 if baudrate is None else 10 / baudrate
+        self.master_fd, self.slave_fd = os.openpty()
+        tty.setraw(self.slave_fd)
+        self.port = os.ttyname(self.slave_fd)
+        self.exit_event = threading.Event()
+
+    def run(self) -> None:
+        while not self.exit_event.is_set():
+            readable, _, _ = select.select([self.master_fd], [], [], 0.1)
+            if readable:
+                try:
+                    data = os.read(self.master_fd, 1024)
+                except OSError:
+                    break
+                if self.byte_time:
+                    time.sleep(len(data) * self.byte_time)
+                self.emulator.receive(data)
+            reply = self.emulator.take_output()
+            if reply:
+                if self.byte_time:
+                    time.sleep(len(reply) * self.byte_time)
+                os.write(self.master_fd, reply)
+
+    def stop(self) -> None:
+        self.exit_event.set()
+        self.join()
+        os.close(self.master_fd)
+        os.close(self.slave_fd)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Emulate the test stand Arduino on a pseudo terminal")
+    parser.add_argument("--baudrate", type=int, default=115200, help="Emulated line speed, 0 to disable pacing")
+    parser.add_argument("--quiet", action="store_true", default=False, help="Do not send the firmware debug prints")
+    args = parser.parse_args()
+
+    pty_arduino = PtyArduino(ArduinoEmulator(debug_prints=not args.quiet), baudrate=args.baudrate or None)
+    pty_arduino.start()
+    print(f"Emulated Arduino on {pty_arduino.port} (export ARDUINO_PORT={pty_arduino.port})")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pty_arduino.stop()
@@ -0,0 +1,54 @@
+import argparse
+import time
+from typing import Optional, Sequence
+
+from clock import VirtualClock
+
+from .arduino import ArduinoEmulator, EmulatedSerial
+from .dmm import SimulatedDMM, SimulatedResource
+from .stand import StandModel
+
+
+def simulated_process(
+    clock=None,
+    resistances: Optional[Sequence[float]] = None,
+    file_path: Optional[str] = None,
+    **dmm_kwargs,
+):
+    """
+    Builds a TestingProcess wired to an in-memory emulated Arduino and simulated DMM
+    sharing one clock (a VirtualClock if None), so the procedure runs without waiting.
+
+    :param clock: clock shared by the process and the simulated devices
+    :param resistances: resistance behind each relay (Ohm)
+    :param file_path: where to save the CSV, None to not save
+    :param dmm_kwargs: passed to SimulatedDMM (reading_time, noise, channel_noise, seed...)
+    :return: (TestProc01.TestingProcess)
+    """
+    from TestProc01 import TestingProcess
+
+    clock = VirtualClock() if clock is None else clock
+    emulator = ArduinoEmulator()
+    stand = StandModel(resistances, clock=clock).attach(emulator)
+    serial_file = EmulatedSerial(emulator, clock=clock)
+    dmm = SimulatedResource(SimulatedDMM(stand, clock=clock, **dmm_kwargs))
+    return TestingProcess("emulated", dmm.resource_name, file_path, clock=clock, serial_file=serial_file, dmm=dmm)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a test plan against the simulated stand on a virtual clock")
+    parser.add_argument("--reading-time", type=float, default=0.1, help="Seconds per DMM reading")
+    parser.add_argument("--noise", type=float, default=20e-6, help="DMM reading noise (V)")
+    parser.add_argument("--plan", default="standard", help="Plan file (JSON / YAML) or built-in plan name")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    tester = simulated_process(reading_time=args.reading_time, noise=args.noise)
+    tester.run_plan(args.plan)
+    wall_time = time.perf_counter() - start
+
+    print(f"Points measured:     {len(tester.data)}")
+    print(f"Simulated duration:  {tester.clock.elapsed():.1f} s")
+    print(f"Wall time:           {wall_time:.3f} s")
+    print(f"DMM commands:        {tester.dmm.dmm.n_commands}")
+    print(f"Serial writes/reads: {tester.serial_file.n_writes}/{tester.serial_file.n_reads}")
@@ -0,0 +1,424 @@
+import argparse
+import math
+import random
+import socketserver
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Sequence
+
+from .stand import StandModel
+
+IDN = "Siglent Technologies,SDM3055-SIM,SDM35SIM000001,1.01.01.25"
+OVERLOAD = 9.9e37
+
+# Long SCPI keywords -> short form (the short form is what the handlers use)
+KEYWORDS = {
+    "CONFIGURE": "CONF",
+    "SENSE": "SENS",
+    "VOLTAGE": "VOLT",
+    "RANGE": "RANG",
+    "SAMPLE": "SAMP",
+    "COUNT": "COUN",
+    "CALCULATE": "CALC",
+    "AVERAGE": "AVER",
+    "STATE": "STAT",
+    "CLEAR": "CLE",
+    "INITIATE": "INIT",
+    "FETCH": "FETC",
+    "TRIGGER": "TRIG",
+    "DELAY": "DEL",
+    "ABORT": "ABOR",
+    "SOURCE": "SOUR",
+    "MEASURE": "MEAS",
+    "SYSTEM": "SYST",
+    "ERROR": "ERR",
+    "IMPEDANCE": "IMP",
+    "INPUT": "INP",
+    "POINTS": "POIN",
+    "SDEVIATION": "SDEV",
+    "MINIMUM": "MIN",
+    "MAXIMUM": "MAX",
+}
+
+
+def normalize_header(header: str) -> str:
+    """
+    :param header: SCPI header, e.g. "sense:voltage:dc:range"
+    :return: short upper case form without the optional SENS root, e.g. "VOLT:DC:RANG"
+    """
+    parts = [KEYWORDS.get(part, part) for part in header.upper().strip(":").split(":")]
+    if parts and parts[0] == "SENS":
+        parts = parts[1:]
+    return ":".join(parts)
+
+
+class SimulatedDMM:
+    """
+    SCPI engine emulating the Siglent SDM3055 commands used by TestingProcess.
+
+    Readings come from a :class:`StandModel` (HV, relays, resistors, RC settling),
+    plus Gaussian noise. Every reading takes ``reading_time`` seconds of instrument time,
+    every command ``command_latency`` seconds (the USBTMC / LAN round trip).
+
+    :param stand: (StandModel) a new one is created if None
+    :param reading_time: time (s) to take one reading
+    :param command_latency: time (s) spent per command
+    :param noise: standard deviation (V) of the reading noise
+    :param channel_noise: extra noise (V) per relay, e.g. for a noisy resistor
+    :param seed: seed of the noise generator, for reproducible runs
+    :param clock: object with ``time()`` and ``sleep()`` methods, defaults to the time module
+    """
+
+    def __init__(
+        self,
+        stand: Optional[StandModel] = None,
+        reading_time: float = 0.1,
+        command_latency: float = 0.001,
+        noise: float = 20e-6,
+        channel_noise: Optional[Sequence[float]] = None,
+        seed: Optional[int] = 0,
+        clock=None,
+    ):
+        self.clock = time if clock is None else clock
+        self.stand = StandModel(clock=self.clock) if stand is None else stand
+        self.reading_time = reading_time
+        self.command_latency = command_latency
+        self.noise = noise
+        self.channel_noise = list(channel_noise) if channel_noise is not None else []
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.n_commands = 0
+        self.n_readings = 0
+        self.handlers: Dict[str, Callable[[List[str]], Optional[str]]] = {
+            "*IDN?": lambda args: IDN,
+            "*RST": self._reset,
+            "*CLS": self._clear_status,
+            "*OPC?": self._operation_complete,
+            "*STB?": lambda args: str(self._status_byte()),
+            "*ESR?": self._event_status,
+            "SYST:ERR?": self._next_error,
+            "CONF:VOLT:DC": self._configure,
+            "VOLT:DC:RANG": self._set_range,
+            "VOLT:DC:RANG?": lambda args: f"{self.range:E}",
+            "VOLT:DC:RANG:AUTO": self._set_auto_range,
+            "VOLT:DC:IMP": self._set_impedance,
+            "VOLT:DC:IMP?": lambda args: "10G" if self.stand.input_impedance > 1e9 else "10M",
+            "SYST:INP:Z": self._set_impedance,
+            "SAMP:COUN": self._set_sample_count,
+            "SAMP:COUN?": lambda args: str(self.sample_count),
+            "TRIG:SOUR": self._set_trigger_source,
+            "TRIG:SOUR?": lambda args: self.trigger_source,
+            "TRIG:DEL": self._set_trigger_delay,
+            "TRIG:DEL?": lambda args: f"{self.trigger_delay:E}",
+            "INIT": self._initiate,
+            "ABOR": self._abort,
+            "READ?": self._read,
+            "FETC?": self._fetch,
+            "MEAS:VOLT:DC?": self._measure,
+            "DATA:POIN?": lambda args: str(self._points()),
+            "R?": self._read_and_erase,
+            "CALC:AVER:STAT": self._set_statistics,
+            "CALC:AVER:STAT?": lambda args: "1" if self.statistics else "0",
+            "CALC:AVER:CLE": self._clear_statistics,
+            "CALC:AVER:ALL?": self._statistics_all,
+            "CALC:AVER:AVER?": lambda args: f"{self._statistics()[0]:E}",
+            "CALC:AVER:SDEV?": lambda args: f"{self._statistics()[1]:E}",
+            "CALC:AVER:MIN?": lambda args: f"{self._statistics()[2]:E}",
+            "CALC:AVER:MAX?": lambda args: f"{self._statistics()[3]:E}",
+            "CALC:AVER:COUN?": lambda args: str(len(self._statistics_readings())),
+        }
+        self._reset([])
+
+    # -- state --------------------------------------------------------------
+
+    def _reset(self, args: List[str]) -> None:
+        self.function = "VOLT:DC"
+        self.range = 0.0  # 0 -> auto range
+        self.sample_count = 1
+        self.trigger_source = "IMM"
+        self.trigger_delay = 0.0
+        self.statistics = False
+        self.stats_start = 0  # index in the acquisition of the first reading in the statistics
+        self.errors: deque = deque()
+        self.event_status = 0
+        self.acquisition_start: Optional[float] = None
+        self.acquisition: List[float] = []  # reading times of the current acquisition
+        self.acquisition_values: List[float] = []
+        self.memory: deque = deque()  # (time, value) readings not fetched with R? yet
+        self.taken = 0  # readings of the current acquisition already moved to memory
+
+    def _clear_status(self, args: List[str]) -> None:
+        self.errors.clear()
+        self.event_status = 0
+
+    def _error(self, code: int, message: str) -> None:
+        self.errors.append(f'{code},"{message}"')
+        self.event_status |= 0x20  # command error
+
+    def _status_byte(self) -> int:
+        return (0x04 if self.errors else 0) | (0x20 if self.event_status else 0)
+
+    def _event_status(self, args: List[str]) -> str:
+        value, self.event_status = self.event_status, 0
+        return str(value)
+
+    def _next_error(self, args: List[str]) -> str:
+        return self.errors.popleft() if self.errors else '0,"No error"'
+
+    # -- configuration ------------------------------------------------------
+
+    def _configure(self, args: List[str]) -> None:
+        self.function = "VOLT:DC"
+        self.range = self._parse_range(args[0]) if args else 0.0
+        self.sample_count = 1
+        self.trigger_source = "IMM"
+        self.trigger_delay = 0.0
+
+    def _parse_range(self, text: str) -> float:
+        if text.upper() in ("AUTO", "DEF"):
+            return 0.0
+        return float(text.upper().rstrip("V").replace("M", "e-3"))
+
+    def _set_range(self, args: List[str]) -> None:
+        self.range = self._parse_range(args[0])
+
+    def _set_auto_range(self, args: List[str]) -> None:
+        if args[0].upper() in ("ON", "1", "ONCE"):
+            self.range = 0.0
+
+    def _set_impedance(self, args: List[str]) -> None:
+        text = args[0].upper()
+        self.stand.input_impedance = 10e9 if text in ("10G", "1E10", "10E9") else 10e6
+
+    def _set_sample_count(self, args: List[str]) -> None:
+        self.sample_count = max(1, int(float(args[0])))
+
+    def _set_trigger_source(self, args: List[str]) -> None:
+        self.trigger_source = args[0].upper()[:3]
+
+    def _set_trigger_delay(self, args: List[str]) -> None:
+        self.trigger_delay = max(0.0, float(args[0]))
+
+    def _set_statistics(self, args: List[str]) -> None:
+        self.statistics = args[0].upper() in ("ON", "1")
+        self._clear_statistics([])
+
+    def _clear_statistics(self, args: List[str]) -> None:
+        self._collect()
+        self.stats_start = len(self.acquisition_values)
+
+    # -- acquisition --------------------------------------------------------
+
+    def _sample(self, t: float) -> float:
+        value = self.stand.voltage(t)
+        sigma = self.noise
+        if self.stand.relay is not None and self.stand.relay < len(self.channel_noise):
+            sigma = math.hypot(sigma, self.channel_noise[self.stand.relay])
+        value += self.random.gauss(0.0, sigma)
+        self.n_readings += 1
+        if self.range and abs(value) > 1.2 * self.range:
+            return OVERLOAD
+        return value
+
+    def _initiate(self, args: List[str]) -> None:
+        start = self.clock.time()
+        self.acquisition_start = start
+        period = self.reading_time + self.trigger_delay
+        self.acquisition = [start + (i + 1) * period for i in range(self.sample_count)]
+        self.acquisition_values = []
+        self.memory.clear()
+        self.taken = 0
+        self.stats_start = 0
+
+    def _abort(self, args: List[str]) -> None:
+        self._collect()
+        del self.acquisition[self.taken :]
+
+    def _collect(self) -> None:
+        """
+        Turn the readings completed by now into values.
+        """
+        if self.acquisition_start is None:
+            return
+        now = self.clock.time()
+        while self.taken < len(self.acquisition) and self.acquisition[self.taken] <= now:
+            t = self.acquisition[self.taken]
+            value = self._sample(t)
+            self.acquisition_values.append(value)
+            self.memory.append((t, value))
+            self.taken += 1
+
+    def _wait_complete(self) -> None:
+        if self.acquisition_start is None:
+            self._initiate([])
+        if not self.acquisition:
+            return
+        remaining = self.acquisition[-1] - self.clock.time()
+        if remaining > 0:
+            self.clock.sleep(remaining)
+        self._collect()
+
+    def _points(self) -> int:
+        self._collect()
+        return len(self.memory)
+
+    def _format(self, values: Sequence[float]) -> str:
+        return ",".join(f"{value:E}" for value in values)
+
+    def _fetch(self, args: List[str]) -> str:
+        self._wait_complete()
+        return self._format(self.acquisition_values)
+
+    def _read(self, args: List[str]) -> str:
+        self._initiate([])
+        return self._fetch(args)
+
+    def _measure(self, args: List[str]) -> str:
+        self._configure(args)
+        return self._read([])
+
+    def _read_and_erase(self, args: List[str]) -> str:
+        self._collect()
+        n = int(args[0]) if args else len(self.memory)
+        values = [self.memory.popleft()[1] for _ in range(min(n, len(self.memory)))]
+        data = self._format(values)
+        length = str(len(data))
+        return f"#{len(length)}{length}{data}"
+
+    def _operation_complete(self, args: List[str]) -> str:
+        if self.acquisition_start is not None:
+            self._wait_complete()
+        return "1"
+
+    def _statistics_readings(self) -> List[float]:
+        self._collect()
+        if not self.statistics:
+            return []
+        return self.acquisition_values[self.stats_start :]
+
+    def _statistics(self) -> List[float]:
+        values = self._statistics_readings()
+        if not values:
+            return [0.0, 0.0, 0.0, 0.0]
+        mean = sum(values) / len(values)
+        sdev = math.sqrt(sum((v - mean) ** 2 for v in values) / (len(values) - 1)) if len(values) > 1 else 0.0
+        return [mean, sdev, min(values), max(values)]
+
+    def _statistics_all(self, args: List[str]) -> str:
+        return self._format(self._statistics())
+
+    # -- entry point --------------------------------------------------------
+
+    def handle(self, message: str) -> Optional[str]:
+        """
+        :param message: one SCPI message (several commands can be separated by ';')
+        :return: response of the queries, None if there is nothing to read
+        """
+        responses = []
+        with self.lock:
+            for command in message.strip().split(";"):
+                command = command.strip()
+                if not command:
+                    continue
+                self.n_commands += 1
+                if self.command_latency:
+                    self.clock.sleep(self.command_latency)
+                header, _, arguments = command.partition(" ")
+                key = normalize_header(header) if not header.startswith("*") else header.upper()
+                handler = self.handlers.get(key)
+                if handler is None:
+                    self._error(-113, "Undefined header")
+                    continue
+                args = [arg.strip() for arg in arguments.split(",") if arg.strip()]
+                try:
+                    response = handler(args)
+                except (ValueError, IndexError):
+                    self._error(-224, "Illegal parameter value")
+                    continue
+                if response is not None:
+                    responses.append(response)
+        return ";".join(responses) if responses else None
+
+
+class SimulatedResource:
+    """
+    In-process replacement for a pyvisa MessageBasedResource connected to a :class:`SimulatedDMM`.
+
+    :param dmm: (SimulatedDMM) a new one is created if None
+    """
+
+    def __init__(self, dmm: Optional[SimulatedDMM] = None):
+        self.dmm = SimulatedDMM() if dmm is None else dmm
+        self.timeout = 2000
+        self.write_termination = "\n"
+        self.read_termination = "\n"
+        self.output: deque = deque()
+        self.resource_name = "SIM::SDM3055::INSTR"
+
+    def write(self, message: str) -> int:
+        # A new message discards the unread response (IEEE 488.2 query interrupted)
+        self.output.clear()
+        response = self.dmm.handle(message)
+        if response is not None:
+            self.output.append(response)
+        return len(message)
+
+    def read(self) -> str:
+        if not self.output:
+            raise TimeoutError("VI_ERROR_TMO (-1073807339): Timeout expired before operation completed.")
+        return self.output.popleft()
+
+    def query(self, message: str) -> str:
+        self.write(message)
+        return self.read()
+
+    def clear(self) -> None:
+        self.output.clear()
+
+    def close(self) -> None:
+        pass
+
+
+class SCPIServer(socketserver.ThreadingTCPServer):
+    """
+    Serves a :class:`SimulatedDMM` over TCP, one SCPI message per line.
+    Open it with pyvisa as ``TCPIP::<host>::<port>::SOCKET``.
+
+    :param dmm: (SimulatedDMM)
+    :param address: (host, port) to listen on
+    """
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, dmm: SimulatedDMM, address=("127.0.0.1", 5025)):
+        self.dmm = dmm
+        super().__init__(address, _SCPIHandler)
+
+    @property
+    def resource_name(self) -> str:
+        host, port = self.server_address[:2]
+        return f"TCPIP::{host}::{port}::SOCKET"
+
+
+class _SCPIHandler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        for line in self.rfile:
+            response = self.server.dmm.handle(line.decode("ascii", errors="replace"))
+            if response is not None:
+                self.wfile.write(response.encode("ascii") + b"\n")
+                self.wfile.flush()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulated Siglent SDM3055 served over TCP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5025)
+    parser.add_argument("--reading-time", type=float, default=0.1, help="Seconds per reading")
+    parser.add_argument("--noise", type=float, default=20e-6, help="Reading noise (V)")
+    args = parser.parse_args()
+
+    server = SCPIServer(SimulatedDMM(reading_time=args.reading_time, noise=args.noise), (args.host, args.port))
+    print(f"Simulated DMM on {server.resource_name}")
+    server.serve_forever()
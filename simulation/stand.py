@@ -0,0 +1,89 @@
+import math
+import time
+from typing import Optional, Sequence
+
+from .arduino import N_RELAYS, ArduinoEmulator
+
+
+class StandModel:
+    """
+    Electrical model of a test stand: HV supply, one resistor per relay and the pickoff resistor.
+
+    The DMM reads the voltage across the pickoff resistor,
+    V = -HV * R_pickoff / (R + R_pickoff), with the DMM input impedance in parallel with R_pickoff.
+    After every HV or relay change the voltage approaches its new value
+    exponentially (RC settling of the HV supply and of the cabling).
+
+    :param resistances: resistance behind each relay (Ohm)
+    :param r_pickoff: pickoff resistor (Ohm)
+    :param volts_per_unit: HV volts per DAC unit
+    :param hv_tau: time constant (s) of the settling after an HV change
+    :param relay_tau: time constant (s) of the settling after a relay change
+    :param clock: object with a ``time()`` method, defaults to the time module
+    """
+
+    def __init__(
+        self,
+        resistances: Optional[Sequence[float]] = None,
+        r_pickoff: float = 1.47e6,
+        volts_per_unit: float = 2000 / 255,
+        hv_tau: float = 1.5,
+        relay_tau: float = 0.3,
+        clock=None,
+    ):
+        self.resistances = list(resistances) if resistances is not None else [5000e6] * N_RELAYS
+        self.r_pickoff = r_pickoff
+        self.volts_per_unit = volts_per_unit
+        self.hv_tau = hv_tau
+        self.relay_tau = relay_tau
+        self.clock = time if clock is None else clock
+        self.hv_dac = 0
+        self.relay: Optional[int] = None
+        # The stand DMM input is set to 10 GOhm (SYST:INP:Z 1E10, a system setting *RST keeps)
+        self.input_impedance = 10e9
+        self.start_voltage = 0.0
+        self.change_time = self.clock.time()
+        self.tau = relay_tau
+
+    def attach(self, emulator: ArduinoEmulator) -> "StandModel":
+        """
+        Follow the HV and relay state of an emulated Arduino.
+
+        :param emulator: (ArduinoEmulator)
+        :return: self
+        """
+        emulator.listeners.append(self.update)
+        return self
+
+    def update(self, emulator: ArduinoEmulator) -> None:
+        """
+        Listener called by the emulator after each HV or relay order.
+        """
+        if emulator.hv_dac == self.hv_dac and emulator.relay == self.relay:
+            return
+        now = self.clock.time()
+        self.start_voltage = self.voltage(now)
+        self.tau = self.hv_tau if emulator.hv_dac != self.hv_dac else self.relay_tau
+        self.hv_dac = emulator.hv_dac
+        self.relay = emulator.relay
+        self.change_time = now
+
+    def final_voltage(self) -> float:
+        """
+        :return: fully settled voltage across the pickoff resistor (V)
+        """
+        if self.relay is None:
+            return 0.0
+        r_low = self.r_pickoff * self.input_impedance / (self.r_pickoff + self.input_impedance)
+        hv = self.hv_dac * self.volts_per_unit
+        return -hv * r_low / (self.resistances[self.relay] + r_low)
+
+    def voltage(self, t: Optional[float] = None) -> float:
+        """
+        :param t: time (clock seconds), now if None
+        :return: noise-free voltage across the pickoff resistor at time t (V)
+        """
+        t = self.clock.time() if t is None else t
+        final = self.final_voltage()
+        elapsed = max(0.0, t - self.change_time)
+        return final + (self.start_voltage - final) * math.exp(-elapsed / self.tau)
@@ -0,0 +1,308 @@
+import json
+import os
+from typing import List, NamedTuple, Optional, Set, Tuple
+
+from analysis import calibration
+from sampling import SEQUENTIAL_SAMPLING, SamplePolicy
+from screening import Screen, ScreenPolicy
+from settling import HV_SETTLE, RELAY_SETTLE, SettlePolicy
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+PLANS_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "plans")
+
+
+class TestPlan:
+    """
+    What a test does, without the code: HV steps, channels, settle and sample policies, pauses.
+
+    Plans are written as JSON or YAML (see the plans folder), e.g.::
+
+        name: resistor
+        hv: {start: 13, stop: 256, step: 13}   # DAC values, stop excluded, or a list
+        channels: [1, 2, 3, 4, 5, 6, 7, 8]
+        settle:
+          hv: {max_wait: 10, min_wait: 0.5}
+          relay: {max_wait: 2, chunk: 3}
+        sampling: {target_sem: 1.0e-5, min_count: 10, max_count: 20}
+        dwell: 1                               # (s) after each measurement
+        pause: {every: 1000, duration: 60}     # (s) relays open, checked before each HV step
+        screen: {target: 5.0e+9, tolerance: 5.0e+8, confidence: 3, abort_fraction: 0.5}
+
+    With a ``stream`` section ({samples, chunk, delay}), each channel records
+    a long acquisition of single readings instead of one averaged measurement.
+    With a ``screen`` section (see screening.ScreenPolicy), channels found out of spec
+    are dropped from the remaining HV steps, and the board is abandoned when too many are.
+
+    :param name: name of the plan
+    :param dac_values: HV DAC values, in order
+    :param channels: relay channels (1 to 8), in order
+    :param volts_per_unit: HV volts per DAC unit
+    :param voltage_range: (V) DMM range, None for auto range
+    :param hv_settle: (SettlePolicy) after each HV change
+    :param relay_settle: (SettlePolicy) after each relay change
+    :param sampling: (SamplePolicy) readings per measurement
+    :param dwell: (s) wait after each measurement
+    :param pause_every: (s) test time between two pauses, None for no pause
+    :param pause_duration: (s) length of a pause
+    :param stream: None, or dict with samples, chunk and delay (s) for a streamed acquisition
+    :param screen: (ScreenPolicy) early rejection of the channels out of spec, None to measure every step
+    :param source: what to give load_plan to get the plan again (file or built-in name)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        dac_values: List[int],
+        channels: List[int],
+        volts_per_unit: float = 7.843,
+        voltage_range: Optional[float] = 2,
+        hv_settle: SettlePolicy = HV_SETTLE,
+        relay_settle: SettlePolicy = RELAY_SETTLE,
+        sampling: SamplePolicy = SEQUENTIAL_SAMPLING,
+        dwell: float = 1,
+        pause_every: Optional[float] = None,
+        pause_duration: float = 60,
+        stream: Optional[dict] = None,
+        screen: Optional[ScreenPolicy] = None,
+        source: Optional[str] = None,
+    ):
+        for channel in channels:
+            if not 1 <= channel <= 8:
+                raise ValueError(f"Plan {name}: channel {channel} is not between 1 and 8")
+        for dac in dac_values:
+            if not 0 <= dac <= 255:
+                raise ValueError(f"Plan {name}: DAC value {dac} is not between 0 and 255")
+        self.name = name
+        self.dac_values = list(dac_values)
+        self.channels = list(channels)
+        self.volts_per_unit = volts_per_unit
+        self.voltage_range = voltage_range
+        self.hv_settle = hv_settle
+        self.relay_settle = relay_settle
+        self.sampling = sampling
+        self.dwell = dwell
+        self.pause_every = pause_every
+        self.pause_duration = pause_duration
+        self.stream = stream
+        self.screen = screen
+        self.source = name if source is None else source
+
+    @classmethod
+    def from_dict(cls, plan: dict) -> "TestPlan":
+        """
+        :param plan: plan as loaded from JSON / YAML
+        """
+        hv = plan["hv"]
+        if isinstance(hv, dict):
+            dac_values = list(range(hv.get("start", 0), hv["stop"], hv.get("step", 1)))
+        else:
+            dac_values = list(hv)
+        settle = plan.get("settle", {})
+        pause = plan.get("pause") or {}
+        return cls(
+            name=plan.get("name", "unnamed"),
+            dac_values=dac_values,
+            channels=plan.get("channels", list(range(1, 9))),
+            volts_per_unit=plan.get("volts_per_unit", 7.843),
+            voltage_range=plan.get("voltage_range", 2),
+            hv_settle=SettlePolicy(**settle["hv"]) if "hv" in settle else HV_SETTLE,
+            relay_settle=SettlePolicy(**settle["relay"]) if "relay" in settle else RELAY_SETTLE,
+            sampling=SamplePolicy(**plan["sampling"]) if "sampling" in plan else SEQUENTIAL_SAMPLING,
+            dwell=plan.get("dwell", 1),
+            pause_every=pause.get("every"),
+            pause_duration=pause.get("duration", 60),
+            stream=plan.get("stream"),
+            screen=ScreenPolicy(**plan["screen"]) if plan.get("screen") else None,
+        )
+
+
+def load_plan(path: str) -> TestPlan:
+    """
+    :param path: JSON or YAML (.yaml / .yml, needs PyYAML) plan file, also looked up in the plans folder,
+        or the name of a built-in plan
+    :return: (TestPlan)
+    """
+    if path in PLANS:
+        return PLANS[path]
+    if not os.path.exists(path) and os.path.exists(os.path.join(PLANS_FOLDER, path)):
+        path = os.path.join(PLANS_FOLDER, path)
+    with open(path) as plan_file:
+        if path.endswith((".yaml", ".yml")):
+            if yaml is None:
+                raise ImportError("PyYAML is needed to load YAML plans (pip install pyyaml), or use JSON")
+            plan = yaml.safe_load(plan_file)
+        else:
+            plan = json.load(plan_file)
+    plan = TestPlan.from_dict(plan)
+    plan.source = os.path.abspath(path)
+    return plan
+
+
+# The loops hard-coded in TestProc01 and TestProcedureCLI before plans existed
+STANDARD_PLAN = TestPlan("standard", list(range(13, 256, 13)), list(range(1, 9)), pause_every=1000, screen=ScreenPolicy())
+CLI_STANDARD_PLAN = TestPlan(
+    "cli_standard",
+    list(range(0, 256, 13)),
+    list(range(1, 9)),
+    voltage_range=None,
+    relay_settle=SettlePolicy(max_wait=5, chunk=3),  # the CLI waited 5 s after each relay switch
+    dwell=5,
+)
+RELAY_TEST_PLAN = TestPlan(
+    "relay_test", [0], [1], volts_per_unit=2000 / 255, stream={"samples": 3000, "chunk": 10, "delay": 1}
+)
+PLANS = {plan.name: plan for plan in (STANDARD_PLAN, CLI_STANDARD_PLAN, RELAY_TEST_PLAN)}
+
+
+class Step(NamedTuple):
+    kind: str  # SET_HV, MEASURE or STREAM
+    dac: int
+    channel: Optional[int]  # 1 to 8, None for SET_HV
+    volts: float  # (V) nominal HV
+
+
+SET_HV = "set_hv"
+MEASURE = "measure"
+STREAM = "stream"
+
+# Phases timed by PlanExecutor
+SERIAL = "serial"
+HV_SETTLE_PHASE = "hv_settle"
+RELAY_SETTLE_PHASE = "relay_settle"
+ACQUISITION = "acquisition"
+DWELL = "dwell"
+PAUSE = "pause"
+PHASES = (SERIAL, HV_SETTLE_PHASE, RELAY_SETTLE_PHASE, ACQUISITION, DWELL, PAUSE)
+
+
+def compile_plan(plan: TestPlan) -> List[Step]:
+    """
+    :param plan: (TestPlan)
+    :return: steps in execution order: each HV value followed by its channels
+    """
+    steps = []
+    kind = MEASURE if plan.stream is None else STREAM
+    for dac in plan.dac_values:
+        volts = dac * plan.volts_per_unit
+        steps.append(Step(SET_HV, dac, None, volts))
+        steps.extend(Step(kind, dac, channel, volts) for channel in plan.channels)
+    return steps
+
+
+class PlanExecutor:
+    """
+    Runs a plan on a stand, shared by the GUI worker (TestProc01) and the CLI (TestProcedureCLI).
+
+    The stand provides the primitives: ``is_running``, ``clock``, ``prepare(plan)``,
+    ``set_hv(dac, volts)``, ``select_relay(channel, volts)`` (returns whether it worked),
+    ``settle(policy, dac, channel)``, ``measure(step, policy)``,
+    ``stream(step, samples, chunk, delay)``, ``pause(duration)``, ``checkpoint(step)``
+    (called once a channel step is complete), ``reject(channel, reason)``, ``stop()`` and ``finish()``.
+    ``measure`` returns (mean voltage, error), (None, None) when it failed.
+
+    When the plan has a screen policy, the running resistance estimate of every channel is
+    updated after each measurement (calibrated with the calibration channel of ``stand.test_info``); rejected channels are skipped for the rest of the plan,
+    and the plan stops (finish() is called) once the policy aborts the board.
+
+    The duration of every phase is appended to ``stand.timings`` (if the stand has that list)
+    as {'phase', 'duration', 'readings'}, see costmodel.CostModel.fit.
+
+    :param stand: (TestingProcess)
+    :param plan: (TestPlan)
+    :param done: (DAC value, channel) steps already measured (e.g. by an interrupted run), skipped
+    """
+
+    def __init__(self, stand, plan: TestPlan, done: Optional[Set[Tuple[int, int]]] = None):
+        self.stand = stand
+        self.plan = plan
+        self.steps = compile_plan(plan)
+        if done:
+            steps = [step for step in self.steps if (step.dac, step.channel) not in done]
+            # HV steps whose channels are all done are skipped too
+            needed = {step.dac for step in steps if step.kind != SET_HV}
+            self.steps = [step for step in steps if step.kind != SET_HV or step.dac in needed]
+        self.done = done or set()
+        self.timings = getattr(stand, "timings", None)
+        if plan.screen is None:
+            self.screen = None
+        else:
+            # Same calibration as the final fits (analysis.calibrate)
+            self.screen = Screen(plan.screen, plan.channels, calibration(getattr(stand, "test_info", None) or {}))
+
+    def _timed(self, phase: str, function, *args):
+        if self.timings is None:
+            return function(*args)
+        clock = self.stand.clock
+        meter = getattr(self.stand, "meter", None)
+        readings = getattr(meter, "n_readings", 0)
+        start = clock.time()
+        result = function(*args)
+        self.timings.append(
+            {
+                "phase": phase,
+                "duration": clock.time() - start,
+                "readings": getattr(meter, "n_readings", 0) - readings,
+            }
+        )
+        return result
+
+    def run(self) -> bool:
+        """
+        :return: True if the plan ran to the end, False if it was stopped
+        """
+        stand, plan = self.stand, self.plan
+        clock = stand.clock
+        stand.prepare(plan)
+        if self.screen is not None and self.done:
+            # Resumed: the estimates start from the points already measured
+            for row in stand.data:
+                self._screen(row["Relay"], row["Measured Voltage [V]"], row["Voltage Error [V]"], row["Voltage Step [V]"])
+        last_pause = clock.time()
+        for step in self.steps:
+            if not stand.is_running:
+                stand.stop()
+                return False
+
+            if self.screen is not None:
+                if self.screen.abort:
+                    print(f"Aborting the board: {len(self.screen.rejected)}/{len(plan.channels)} channels out of spec")
+                    stand.finish()
+                    return False
+                if step.kind == SET_HV and not self.screen.active(plan.channels):
+                    continue
+                if step.kind == MEASURE and step.channel in self.screen.rejected:
+                    continue
+
+            if step.kind == SET_HV:
+                if plan.pause_every is not None and clock.time() - last_pause > plan.pause_every:
+                    self._timed(PAUSE, stand.pause, plan.pause_duration)
+                    last_pause = clock.time()
+                self._timed(SERIAL, stand.set_hv, step.dac, step.volts)
+                self._timed(HV_SETTLE_PHASE, stand.settle, plan.hv_settle, step.dac)
+                continue
+
+            if not self._timed(SERIAL, stand.select_relay, step.channel, step.volts):
+                continue
+            self._timed(RELAY_SETTLE_PHASE, stand.settle, plan.relay_settle, step.dac, step.channel)
+            if step.kind == STREAM:
+                stream = plan.stream
+                self._timed(ACQUISITION, stand.stream, step, stream["samples"], stream.get("chunk", 10), stream.get("delay", 0))
+            else:
+                voltage, error = self._timed(ACQUISITION, stand.measure, step, plan.sampling)
+                if voltage is not None:
+                    self._screen(step.channel, voltage, error, step.volts)
+                self._timed(DWELL, clock.sleep, plan.dwell)
+            if stand.is_running:
+                stand.checkpoint(step)
+        stand.finish()
+        return True
+
+    def _screen(self, channel: int, voltage: float, error: float, hv: float) -> None:
+        if self.screen is None:
+            return
+        for rejected, reason in self.screen.add(channel, voltage, error, hv).items():
+            self.stand.reject(rejected, reason)
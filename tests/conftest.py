@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The modules live at the top of the repository, not in an installed package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# TestProc01 imports PyQt5 widgets; no display is needed to run a procedure
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from robust_serial import Order
+from robust_serial.aio import ArduinoProtocol
+from robust_serial.pipeline import ArduinoError
+from simulation.arduino import ArduinoEmulator
+
+
+class EmulatorTransport(asyncio.Transport):
+    """
+    Answers from the emulated firmware, delivered on the next loop iteration like bytes from a port.
+    """
+
+    def __init__(self, protocol, emulator):
+        super().__init__()
+        self.protocol = protocol
+        self.emulator = emulator
+
+    def write(self, data):
+        self.emulator.receive(data)
+        asyncio.get_running_loop().call_soon(self.protocol.data_received, self.emulator.take_output())
+
+    def close(self):
+        self.protocol.connection_lost(None)
+
+
+def connect():
+    protocol = ArduinoProtocol()
+    protocol.connection_made(EmulatorTransport(protocol, ArduinoEmulator(boot_hello=False, debug_prints=False)))
+    return protocol
+
+
+def test_send_order_and_nack():
+    async def main():
+        protocol = connect()
+        await protocol.handshake(retry_delay=0.1)
+        results = await asyncio.gather(*(protocol.send_order(Order.RELAY, relay, timeout=1) for relay in range(4)))
+        assert [result.seq for result in results] == [0, 1, 2, 3]
+        with pytest.raises(ArduinoError):
+            await protocol.send_order(Order.MOTOR, timeout=1)
+        with pytest.raises(ValueError):
+            await protocol.send_order(Order.HV_SET, 300)
+        assert not protocol.outstanding
+
+    asyncio.run(main())
+
+
+def test_reply_before_wait_for_is_kept():
+    async def main():
+        protocol = connect()
+        protocol.write_order(Order.HELLO)
+        # The HELLO answer arrives before anyone waits for it
+        await asyncio.sleep(0)
+        assert await protocol.wait_for(Order.HELLO, timeout=0.1) == (Order.HELLO, None)
+        with pytest.raises(asyncio.TimeoutError):
+            await protocol.wait_for(Order.HELLO, timeout=0.01)
+
+    asyncio.run(main())
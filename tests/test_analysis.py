@@ -0,0 +1,73 @@
+import numpy as np
+
+from analysis import R_PICKOFF, VOLTS_PER_UNIT, component_voltages, currents, fit_run, fit_runs, resistances
+
+DTYPE = [("DAC Value", "<i2"), ("Relay", "<i1"), ("Measured Voltage [V]", "<f8"), ("Voltage Error [V]", "<f8")]
+
+
+def make_run(resistance, errors=True, seed=0):
+    """
+    One run of the standard sweep, channel c has resistance[c - 1]
+    """
+    rng = np.random.default_rng(seed)
+    dac = np.repeat(np.arange(13, 256, 13), len(resistance))
+    relay = np.tile(np.arange(1, len(resistance) + 1), len(dac) // len(resistance))
+    hv = dac * VOLTS_PER_UNIT
+    r = np.asarray(resistance, dtype=float)[relay - 1]
+    voltage = -hv * R_PICKOFF / (r + R_PICKOFF)
+    error = rng.uniform(5e-6, 50e-6, len(dac))
+    array = np.zeros(len(dac), dtype=DTYPE)
+    array["DAC Value"], array["Relay"] = dac, relay
+    array["Measured Voltage [V]"] = voltage + rng.normal(0, error)
+    array["Voltage Error [V]"] = error if errors else 0
+    return array
+
+
+def polyfit(array, channel, weighted):
+    points = array[array["Relay"] == channel]
+    u = component_voltages(points["Measured Voltage [V]"], points["DAC Value"] * VOLTS_PER_UNIT)
+    i = currents(points["Measured Voltage [V]"])
+    if weighted:
+        coefficients, cov = np.polyfit(u, i, 1, w=R_PICKOFF / points["Voltage Error [V]"], cov="unscaled")
+    else:
+        coefficients, cov = np.polyfit(u, i, 1, cov=True)
+    return coefficients, np.sqrt(np.diag(cov))
+
+
+def test_batched_fits_match_polyfit():
+    runs = [make_run([4900e6, 5000e6, 5100e6, 5200e6], seed=1), make_run([3000e6, 8000e6], seed=2), make_run([5000e6] * 3, errors=False, seed=3)]
+    fits = fit_runs(runs)
+    assert len(fits) == 4 + 2 + 3
+    for fit in fits:
+        (slope, intercept), (slope_err, intercept_err) = polyfit(runs[fit["run"]], fit["channel"], weighted=fit["run"] != 2)
+        np.testing.assert_allclose([fit["slope"], fit["intercept"]], [slope, intercept], rtol=1e-6, atol=1e-15)
+        np.testing.assert_allclose([fit["slope_err"], fit["intercept_err"]], [slope_err, intercept_err], rtol=1e-6)
+        assert fit["n"] == 19
+    np.testing.assert_allclose(fits["resistance"][:4], [4900e6, 5000e6, 5100e6, 5200e6], rtol=0.01)
+    assert np.isnan(fits["chi2"][fits["run"] == 2]).all()
+
+
+def test_unfitted_channels_stay_nan():
+    array = make_run([5000e6, 5000e6, 5000e6])
+    # Channel 2 open (no current), channel 3 with a single usable point
+    array["Measured Voltage [V]"][array["Relay"] == 2] = 0
+    array["Measured Voltage [V]"][(array["Relay"] == 3) & (array["DAC Value"] > 13)] = np.nan
+    fits = fit_run(array)
+    assert fits["channel"].tolist() == [1, 2, 3]
+    assert fits["n"].tolist() == [19, 0, 1]
+    assert np.isfinite(fits["resistance"][0])
+    assert np.isnan(fits["resistance"][1:]).all()
+
+
+def test_calibration():
+    array = make_run([5000e6, 6000e6])
+    plain = fit_run(array)
+    calibrated = fit_run(array, test_info={"Calib Channel": 1, "Calib Value": 4.0})
+    np.testing.assert_allclose(calibrated["resistance"][0], 4e9)
+    np.testing.assert_allclose(calibrated["resistance"][1], plain["resistance"][1] * 4e9 / plain["resistance"][0])
+
+
+def test_point_resistances():
+    resistance, error = resistances([-0.5, 0.0], [100.0, 100.0], [1e-5, 1e-5])
+    np.testing.assert_allclose(resistance[0], 99.5 * R_PICKOFF / 0.5)
+    assert np.isinf(resistance[1]) and np.isinf(error[1])
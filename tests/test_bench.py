@@ -0,0 +1,60 @@
+import numpy as np
+
+from analysis import fit_run
+from binning import passes
+from results_loader import load_results
+from simulation.bench import simulated_process
+
+TEST_INFO = {"Stand Number": "1", "Dunk Board": "SIM", "Tester Name": "tester", "Calib Channel": -1, "Calib Value": 0}
+
+
+def run(tmp_path, resistances):
+    tester = simulated_process(resistances=resistances)
+    tester.set_test_info(TEST_INFO)
+    tester.build_csv_path(str(tmp_path))
+    return tester, tester.run_plan("standard")
+
+
+def test_good_board_end_to_end(tmp_path):
+    tester, finished = run(tmp_path, [5000e6] * 8)
+    assert finished
+    assert len(tester.data) == 19 * 8
+    assert not tester.rejected
+    # Simulated time, not wall time: the sweep takes minutes on the stand
+    assert 60 < tester.clock.elapsed() < 3600
+
+    test_info, array = load_results(tester.file_path)
+    assert test_info["Dunk Board"] == "SIM"
+    assert len(array) == 19 * 8
+    fits = fit_run(array, test_info=test_info)
+    assert fits["channel"].tolist() == list(range(1, 9))
+    np.testing.assert_allclose(fits["resistance"], 5000e6, rtol=0.01)
+    assert passes(fits["resistance"]).all()
+
+
+def test_bad_channels_are_dropped(tmp_path):
+    tester, finished = run(tmp_path, [5000e6] * 6 + [3000e6, 1e18])
+    assert finished
+    assert set(tester.rejected) == {7, 8}
+    assert tester.rejected[8] == "open, no current"
+    fits = fit_run(load_results(tester.file_path)[1])
+    assert passes(fits["resistance"]).tolist() == [True] * 6 + [False, False]
+
+
+def test_bad_board_is_aborted(tmp_path):
+    tester, finished = run(tmp_path, [2000e6] * 5 + [5000e6] * 3)
+    assert not finished
+    assert len(tester.rejected) >= 4
+    assert len(tester.data) < 19 * 8 / 4
+
+
+def test_calibrated_board_is_not_rejected(tmp_path):
+    # The stand reads 12% high: 5600 MOhm for every resistor, among them the 5.0 GOhm calibration resistor of channel 1
+    tester = simulated_process(resistances=[5600e6] * 8)
+    tester.set_test_info(dict(TEST_INFO, **{"Calib Channel": 1, "Calib Value": 5.0}))
+    tester.build_csv_path(str(tmp_path))
+    assert tester.run_plan("standard")
+    assert not tester.rejected
+    assert len(tester.data) == 19 * 8
+    fits = fit_run(load_results(tester.file_path)[1], test_info=tester.test_info)
+    np.testing.assert_allclose(fits["resistance"], 5000e6, rtol=0.01)
@@ -0,0 +1,45 @@
+import numpy as np
+
+from binning import BIN_LABELS, BIN_PERCENT_STEP, BIN_RANGE, NO_BIN, RESISTOR_BINS, TARGET_RESISTANCE, BinSpec, passes
+
+# bin_resistance as it was in TestProc01.py before the BinSpec
+_range_steps = int(BIN_RANGE / BIN_PERCENT_STEP)
+_edges = [TARGET_RESISTANCE * (1 + i * BIN_PERCENT_STEP) for i in range(-_range_steps, _range_steps + 1)]
+bin_edges = sorted(_edges, key=lambda x: abs(x - TARGET_RESISTANCE))
+
+
+def bin_resistance(value):
+    diffs = [abs(value - edge) for edge in bin_edges]
+    idx = int(np.argmin(diffs))
+    return BIN_LABELS[idx]
+
+
+def test_same_labels_as_bin_resistance():
+    rng = np.random.default_rng(0)
+    values = np.concatenate(
+        [
+            rng.uniform(0.95, 1.05, 5000) * TARGET_RESISTANCE,
+            # Exactly on the edges and halfway between them (ties)
+            np.array(bin_edges),
+            (np.array(sorted(_edges))[1:] + np.array(sorted(_edges))[:-1]) / 2,
+            [0.0, 1e3, 1e15],
+        ]
+    )
+    labels = RESISTOR_BINS.assign(values)
+    assert labels.tolist() == [bin_resistance(value) for value in values]
+    assert RESISTOR_BINS.label(TARGET_RESISTANCE) == "A"
+
+
+def test_no_bin_for_nan_and_inf():
+    labels = RESISTOR_BINS.assign([np.nan, np.inf, -np.inf, TARGET_RESISTANCE])
+    assert labels.tolist() == [NO_BIN, NO_BIN, NO_BIN, "A"]
+    assert RESISTOR_BINS.label(np.nan) == NO_BIN
+
+
+def test_other_spec():
+    spec = BinSpec(100.0, 0.1, 0.2)
+    assert spec.assign([100, 90, 110, 80, 120, 50]).tolist() == ["A", "B", "C", "D", "E", "D"]
+
+
+def test_passes():
+    assert passes([5000e6, 5500e6, 5500.1e6, 4400e6, np.nan]).tolist() == [True, True, False, False, False]
@@ -0,0 +1,54 @@
+import json
+import math
+import os
+
+import numpy as np
+
+from columnar import RESULT_DTYPE, columnar_paths, load_columnar, save_columnar, to_array
+
+ROWS = [
+    {"DAC Value": 13, "Voltage Step [V]": 101.959, "Relay": 1, "Measured Voltage [V]": -0.0587, "Voltage Error [V]": 1.2e-5, "Timestamp [s]": 1718000010.5},
+    {"DAC Value": 13, "Voltage Step [V]": 101.959, "Relay": 8, "Measured Voltage [V]": None, "Voltage Error [V]": None, "Timestamp [s]": 1718000012.0},
+    {"DAC Value": 255, "Voltage Step [V]": 1999.965, "Relay": 4, "Measured Voltage [V]": -1.1523456, "Voltage Error [V]": 3e-6},
+]
+
+
+def test_paths():
+    assert columnar_paths("/data/WM_Comp_test_2_B_1.csv") == ("/data/WM_Comp_test_2_B_1.npy", "/data/WM_Comp_test_2_B_1.meta.json")
+
+
+def test_to_array():
+    array = to_array(ROWS)
+    assert array.dtype == RESULT_DTYPE
+    assert array["DAC Value"].tolist() == [13, 13, 255]
+    assert array["Relay"].tolist() == [1, 8, 4]
+    # Failed readings and missing fields are NaN
+    assert math.isnan(array["Measured Voltage [V]"][1]) and math.isnan(array["Voltage Error [V]"][1])
+    assert math.isnan(array["Timestamp [s]"][2])
+    assert len(to_array([])) == 0
+
+
+def test_round_trip(tmp_path):
+    csv_path = str(tmp_path / "WM_Comp_test_2_B_1.csv")
+    array = to_array(ROWS)
+    metadata = {"test_info": {"Stand Number": "2", "Calib Channel": -1}, "plan": "standard"}
+    array_path, metadata_path = save_columnar(csv_path, array, metadata)
+    assert (array_path, metadata_path) == columnar_paths(csv_path)
+    assert "columns" not in metadata  # not modified
+
+    for path, mmap in [(csv_path, True), (array_path, False)]:
+        loaded, loaded_metadata = load_columnar(path, mmap=mmap)
+        assert isinstance(loaded, np.memmap) == mmap
+        assert loaded.dtype == RESULT_DTYPE
+        assert loaded.tobytes() == array.tobytes()  # NaN compare equal as bytes
+        assert loaded_metadata == dict(metadata, columns=list(RESULT_DTYPE.names), n_points=3)
+    with open(metadata_path) as f:
+        assert json.load(f)["n_points"] == 3
+
+
+def test_missing_metadata(tmp_path):
+    csv_path = str(tmp_path / "run.csv")
+    _, metadata_path = save_columnar(csv_path, to_array(ROWS))
+    os.remove(metadata_path)
+    array, metadata = load_columnar(csv_path)
+    assert len(array) == 3 and metadata == {}
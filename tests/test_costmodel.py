@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from costmodel import CostModel, load_timings, save_timings
+from testplan import ACQUISITION, DWELL, HV_SETTLE_PHASE, PAUSE, RELAY_SETTLE_PHASE, SERIAL, compile_plan
+from testplan import TestPlan as Plan  # not a pytest class
+
+SERIAL_TIME = 0.03
+HV_SETTLE_TIME = 4.0
+RELAY_SETTLE_TIME = 0.7
+READING_TIME = 0.21
+OVERHEAD = 0.08
+
+
+def synthetic_timings(n_points=200, noise=0.0, seed=0):
+    """
+    :return: phase timings of a stand with the coefficients above
+    """
+    rng = np.random.default_rng(seed)
+    timings = []
+    for point in range(n_points):
+        if point % 8 == 0:
+            timings.append({"phase": SERIAL, "duration": SERIAL_TIME, "readings": 0})
+            timings.append({"phase": HV_SETTLE_PHASE, "duration": HV_SETTLE_TIME, "readings": 25})
+        readings = int(rng.integers(10, 21))
+        duration = OVERHEAD + readings * READING_TIME + noise * rng.standard_normal()
+        timings.append({"phase": SERIAL, "duration": SERIAL_TIME, "readings": 0})
+        timings.append({"phase": RELAY_SETTLE_PHASE, "duration": RELAY_SETTLE_TIME, "readings": 9})
+        timings.append({"phase": ACQUISITION, "duration": duration, "readings": readings})
+        timings.append({"phase": DWELL, "duration": 1.0, "readings": 0})
+    return timings
+
+
+def test_fit_recovers_coefficients():
+    model = CostModel.fit(synthetic_timings())
+    assert model.serial == pytest.approx(SERIAL_TIME)
+    assert model.hv_settle == pytest.approx(HV_SETTLE_TIME)
+    assert model.relay_settle == pytest.approx(RELAY_SETTLE_TIME)
+    assert model.reading_time == pytest.approx(READING_TIME)
+    assert model.acquisition_overhead == pytest.approx(OVERHEAD)
+    assert model.readings == pytest.approx(15, abs=0.5)
+
+
+def test_fit_with_noise():
+    model = CostModel.fit(synthetic_timings(n_points=2000, noise=0.01))
+    assert model.reading_time == pytest.approx(READING_TIME, abs=1e-3)
+    assert model.acquisition_overhead == pytest.approx(OVERHEAD, abs=0.01)
+
+
+def test_fit_fixed_reading_count():
+    timings = [{"phase": ACQUISITION, "duration": 10 * READING_TIME, "readings": 10}] * 5
+    model = CostModel.fit(timings)
+    assert model.reading_time == pytest.approx(READING_TIME)
+    assert model.acquisition_overhead == 0
+    # Phases never seen keep the defaults
+    assert model.serial == CostModel().serial and model.hv_settle is None
+
+
+def test_estimate():
+    plan = Plan("costs", list(range(13, 256, 13)), list(range(1, 9)), pause_every=100, pause_duration=60)
+    model = CostModel(
+        serial=SERIAL_TIME, hv_settle=HV_SETTLE_TIME, relay_settle=RELAY_SETTLE_TIME,
+        reading_time=READING_TIME, acquisition_overhead=OVERHEAD, readings=15,
+    )
+    estimate = model.estimate(plan)
+    n_hv, n_points = len(plan.dac_values), len(plan.dac_values) * len(plan.channels)
+    assert estimate.n_points == n_points == len(compile_plan(plan)) - n_hv
+    assert estimate.phases[SERIAL] == pytest.approx((n_hv + n_points) * SERIAL_TIME)
+    assert estimate.phases[HV_SETTLE_PHASE] == pytest.approx(n_hv * HV_SETTLE_TIME)
+    assert estimate.phases[ACQUISITION] == pytest.approx(n_points * (OVERHEAD + 15 * READING_TIME))
+    assert estimate.phases[DWELL] == pytest.approx(n_points * plan.dwell)
+    assert estimate.phases[PAUSE] == estimate.n_pauses * 60 and estimate.n_pauses > 0
+    assert estimate.total == pytest.approx(sum(estimate.phases.values()))
+    # Unfitted: the caps of the plan
+    worst = CostModel().estimate(plan)
+    assert worst.phases[HV_SETTLE_PHASE] == n_hv * plan.hv_settle.max_wait
+    assert worst.phases[RELAY_SETTLE_PHASE] == n_points * plan.relay_settle.max_wait
+
+
+def test_timing_files(tmp_path):
+    save_timings(str(tmp_path / "a.json"), synthetic_timings(8), stand="1", plan="standard")
+    save_timings(str(tmp_path / "b.json"), synthetic_timings(16), stand="2", plan="standard")
+    paths = [str(tmp_path / "a.json"), str(tmp_path / "b.json")]
+    assert load_timings(paths) == synthetic_timings(8) + synthetic_timings(16)
+    assert load_timings(paths, stand=2) == synthetic_timings(16)
@@ -0,0 +1,68 @@
+import struct
+
+from robust_serial import Order
+from robust_serial.decoder import DebugLine, FrameDecoder, Message, UnknownByte
+
+
+def frame(order, fmt="", *values):
+    return bytes([order.value]) + struct.pack(fmt, *values)
+
+
+def test_whole_frames():
+    decoder = FrameDecoder(log_debug=False)
+    data = frame(Order.HELLO) + frame(Order.HV_UPDATED, "<B", 200) + frame(Order.ERROR, "<h", -404) + frame(Order.NACK, "<Bh", 7, 404)
+    assert decoder.feed(data) == [
+        Message(Order.HELLO),
+        Message(Order.HV_UPDATED, 200),
+        Message(Order.ERROR, -404),
+        Message(Order.NACK, (7, 404)),
+    ]
+    assert len(decoder) == 0
+
+
+def test_partial_frames_byte_by_byte():
+    decoder = FrameDecoder(log_debug=False)
+    data = frame(Order.ACK, "<B", 3) + frame(Order.NACK, "<Bh", 4, 404) + b">> Arduino: Received order7\r\n" + frame(Order.READY_RELAY)
+    messages = []
+    for i in range(len(data)):
+        messages += decoder.feed(data[i : i + 1])
+    assert messages == [
+        Message(Order.ACK, 3),
+        Message(Order.NACK, (4, 404)),
+        DebugLine(">> Arduino: Received order7"),
+        Message(Order.READY_RELAY),
+    ]
+
+
+def test_payload_split_across_reads():
+    decoder = FrameDecoder(log_debug=False)
+    data = frame(Order.ERROR, "<h", 1234)
+    assert decoder.feed(data[:2]) == []
+    assert len(decoder) == 1
+    assert decoder.feed(data[2:]) == [Message(Order.ERROR, 1234)]
+
+
+def test_resync_after_garbage_and_text():
+    decoder = FrameDecoder(log_debug=False)
+    # A byte that is no order and not printable, then debug text, then orders again
+    data = b"\x01Sending READY_RELAY\n" + frame(Order.READY_RELAY) + b"\x1f" + frame(Order.ACK, "<B", 9)
+    assert decoder.feed(data) == [
+        UnknownByte(1),
+        DebugLine("Sending READY_RELAY"),
+        Message(Order.READY_RELAY),
+        UnknownByte(0x1F),
+        Message(Order.ACK, 9),
+    ]
+
+
+def test_reset_drops_partial_frame():
+    decoder = FrameDecoder(log_debug=False)
+    assert decoder.feed(frame(Order.NACK, "<Bh", 1, 404)[:2]) == []
+    decoder.reset()
+    assert decoder.feed(frame(Order.HELLO)) == [Message(Order.HELLO)]
+
+
+def test_ring_buffer_grows():
+    decoder = FrameDecoder(log_debug=False, buffer_size=4)
+    data = b"".join(frame(Order.HV_UPDATED, "<B", i) for i in range(100))
+    assert decoder.feed(data) == [Message(Order.HV_UPDATED, i) for i in range(100)]
@@ -0,0 +1,131 @@
+import os
+
+import numpy as np
+import pytest
+
+from journal import Journal, JournalState, journal_path
+from results_loader import load_results
+from simulation.bench import simulated_process
+
+TEST_INFO = {"Stand Number": "3", "Dunk Board": "B7", "Tester Name": "tester", "Calib Channel": -1, "Calib Value": 0}
+
+
+class Crash(BaseException):
+    pass
+
+
+def test_unfinished_step_is_dropped(tmp_path):
+    path = str(tmp_path / "run.journal")
+    journal = Journal(path)
+    journal.start("standard", TEST_INFO, "run.csv", 1700000000)
+    journal.row({"DAC Value": 13, "Relay": 1})
+    journal.done(13, 1)
+    journal.row({"DAC Value": 13, "Relay": 2})
+    journal.close()
+    # Line cut by the crash
+    with open(path, "a") as journal_file:
+        journal_file.write('{"type": "done", "dac"')
+
+    state = JournalState(path)
+    assert state.plan == "standard"
+    assert state.test_info == TEST_INFO
+    assert state.timestamp == 1700000000
+    assert state.done == {(13, 1)}
+    assert state.rows == [{"DAC Value": 13, "Relay": 1}]
+
+
+def test_resume_marker_drops_interrupted_rows(tmp_path):
+    path = str(tmp_path / "run.journal")
+    journal = Journal(path)
+    journal.start("standard", TEST_INFO, "run.csv", 1700000000)
+    journal.row({"DAC Value": 13, "Relay": 1})
+    journal.done(13, 1)
+    journal.row({"DAC Value": 13, "Relay": 2, "Measured Voltage [V]": -1.0})
+    journal.close()
+    # Resumed: the interrupted step is measured again
+    journal = Journal(path)
+    journal.resume()
+    journal.row({"DAC Value": 13, "Relay": 2, "Measured Voltage [V]": -2.0})
+    journal.done(13, 2)
+    journal.close()
+
+    state = JournalState(path)
+    assert state.done == {(13, 1), (13, 2)}
+    assert state.rows == [{"DAC Value": 13, "Relay": 1}, {"DAC Value": 13, "Relay": 2, "Measured Voltage [V]": -2.0}]
+
+
+def crash_in_step(tester, at):
+    """
+    Makes the tester die after measuring its at-th step, before the step is marked done.
+    """
+    checkpoint = tester.checkpoint
+    calls = []
+
+    def crash(step):
+        calls.append(step)
+        if len(calls) == at:
+            raise Crash
+        checkpoint(step)
+
+    tester.checkpoint = crash
+
+
+def test_resume_twice_after_mid_step_crashes(tmp_path):
+    first = simulated_process()
+    first.set_test_info(TEST_INFO)
+    first.build_csv_path(str(tmp_path))
+    crash_in_step(first, 40)
+    with pytest.raises(Crash):
+        first.standardTest()
+    first.results.close()
+    first.journal.close()
+    path = journal_path(first.file_path)
+
+    second = simulated_process()
+    crash_in_step(second, 50)
+    with pytest.raises(Crash):
+        second.resume(path)
+    second.results.close()
+    second.journal.close()
+    assert len(JournalState(path).done) == 39 + 49
+
+    third = simulated_process()
+    assert third.resume(path)
+    steps = {(dac, channel) for dac in range(13, 256, 13) for channel in range(1, 9)}
+    points = [(row["DAC Value"], row["Relay"]) for row in third.data]
+    assert len(points) == len(steps) and set(points) == steps
+    _, array = load_results(first.file_path)
+    assert len(array) == len(steps)
+    assert len(np.unique(array[["DAC Value", "Relay"]])) == len(steps)
+
+
+def test_resume_without_duplicate_rows(tmp_path):
+    crashed = simulated_process()
+    crashed.set_test_info(TEST_INFO)
+    crashed.build_csv_path(str(tmp_path))
+    measure = crashed.measure
+    calls = []
+
+    def crash(step, policy):
+        calls.append(step)
+        if len(calls) == 60:
+            raise Crash
+        return measure(step, policy)
+
+    crashed.measure = crash
+    with pytest.raises(Crash):
+        crashed.standardTest()
+    # The process died: its file handles are gone
+    crashed.results.close()
+    crashed.journal.close()
+
+    resumed = simulated_process()
+    assert resumed.resume(journal_path(crashed.file_path))
+    steps = {(dac, channel) for dac in range(13, 256, 13) for channel in range(1, 9)}
+    points = [(row["DAC Value"], row["Relay"]) for row in resumed.data]
+    assert len(points) == len(steps) and set(points) == steps
+
+    _, array = load_results(crashed.file_path)
+    assert len(array) == len(steps)
+    assert len(np.unique(array[["DAC Value", "Relay"]])) == len(steps)
+    assert os.path.basename(resumed.file_path) == os.path.basename(crashed.file_path)
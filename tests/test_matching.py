@@ -0,0 +1,68 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from matching import match
+
+
+def brute_force(values, k, tolerance, labels=None):
+    """
+    :return: (most sets, smallest total spread) over every way of picking sets
+    """
+    best = (0, 0.0)
+
+    def search(remaining, count, total):
+        nonlocal best
+        if count > best[0] or (count == best[0] and total < best[1]):
+            best = (count, total)
+        if len(remaining) < k:
+            return
+        first, rest = remaining[0], remaining[1:]
+        search(rest, count, total)
+        for others in itertools.combinations(rest, k - 1):
+            group = (first,) + others
+            spread = max(values[i] for i in group) - min(values[i] for i in group)
+            same_label = labels is None or len({labels[i] for i in group}) == 1
+            if spread <= tolerance and same_label:
+                search([i for i in rest if i not in others], count + 1, total + spread)
+
+    search([i for i in range(len(values)) if np.isfinite(values[i])], 0, 0.0)
+    return best
+
+
+def score(values, groups, k):
+    n_groups = int(groups.max()) + 1 if len(groups) else 0
+    assert all((groups == g).sum() == k for g in range(n_groups))
+    return n_groups, sum(values[groups == g].max() - values[groups == g].min() for g in range(n_groups))
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_dp_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    k = int(rng.integers(2, 4))
+    values = rng.integers(0, 20, int(rng.integers(3, 9))).astype(float)
+    tolerance = float(rng.integers(1, 6))
+    labels = rng.choice(["A", "B"], len(values)) if seed % 2 else None
+    if seed % 5 == 0:
+        values[0] = np.nan
+    groups = match(values, k, tolerance, labels)
+    count, total = score(values, groups, k)
+    expected = brute_force(values, k, tolerance, labels)
+    assert count == expected[0]
+    assert total == pytest.approx(expected[1])
+    assert groups[~np.isfinite(values)].tolist() == [-1] * int((~np.isfinite(values)).sum())
+    if labels is not None:
+        for g in range(count):
+            assert len(set(labels[groups == g])) == 1
+
+
+def test_sets_numbered_by_value():
+    groups = match([30.0, 1.0, 31.0, 2.0, 100.0], 2, 1.5)
+    assert groups.tolist() == [1, 0, 1, 0, -1]
+
+
+def test_too_few_parts_and_bad_k():
+    assert match([1.0], 2).tolist() == [-1]
+    with pytest.raises(ValueError):
+        match([1.0, 2.0], 0)
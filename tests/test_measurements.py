@@ -0,0 +1,67 @@
+import math
+
+import numpy as np
+import pytest
+
+from columnar import RESULT_DTYPE, to_array
+from measurements import MeasurementStore
+
+
+def row(i):
+    return {
+        "DAC Value": 13 * (i // 8 + 1),
+        "Voltage Step [V]": 7.843 * 13 * (i // 8 + 1),
+        "Relay": i % 8 + 1,
+        "Measured Voltage [V]": -1e-3 * i,
+        "Voltage Error [V]": 1e-5,
+        "Timestamp [s]": 1718000000.0 + i,
+    }
+
+
+def test_growth():
+    store = MeasurementStore(capacity=4)
+    capacities = []
+    for i in range(20):
+        store.append(row(i))
+        capacities.append(len(store.buffer))
+    # Doubled when full, never shrunk
+    assert capacities[:4] == [4] * 4 and capacities[4:8] == [8] * 4 and capacities[8:16] == [16] * 8
+    assert capacities[16:] == [32] * 4
+    assert len(store) == 20
+    assert [record.to_dict() for record in store] == [row(i) for i in range(20)]
+    # The unfilled part stays zeroed
+    assert not store.buffer[20:].tobytes().strip(b"\0")
+
+
+def test_dtype():
+    store = MeasurementStore.from_rows(row(i) for i in range(10))
+    assert store.array.dtype == RESULT_DTYPE
+    assert store.column("Relay").dtype == np.int8
+    assert store.column("DAC Value").dtype == np.int16
+    assert store.column("Measured Voltage [V]").dtype == np.float64
+    assert store.array.tobytes() == to_array(row(i) for i in range(10)).tobytes()
+    # Views, not copies
+    assert np.shares_memory(store.column("Relay"), store.buffer)
+    # Records give Python values, like the dicts of TestingProcess.data
+    assert type(store[0]["Relay"]) is int and type(store[0]["Measured Voltage [V]"]) is float
+
+
+def test_missing_and_failed_fields():
+    store = MeasurementStore()
+    store.append({"DAC Value": 13, "Relay": 2, "Measured Voltage [V]": None})
+    record = store[-1]
+    assert math.isnan(record["Measured Voltage [V]"])
+    assert record["Voltage Error [V]"] == 0
+    assert record.get("Resistance") is None and record.get("Relay") == 2
+
+
+def test_indexing_and_clear():
+    store = MeasurementStore.from_rows(row(i) for i in range(5))
+    assert store[-1]["Relay"] == 5
+    assert store[1:3]["Relay"].tolist() == [2, 3]
+    with pytest.raises(IndexError):
+        store[5]
+    with pytest.raises(IndexError):
+        store[-6]
+    store.clear()
+    assert len(store) == 0 and list(store) == [] and len(store.array) == 0
@@ -0,0 +1,82 @@
+import pytest
+
+from clock import VirtualClock
+from robust_serial import Order
+from robust_serial.pipeline import ArduinoError, CommandWindow
+from simulation.arduino import ArduinoEmulator, EmulatedSerial
+
+
+def make_window(window_size=8):
+    clock = VirtualClock(start=0)
+    emulator = ArduinoEmulator(boot_hello=False, debug_prints=False)
+    serial_file = EmulatedSerial(emulator, clock=clock)
+    return CommandWindow(serial_file, window_size=window_size, clock=clock), emulator, clock
+
+
+def test_ack_with_replies():
+    window, emulator, _ = make_window()
+    result = window.send(Order.HV_SET, 13, timeout=1)
+    assert result.order == Order.HV_SET
+    assert result.reply(Order.HV_UPDATED).value == 13
+    assert emulator.hv_dac == 13
+    assert len(window) == 0
+
+
+def test_pipelined_orders_complete_in_order():
+    window, emulator, _ = make_window()
+    futures = [window.submit(Order.RELAY, relay) for relay in range(8)]
+    window.wait_all(timeout=1)
+    assert [future.result().seq for future in futures] == list(range(8))
+    assert all(future.result().reply(Order.READY_RELAY) for future in futures)
+    assert emulator.relay == 7
+
+
+def test_nack_raises_arduino_error():
+    window, _, _ = make_window()
+    # The firmware does not know MOTOR
+    with pytest.raises(ArduinoError) as error:
+        window.send(Order.MOTOR, timeout=1)
+    assert error.value.code == 404
+    assert error.value.order == Order.MOTOR
+    # The next order still goes through
+    assert window.send(Order.OPEN_RELAYS, timeout=1).order == Order.OPEN_RELAYS
+
+
+def test_timeout_without_answer():
+    window, emulator, clock = make_window()
+    emulator.receive = lambda data: None
+    with pytest.raises(TimeoutError):
+        window.send(Order.HV_SET, 10, timeout=0.5)
+    assert clock.time() >= 0.5
+    assert len(window) == 1
+    window.abandon()
+    assert len(window) == 0
+
+
+def test_full_window_timeout():
+    window, emulator, _ = make_window(window_size=2)
+    emulator.receive = lambda data: None
+    window.submit(Order.OPEN_RELAYS)
+    window.submit(Order.OPEN_RELAYS)
+    with pytest.raises(TimeoutError):
+        window.submit(Order.OPEN_RELAYS, timeout=0.5)
+
+
+def test_lost_acknowledgement_fails_older_orders():
+    window, emulator, _ = make_window()
+    receive = emulator.receive
+    emulator.receive = lambda data: None
+    lost = window.submit(Order.OPEN_RELAYS)
+    emulator.receive = receive
+    assert window.send(Order.HV_SET, 20, timeout=1).seq == 1
+    with pytest.raises(RuntimeError):
+        lost.result(timeout=0)
+
+
+def test_invalid_value_sends_nothing():
+    window, emulator, _ = make_window()
+    with pytest.raises(ValueError):
+        window.submit(Order.HV_SET, 256)
+    assert len(window) == 0
+    assert emulator.n_orders == 0
+    assert window.send(Order.HV_SET, 1, timeout=1).seq == 0
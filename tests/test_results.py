@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+from results import ResultsWriter, parse_id, write_results_csv
+
+# tests/data/WM_Comp_test_golden.csv was written by the original
+# TestingProcess.save_data_csv from these inputs
+GOLDEN = os.path.join(os.path.dirname(__file__), "data", "WM_Comp_test_golden.csv")
+TEST_INFO = {"Stand Number": "3", "Dunk Board": "DB-0042", "Tester Name": "J. Doe, lab 2", "Calib Channel": 7, "Calib Value": 5.0}
+TIMESTAMP = 1718000000
+ROWS = [
+    {"DAC Value": 13, "Relay": 1, "Measured Voltage [V]": -0.05871234567891, "Voltage Error [V]": 1.2e-05},
+    {"DAC Value": 13, "Relay": 2, "Measured Voltage [V]": float("nan"), "Voltage Error [V]": float("nan")},
+    {"DAC Value": 13, "Relay": 3, "Measured Voltage [V]": None, "Voltage Error [V]": None},
+    {"DAC Value": 26, "Relay": 1, "Measured Voltage [V]": -0.1174, "Voltage Error [V]": 0.0},
+    {"DAC Value": 26, "Relay": 2, "Measured Voltage [V]": 0.0, "Voltage Error [V]": 9.87e-06},
+    {"DAC Value": 255, "Relay": 12, "Measured Voltage [V]": -1.1523456, "Voltage Error [V]": 3e-06},
+]
+
+
+def golden() -> bytes:
+    with open(GOLDEN, "rb") as f:
+        return f.read()
+
+
+def test_write_results_csv_matches_golden(tmp_path):
+    path = str(tmp_path / "out.csv")
+    write_results_csv(path, TEST_INFO, TIMESTAMP, ROWS)
+    with open(path, "rb") as f:
+        assert f.read() == golden()
+
+
+@pytest.mark.parametrize("flush_interval", [0, 60])
+def test_streamed_rows_match_golden(tmp_path, flush_interval):
+    path = str(tmp_path / "out.csv")
+    writer = ResultsWriter(path, TEST_INFO, TIMESTAMP, flush_interval=flush_interval)
+    # The header block is on disk before any row
+    with open(path, "rb") as f:
+        assert f.read() == b"".join(golden().splitlines(keepends=True)[:3])
+    for row in ROWS:
+        writer.write_row(row)
+    writer.close()
+    writer.write_row(ROWS[0])  # ignored once closed
+    assert writer.n_rows == len(ROWS)
+    with open(path, "rb") as f:
+        assert f.read() == golden()
+
+
+def test_parse_id():
+    assert parse_id("3_DB-0042_1718000000") == {"Stand Number": "3", "Dunk Board": "DB-0042", "Timestamp": "1718000000"}
+    assert parse_id("3_DB_0042_1718000000")["Dunk Board"] == "DB_0042"
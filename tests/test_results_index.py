@@ -0,0 +1,80 @@
+import os
+
+import pytest
+
+from analysis import R_PICKOFF, VOLTS_PER_UNIT
+from results import write_results_csv
+from results_index import ResultsIndex
+
+TEST_INFO = {"Stand Number": "2", "Tester Name": "tester", "Calib Channel": -1, "Calib Value": 0}
+
+
+def write_run(folder, board, timestamp, resistances):
+    """
+    Writes the results file of a noise-free sweep, channel c has resistances[c - 1] (None: open)
+    """
+    rows = []
+    for dac in range(13, 256, 13):
+        hv = dac * VOLTS_PER_UNIT
+        for channel, resistance in enumerate(resistances, 1):
+            voltage = 0.0 if resistance is None else -hv * R_PICKOFF / (resistance + R_PICKOFF)
+            rows.append({"DAC Value": dac, "Relay": channel, "Measured Voltage [V]": voltage, "Voltage Error [V]": 1e-5})
+    path = os.path.join(str(folder), f"WM_Comp_test_2_{board}_{timestamp}.csv")
+    write_results_csv(path, dict(TEST_INFO, **{"Dunk Board": board}), timestamp, rows)
+    return path
+
+
+@pytest.fixture
+def index(tmp_path):
+    with ResultsIndex(str(tmp_path / "results.sqlite")) as index:
+        yield index
+
+
+def test_ingest(tmp_path, index):
+    write_run(tmp_path, "B1", 1700000000, [5000e6, 5010e6, 6000e6, None])
+    write_run(tmp_path, "B2", 1700000100, [5000e6] * 4)
+    assert index.ingest([str(tmp_path)]) == {"loaded": 2, "unchanged": 0, "failed": 0, "pruned": 0}
+    assert [run[1:3] for run in index.board_runs("B1")] == [("2", 1700000000)]
+    assert index.query("SELECT COUNT(*) FROM points")[0][0] == 2 * 19 * 4
+    channels = index.query(
+        "SELECT channel, n, bin, passed, resistance IS NULL FROM channels JOIN runs ON runs.id = run_id WHERE board = 'B1' ORDER BY channel"
+    )
+    # The open channel is counted, with no resistance, no bin and no pass
+    assert channels == [(1, 19, "A", 1, 0), (2, 19, "C", 1, 0), (3, 19, "K", 0, 0), (4, 0, None, 0, 1)]
+    assert [(board, channel) for board, channel, _, _ in index.channels_in_bin("C")] == [("B1", 2)]
+
+
+def test_reingest_unchanged_and_touched(tmp_path, index):
+    path = write_run(tmp_path, "B1", 1700000000, [5000e6] * 4)
+    index.ingest([path])
+    assert index.ingest([path])["unchanged"] == 1
+
+    # Touched, same content: only the file info is updated
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+    assert index.needs_update(os.path.abspath(path))
+    assert index.ingest([path]) == {"loaded": 0, "unchanged": 1, "failed": 0, "pruned": 0}
+    assert not index.needs_update(os.path.abspath(path))
+
+    # Changed content: the run is replaced, not added
+    write_run(tmp_path, "B1", 1700000000, [5000e6, 5000e6])
+    assert index.ingest([path])["loaded"] == 1
+    assert index.query("SELECT COUNT(*) FROM runs")[0][0] == 1
+    assert index.query("SELECT COUNT(*) FROM points")[0][0] == 19 * 2
+    assert index.query("SELECT COUNT(*) FROM channels")[0][0] == 2
+
+
+def test_prune(tmp_path, index):
+    kept = write_run(tmp_path, "B1", 1700000000, [5000e6] * 4)
+    removed = write_run(tmp_path, "B2", 1700000100, [5000e6] * 4)
+    index.ingest([str(tmp_path)])
+    os.remove(removed)
+    assert index.ingest([kept], prune=True) == {"loaded": 0, "unchanged": 1, "failed": 0, "pruned": 1}
+    assert index.board_runs("B2") == []
+    assert index.query("SELECT COUNT(*) FROM points")[0][0] == 19 * 4
+
+
+def test_unreadable_file_is_skipped(tmp_path, index):
+    path = tmp_path / "WM_Comp_test_2_B3_1700000200.csv"
+    path.write_text("not a results file\n")
+    assert index.ingest([str(path)])["failed"] == 1
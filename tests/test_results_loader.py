@@ -0,0 +1,98 @@
+import csv
+
+import numpy as np
+import pytest
+
+import results_loader
+from results_loader import load_results
+
+TEST_INFO = ["ID:", "2_B7_1718000000", "User:", "tester"]
+CALIBRATION = ["Calibration Channel (-1 if not calib):", -1, "Calibration Value (GOhm):", 0]
+PRE_STANDARD_HEADER = ["DAC Value", "Voltage Step [V]", "Relay", "Measured Voltage [V]", "Voltage Error [V]"]
+
+
+def points(n=40, failed=()):
+    """
+    :param failed: indices of the failed readings, written as None (blank fields)
+    """
+    rows = []
+    for i in range(n):
+        dac = 13 * (i // 8 + 1)
+        voltage, error = (None, None) if i in failed else (-1e-3 * i - 0.5e-9, 1e-5 + 1e-7 * i)
+        rows.append([dac, round(7.843 * dac, 3), i % 8 + 1, voltage, error])
+    return rows
+
+
+def write(path, rows, pre_standard=False):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        if pre_standard:
+            writer.writerow(PRE_STANDARD_HEADER)
+            writer.writerows(rows)
+        else:
+            # As written by TestProc_old.py save_data_csv
+            writer.writerows([TEST_INFO, CALIBRATION, ["HV Index", "CHANNEL", "Voltage", "Error"]])
+            writer.writerows([[dac, relay, voltage, error] for dac, _, relay, voltage, error in rows])
+    return str(path)
+
+
+def load_with_fallback(monkeypatch, path):
+    """
+    :return: load_results(path) with the np.fromstring fast path failing, i.e. through genfromtxt
+    """
+    def no_fast_path(*args, **kwargs):
+        raise ValueError("fast path disabled")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(results_loader.np, "fromstring", no_fast_path)
+        return load_results(path)
+
+
+def assert_same(loaded, expected):
+    (metadata, array), (expected_metadata, expected_array) = loaded, expected
+    assert metadata == expected_metadata
+    assert array.dtype == expected_array.dtype
+    assert array.tobytes() == expected_array.tobytes()
+
+
+@pytest.mark.parametrize("pre_standard", [False, True])
+def test_fast_path_and_fallback_agree(tmp_path, monkeypatch, pre_standard):
+    path = write(tmp_path / "WM_Comp_test_2_B7_1718000000.csv", points(), pre_standard)
+    with monkeypatch.context() as patch:
+        patch.setattr(results_loader.np, "genfromtxt", None)  # must not be needed
+        fast = load_results(path)
+    assert_same(fast, load_with_fallback(monkeypatch, path))
+    metadata, array = fast
+    assert metadata["Format"] == ("pre-standard" if pre_standard else "standard")
+    assert (metadata["Stand Number"], metadata["Dunk Board"], metadata["Timestamp"]) == ("2", "B7", "1718000000")
+    assert ("Voltage Step [V]" in array.dtype.names) == pre_standard
+    rows = points()
+    assert array["Relay"].tolist() == [row[2] for row in rows]
+    assert array["Measured Voltage [V]"].tolist() == [row[3] for row in rows]
+    assert array["Voltage Error [V]"].tolist() == [row[4] for row in rows]
+
+
+@pytest.mark.parametrize("pre_standard", [False, True])
+def test_failed_readings(tmp_path, monkeypatch, pre_standard):
+    # Blank fields take the genfromtxt path on their own
+    failed = {3, 17, 39}
+    path = write(tmp_path / "WM_Comp_test_2_B7_1718000000.csv", points(failed=failed), pre_standard)
+    metadata, array = load_results(path)
+    assert_same((metadata, array), load_with_fallback(monkeypatch, path))
+    assert len(array) == 40
+    assert set(np.flatnonzero(np.isnan(array["Measured Voltage [V]"]))) == failed
+    assert set(np.flatnonzero(np.isnan(array["Voltage Error [V]"]))) == failed
+    # Same values as the complete file elsewhere
+    complete = load_results(write(tmp_path / "complete.csv", points(), pre_standard))[1]
+    keep = [i for i in range(40) if i not in failed]
+    assert array[keep].tobytes() == complete[keep].tobytes()
+
+
+def test_not_a_results_file(tmp_path):
+    empty = tmp_path / "empty.csv"
+    empty.write_text("")
+    other = tmp_path / "other.csv"
+    other.write_text("a,b\n1,2\n")
+    for path in (empty, other):
+        with pytest.raises(ValueError):
+            load_results(str(path))
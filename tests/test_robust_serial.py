@@ -0,0 +1,119 @@
+import struct
+import sys
+
+import pytest
+
+from robust_serial import (
+    Order,
+    read_array,
+    read_i16,
+    read_order,
+    write_i8_array,
+    write_i16_array,
+    write_i32_array,
+    write_order,
+    write_orders,
+)
+from robust_serial.robust_serial import array_struct, pack_orders
+from simulation.arduino import ArduinoEmulator, EmulatedSerial
+
+ARRAYS = [
+    ("i8", write_i8_array, [-128, -1, 0, 1, 127]),
+    ("i16", write_i16_array, [-32768, -2, 0, 513, 32767]),
+    ("i32", write_i32_array, [-(2**31), -3, 0, 65536, 2**31 - 1]),
+]
+
+
+def dtype_code(dtype):
+    return {"i8": "b", "i16": "h", "i32": "i"}[dtype]
+
+
+class LoopbackSerial(EmulatedSerial):
+    """
+    EmulatedSerial whose "Arduino" sends back every byte it is sent
+    """
+
+    def write(self, data: bytes) -> int:
+        self.n_writes += 1
+        self.bytes_written += len(data)
+        self.emulator.output += data
+        return len(data)
+
+
+@pytest.fixture
+def serial():
+    return EmulatedSerial(ArduinoEmulator(boot_hello=False, debug_prints=False))
+
+
+def test_pack_orders():
+    assert pack_orders([(Order.HV_SET, 200), (Order.RELAY, 3), (Order.OPEN_RELAYS, None)]) == bytes(
+        [Order.HV_SET.value, 200, Order.RELAY.value, 3, Order.OPEN_RELAYS.value]
+    )
+    assert pack_orders([]) == b""
+    assert pack_orders([(Order.HV_SET, 0), (Order.HV_SET, 255)]) == bytes([7, 0, 7, 255])
+
+
+def test_orders_round_trip(serial):
+    write_orders(serial, [(Order.HV_SET, 255), (Order.RELAY, 3)])
+    assert serial.n_writes == 1
+    assert (serial.emulator.hv_dac, serial.emulator.relay) == (255, 3)
+    assert read_order(serial) == Order.HV_UPDATED
+    assert read_array(serial, "u8", 1)[0] == 255
+    assert [read_order(serial) for _ in range(3)] == [Order.RECEIVED, Order.READY_RELAY, Order.RECEIVED]
+    # Unknown order: ERROR and its int16 code
+    write_order(serial, Order.STOP)
+    assert read_order(serial) == Order.ERROR
+    assert read_i16(serial) == 404
+
+
+@pytest.mark.parametrize("value", [-1, 256, 1000])
+def test_out_of_range_order_value(serial, value):
+    with pytest.raises(ValueError, match=f"HV_SET value {value}"):
+        write_orders(serial, [(Order.RELAY, 2), (Order.HV_SET, value)])
+    # Nothing sent, not even the orders before the bad one
+    assert serial.bytes_written == 0
+    assert (serial.emulator.relay, serial.emulator.hv_dac, serial.emulator.n_orders) == (None, 0, 0)
+    with pytest.raises(ValueError):
+        write_order(serial, Order.HV_SET, value)
+    assert serial.bytes_written == 0
+
+
+@pytest.mark.parametrize("dtype, write, values", ARRAYS)
+def test_array_round_trip(dtype, write, values):
+    serial = LoopbackSerial(ArduinoEmulator(boot_hello=False, debug_prints=False))
+    write(serial, values)
+    assert serial.n_writes == 1
+    assert serial.emulator.output == struct.pack(f"<{len(values)}{dtype_code(dtype)}", *values)
+    result = read_array(serial, dtype, len(values))
+    assert list(result) == values
+    if sys.byteorder == "little":
+        # No copy: a view on the bytes read
+        assert isinstance(result, memoryview) and result.nbytes == len(values) * result.itemsize
+
+
+@pytest.mark.parametrize("dtype, write, values", ARRAYS)
+def test_array_big_endian_host(monkeypatch, dtype, write, values):
+    serial = LoopbackSerial(ArduinoEmulator(boot_hello=False, debug_prints=False))
+    write(serial, values)
+    monkeypatch.setattr(sys, "byteorder", "big")
+    result = read_array(serial, dtype, len(values))
+    assert isinstance(result, tuple) and list(result) == values
+
+
+@pytest.mark.parametrize("write, value", [(write_i8_array, 128), (write_i16_array, 32768), (write_i32_array, -(2**31) - 1)])
+def test_array_out_of_range(serial, write, value):
+    with pytest.raises(struct.error):
+        write(serial, [0, value])
+    assert serial.bytes_written == 0
+
+
+def test_short_read(serial):
+    serial.emulator.output += b"\x01\x02\x03"
+    with pytest.raises(RuntimeError, match="Got 3 bytes"):
+        read_array(serial, "i16", 2)
+
+
+def test_cached_structs():
+    assert array_struct("i16", 5) is array_struct("i16", 5)
+    assert array_struct("i16", 5) is not array_struct("i16", 6)
+    assert array_struct("i32", 2).size == 8 and array_struct("i32", 2).format == "<2l"
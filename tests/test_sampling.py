@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from clock import VirtualClock
+from sampling import FIXED_SAMPLING, SEQUENTIAL_SAMPLING, RunningStats, SamplePolicy, measure
+from sdm3055 import SDM3055
+from simulation.dmm import SimulatedDMM, SimulatedResource
+from simulation.stand import StandModel
+
+
+class FakeMeter:
+    """
+    Returns the given readings in order, as many as asked.
+    """
+
+    def __init__(self, readings):
+        self.readings = list(readings)
+        self.requests = []
+
+    def acquire(self, n):
+        self.requests.append(n)
+        taken, self.readings = self.readings[:n], self.readings[n:]
+        return taken
+
+
+def test_running_stats_match_numpy():
+    values = np.random.default_rng(0).normal(-0.5, 1e-4, 37)
+    stats = RunningStats()
+    stats.extend(values)
+    assert stats.n == 37
+    assert stats.mean == pytest.approx(values.mean(), abs=1e-15)
+    assert stats.sdev == pytest.approx(values.std(ddof=1), rel=1e-9)
+    assert stats.sem == pytest.approx(values.std(ddof=1) / np.sqrt(37), rel=1e-9)
+
+
+def test_running_stats_few_readings():
+    stats = RunningStats()
+    assert stats.sem == float("inf")
+    stats.add(1.0)
+    assert stats.variance == 0 and stats.sem == float("inf")
+
+
+def test_fixed_count():
+    meter = FakeMeter(np.zeros(100))
+    assert measure(meter, FIXED_SAMPLING).n == 10
+    assert meter.requests == [10]
+
+
+def test_stops_once_the_target_is_met():
+    policy = SamplePolicy(target_sem=10e-6, min_count=10, max_count=20, chunk=5)
+    quiet = FakeMeter(np.random.default_rng(1).normal(0, 10e-6, 100))
+    assert measure(quiet, policy).n == 10
+    # Noisy: chunks of 5 up to max_count
+    noisy = FakeMeter(np.random.default_rng(2).normal(0, 1e-3, 100))
+    assert measure(noisy, policy).n == 20
+    assert noisy.requests == [10, 5, 5]
+    # Runs out of readings
+    assert measure(FakeMeter(np.random.default_rng(3).normal(0, 1e-3, 12)), policy).n == 12
+
+
+def test_readings_are_reported():
+    seen = []
+    measure(FakeMeter(range(20)), FIXED_SAMPLING, seen.append)
+    assert seen == list(range(10))
+
+
+@pytest.mark.parametrize("noise", [5e-6, 20e-6, 60e-6])
+def test_sequential_sampling_at_least_as_precise_as_the_fixed_mean(noise):
+    # Settled stand, 5000 MOhm at full HV: the error of the mean comes from the reading noise only
+    clock = VirtualClock()
+    stand = StandModel(clock=clock)
+    stand.relay, stand.hv_dac = 0, 255
+    stand.start_voltage = true_voltage = stand.final_voltage()
+    meter = SDM3055(SimulatedResource(SimulatedDMM(stand, noise=noise, clock=clock)), clock=clock)
+    meter.configure_voltage(2)
+    errors = []
+    counts = []
+    for _ in range(300):
+        stats = measure(meter, SEQUENTIAL_SAMPLING)
+        errors.append(stats.mean - true_voltage)
+        counts.append(stats.n)
+    assert min(counts) >= FIXED_SAMPLING.max_count
+    # RMS error of the mean against the fixed 10 reading mean (noise / sqrt(10)), with room for the sampling of 300 runs
+    assert np.sqrt(np.mean(np.square(errors))) <= 1.15 * noise / np.sqrt(FIXED_SAMPLING.max_count)
+    if noise / np.sqrt(SEQUENTIAL_SAMPLING.max_count) > SEQUENTIAL_SAMPLING.target_sem:
+        # Noisy channel: more readings than the fixed mean
+        assert np.mean(counts) > FIXED_SAMPLING.max_count
@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+from analysis import R_PICKOFF, VOLTS_PER_UNIT, calibration
+from screening import Screen, ScreenPolicy
+
+HV = np.arange(13, 256, 13) * VOLTS_PER_UNIT
+ERROR = 20e-6
+CALIBRATED = {"Calib Channel": 1, "Calib Value": 5.0}
+
+
+def reading(resistance, hv, rng):
+    return -hv * R_PICKOFF / (resistance + R_PICKOFF) + rng.normal(0, ERROR)
+
+
+def sweep(screen, resistances, seed=0):
+    """
+    :return: {channel: index of the point at which it was rejected}
+    """
+    rng = np.random.default_rng(seed)
+    rejected_at = {}
+    for i, hv in enumerate(HV):
+        for channel in screen.active(resistances):
+            for rejected in screen.add(channel, reading(resistances[channel], hv, rng), ERROR, hv):
+                rejected_at[rejected] = i
+    return rejected_at
+
+
+def test_verdicts():
+    resistances = {1: 5000e6, 2: 5400e6, 3: 4600e6, 4: 3000e6, 5: 9000e6, 6: 1e18}
+    screen = Screen(ScreenPolicy(abort_fraction=None), resistances)
+    rejected_at = sweep(screen, resistances)
+    assert set(screen.rejected) == {4, 5, 6}
+    assert screen.rejected[4].endswith("below spec")
+    assert screen.rejected[5].endswith("above spec")
+    assert screen.rejected[6] == "open, no current"
+    # Clear cases are decided as soon as min_points are in
+    assert rejected_at[4] == rejected_at[5] == 1
+    assert screen.estimates[1].resistance == pytest.approx(5000e6, rel=0.01)
+    assert not screen.abort
+
+
+def test_min_points():
+    screen = Screen(ScreenPolicy(min_points=3), [1])
+    rng = np.random.default_rng(1)
+    assert screen.add(1, reading(2000e6, HV[0], rng), ERROR, HV[0]) == {}
+    assert screen.add(1, reading(2000e6, HV[1], rng), ERROR, HV[1]) == {}
+    assert list(screen.add(1, reading(2000e6, HV[2], rng), ERROR, HV[2])) == [1]
+    # Further points of a rejected channel change nothing
+    assert screen.add(1, reading(2000e6, HV[3], rng), ERROR, HV[3]) == {}
+    assert screen.estimates[1].n == 3
+
+
+def test_no_hv_is_ignored():
+    screen = Screen(ScreenPolicy(), [1])
+    assert screen.add(1, 0.0, ERROR, 0.0) == {}
+    assert screen.estimates[1].n == 0
+
+
+def test_abort_on_bad_board():
+    resistances = {channel: 2000e6 if channel <= 4 else 5000e6 for channel in range(1, 9)}
+    screen = Screen(ScreenPolicy(), resistances)
+    sweep(screen, resistances)
+    assert set(screen.rejected) == {1, 2, 3, 4}
+    assert screen.abort
+    assert screen.active(range(1, 9)) == [5, 6, 7, 8]
+
+
+def test_calibration_flips_the_verdict():
+    # The stand reads every resistance 12% high: 5600 MOhm for 5000 MOhm resistors
+    measured = {channel: 5600e6 for channel in range(1, 9)}
+    plain = Screen(ScreenPolicy(abort_fraction=None), measured)
+    sweep(plain, measured)
+    assert set(plain.rejected) == set(measured)
+
+    calibrated = Screen(ScreenPolicy(abort_fraction=None), measured, calibration(CALIBRATED))
+    sweep(calibrated, measured)
+    assert calibrated.rejected == {}
+    factor, _ = calibrated.scale()
+    assert 1 / (factor * calibrated.estimates[1].mean) == pytest.approx(5000e6, rel=0.01)
+
+    # ... and a resistor in spec on an uncalibrated reading is out of spec once calibrated
+    measured[3] = 5000e6
+    calibrated = Screen(ScreenPolicy(abort_fraction=None), measured, calibration(CALIBRATED))
+    sweep(calibrated, measured)
+    assert list(calibrated.rejected) == [3]
+    assert calibrated.rejected[3].endswith("below spec")
+
+
+def test_no_verdict_before_the_calibration_channel():
+    measured = {channel: 2000e6 for channel in range(1, 8)}
+    measured[8] = 5000e6
+    screen = Screen(ScreenPolicy(abort_fraction=None), measured, (8, 5000e6))
+    rng = np.random.default_rng(2)
+    for hv in HV[:2]:
+        for channel in range(1, 8):
+            assert screen.add(channel, reading(measured[channel], hv, rng), ERROR, hv) == {}
+    assert screen.add(8, reading(measured[8], HV[0], rng), ERROR, HV[0]) == {}
+    # The second point of the calibration channel decides the channels measured so far
+    assert set(screen.add(8, reading(measured[8], HV[1], rng), ERROR, HV[1])) == set(range(1, 8))
+    assert 8 not in screen.rejected
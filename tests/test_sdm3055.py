@@ -0,0 +1,179 @@
+import pytest
+
+from clock import VirtualClock
+from sdm3055 import DMMTimeoutError, SDM3055
+from simulation.dmm import SimulatedDMM, SimulatedResource
+
+
+class RecordingClock(VirtualClock):
+    def __init__(self):
+        super().__init__(start=0)
+        self.sleeps = []
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        super().sleep(seconds)
+
+
+def make_meter(reading_time=0.1, dmm_reading_time=None):
+    clock = RecordingClock()
+    dmm = SimulatedDMM(reading_time=reading_time if dmm_reading_time is None else dmm_reading_time, command_latency=0, clock=clock)
+    return SDM3055(SimulatedResource(dmm), clock=clock, reading_time=reading_time), dmm, clock
+
+
+# -- configuration cache ------------------------------------------------------
+
+
+def test_unchanged_configuration_is_skipped():
+    meter, dmm, _ = make_meter()
+    meter.configure_voltage(2)
+    meter.set_sample_count(10)
+    meter.set_trigger_delay(0)
+    meter.set_input_impedance("10G")
+    writes, commands = meter.n_writes, dmm.n_commands
+    meter.configure_voltage(2)
+    meter.set_sample_count(10)
+    meter.set_trigger_delay(0)
+    meter.set_input_impedance("10G")
+    assert meter.n_writes == writes
+    assert dmm.n_commands == commands
+    assert meter.n_skipped == 4
+    # A new value is sent
+    meter.set_sample_count(5)
+    assert meter.n_writes == writes + 1
+    assert dmm.sample_count == 5
+
+
+def test_conf_drops_the_settings_it_resets():
+    meter, dmm, _ = make_meter()
+    meter.configure_voltage(2)
+    meter.set_sample_count(10)
+    meter.invalidate()
+    meter.configure_voltage(2)
+    # CONF:VOLT:DC set the sample count back to 1 on the DMM, so 10 is sent again
+    writes = meter.n_writes
+    meter.set_sample_count(10)
+    assert meter.n_writes == writes + 1
+    assert dmm.sample_count == 10
+
+
+@pytest.mark.parametrize("how", ["reset", "error", "communication", "reconnect"])
+def test_cache_is_dropped(how):
+    meter, dmm, _ = make_meter()
+    meter.configure_voltage(2)
+    meter.set_sample_count(10)
+    if how == "reset":
+        meter.reset()
+        assert dmm.sample_count == 1
+    elif how == "error":
+        meter.write("BOGUS")
+        assert meter.check_errors() == ['-113,"Undefined header"']
+    elif how == "communication":
+        # The response is lost: the second read times out like pyvisa would
+        read = meter.resource.read
+        meter.resource.read = lambda: read() and read()
+        with pytest.raises(TimeoutError):
+            meter.query("*IDN?")
+        meter.resource.read = read
+    else:
+        meter.reconnect(SimulatedResource(dmm))
+    assert meter.state == {}
+    writes = meter.n_writes
+    meter.configure_voltage(2)
+    meter.set_sample_count(10)
+    assert meter.n_writes == writes + 3
+
+
+def test_no_error_keeps_the_cache():
+    meter, _, _ = make_meter()
+    meter.configure_voltage(2)
+    assert meter.check_errors() == []
+    assert meter.state["function"] == "VOLT:DC"
+
+
+# -- streamed acquisition -----------------------------------------------------
+
+
+def test_stream_chunks():
+    meter, dmm, clock = make_meter()
+    meter.configure_voltage(2)
+    chunks = list(meter.stream(25, chunk=10))
+    assert [len(chunk) for chunk in chunks] == [10, 10, 5]
+    assert meter.n_readings == 25
+    # Waits about as long as the readings take, not more
+    assert 2.5 <= clock.time() < 3.0
+    assert dmm.n_readings == 25
+
+
+def test_stream_with_delay_and_small_chunks():
+    meter, _, clock = make_meter()
+    chunks = list(meter.stream(6, chunk=2, delay=0.4))
+    assert [len(chunk) for chunk in chunks] == [2, 2, 2]
+    assert clock.time() == pytest.approx(6 * 0.5, abs=0.1)
+
+
+def test_stream_timeout_aborts():
+    meter, dmm, clock = make_meter()
+    aborted = []
+    dmm.handlers["DATA:POIN?"] = lambda args: "0"
+    dmm.handlers["ABOR"] = aborted.append
+    with pytest.raises(DMMTimeoutError):
+        list(meter.stream(10, chunk=5))
+    # Expected time + 2 s (longer than the 2 s resource timeout)
+    assert clock.time() == pytest.approx(10 * 0.1 + 2)
+    assert aborted
+
+
+def test_stream_deadline_follows_resource_timeout():
+    meter, dmm, clock = make_meter()
+    meter.resource.timeout = 10000
+    dmm.handlers["DATA:POIN?"] = lambda args: "0"
+    with pytest.raises(DMMTimeoutError):
+        list(meter.stream(10, chunk=5))
+    assert clock.time() == pytest.approx(10)
+
+    start = clock.time()
+    with pytest.raises(DMMTimeoutError):
+        list(meter.stream(10, chunk=5, timeout=0.5))
+    assert clock.time() - start == pytest.approx(0.5)
+
+
+# -- statistics completion polling --------------------------------------------
+
+
+def test_statistics_polls_with_back_off():
+    # The DMM is twice as slow as expected: 10 readings take 2 s, 1 s is expected
+    meter, dmm, clock = make_meter(reading_time=0.1, dmm_reading_time=0.2)
+    mean, sdev = meter.statistics(10)
+    assert clock.sleeps == pytest.approx([1.0, 0.02, 0.04, 0.08, 0.16, 0.32, 0.5])
+    assert clock.time() >= 2.0
+    assert mean == pytest.approx(0, abs=1e-4) and sdev > 0
+    assert meter.n_readings == 10
+
+
+def test_statistics_on_time_does_not_poll_again():
+    meter, _, clock = make_meter()
+    meter.statistics(10)
+    assert clock.sleeps == pytest.approx([1.0])
+
+
+def test_statistics_timeout():
+    meter, dmm, clock = make_meter()
+    aborted = []
+    dmm.handlers["CALC:AVER:COUN?"] = lambda args: "3"
+    dmm.handlers["ABOR"] = aborted.append
+    with pytest.raises(DMMTimeoutError, match="3/10"):
+        meter.statistics(10, timeout=4)
+    # Polls stop at the deadline, never past it
+    assert clock.time() == pytest.approx(4)
+    assert max(clock.sleeps[1:]) == pytest.approx(0.5)
+    assert aborted
+
+
+def test_statistics_default_timeout():
+    meter, dmm, clock = make_meter()
+    dmm.handlers["CALC:AVER:COUN?"] = lambda args: "0"
+    with pytest.raises(DMMTimeoutError):
+        meter.wait_statistics(10)
+    # Twice the expected 1 s, + 2 s
+    assert clock.time() == pytest.approx(4)
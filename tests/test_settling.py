@@ -0,0 +1,82 @@
+import pytest
+
+from clock import VirtualClock
+from sdm3055 import SDM3055
+from settling import HV_SETTLE, RELAY_SETTLE, SettlePolicy, predicted_residual, wait_settled
+from simulation.arduino import ArduinoEmulator
+from simulation.dmm import SimulatedDMM, SimulatedResource
+from simulation.stand import StandModel
+
+NOISE = 20e-6
+
+
+def make_stand(hv_tau=1.5, relay_tau=0.3):
+    clock = VirtualClock(start=0)
+    emulator = ArduinoEmulator(boot_hello=False, debug_prints=False)
+    stand = StandModel(hv_tau=hv_tau, relay_tau=relay_tau, clock=clock).attach(emulator)
+    meter = SDM3055(SimulatedResource(SimulatedDMM(stand, noise=NOISE, clock=clock)), clock=clock)
+    meter.configure_voltage(2)
+    return emulator, stand, meter, clock
+
+
+def step_hv(emulator, dac):
+    emulator.hv_dac = dac
+    emulator._changed()
+
+
+def test_predicted_residual_of_an_exponential():
+    # m = 1 - 0.5**k: differences halve, 0.125 left after 0.875
+    assert predicted_residual([0.5, 0.75, 0.875]) == pytest.approx(0.125)
+    # Noise dominated (ratio outside 0..1): the slope
+    assert predicted_residual([1.0, 1.2, 1.1]) == pytest.approx(0.1)
+    assert predicted_residual([1.0, 1.0, 1.0]) == 0
+
+
+@pytest.mark.parametrize("dac", [13, 128, 255])
+def test_hv_step_settles_within_tolerance(dac):
+    emulator, stand, meter, clock = make_stand()
+    emulator.relay = 0
+    step_hv(emulator, dac)
+    result = wait_settled(meter, SettlePolicy(max_wait=30, min_wait=0.5, noise=NOISE), clock)
+    assert result.settled
+    # Settled well before the 30 s cap, to within a few reading sdevs of the final
+    # value (the prediction works on chunk means, which carry noise of their own)
+    assert result.elapsed < 20
+    assert abs(stand.voltage() - stand.final_voltage()) <= 5 * NOISE
+    assert abs(result.last_mean - stand.final_voltage()) <= 5 * NOISE
+
+
+def test_relay_step_settles():
+    emulator, stand, meter, clock = make_stand()
+    emulator.relay = 0
+    step_hv(emulator, 200)
+    clock.sleep(60)
+    emulator.relay = 1
+    emulator._changed()
+    result = wait_settled(meter, RELAY_SETTLE, clock)
+    assert result.settled
+    assert abs(stand.voltage() - stand.final_voltage()) <= 5 * NOISE
+
+
+@pytest.mark.parametrize("policy", [HV_SETTLE, SettlePolicy(max_wait=3, chunk=3)])
+def test_max_wait_is_respected(policy):
+    # Far too slow to settle within the cap
+    emulator, _, meter, clock = make_stand(hv_tau=1000)
+    emulator.relay = 0
+    step_hv(emulator, 255)
+    result = wait_settled(meter, policy, clock)
+    assert not result.settled
+    chunk_time = policy.chunk * meter.reading_time
+    assert policy.max_wait <= result.elapsed <= policy.max_wait + chunk_time + 0.1
+    assert result.n_readings % policy.chunk == 0
+
+
+def test_no_readings():
+    class SilentMeter:
+        def acquire(self, n):
+            return []
+
+    clock = VirtualClock(start=0)
+    result = wait_settled(SilentMeter(), SettlePolicy(max_wait=5), clock)
+    assert not result.settled
+    assert result.n_readings == 0 and result.last_mean is None
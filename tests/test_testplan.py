@@ -0,0 +1,98 @@
+import json
+
+import pytest
+import yaml
+
+from testplan import MEASURE, PLANS, SET_HV, STANDARD_PLAN, STREAM, PlanExecutor, compile_plan, load_plan
+from testplan import TestPlan as Plan  # not a pytest class
+
+PLAN = {
+    "name": "roundtrip",
+    "hv": {"start": 26, "stop": 100, "step": 26},
+    "volts_per_unit": 7.843,
+    "channels": [3, 1, 8],
+    "voltage_range": None,
+    "settle": {"hv": {"max_wait": 12, "min_wait": 1}, "relay": {"max_wait": 3, "chunk": 4}},
+    "sampling": {"target_sem": 2e-5, "min_count": 10, "max_count": 30},
+    "dwell": 0.5,
+    "pause": {"every": 600, "duration": 30},
+    "screen": {"target": 5e9, "tolerance": 5e8, "confidence": 3, "min_points": 2, "abort_fraction": 0.5},
+}
+
+
+def summary(plan: Plan) -> dict:
+    """
+    :return: everything a plan defines, policies as attribute dicts
+    """
+    result = {key: value for key, value in vars(plan).items() if key != "source"}
+    for key in ("hv_settle", "relay_settle", "sampling", "screen"):
+        if result[key] is not None:
+            result[key] = vars(result[key])
+    return result
+
+
+@pytest.fixture
+def plan_files(tmp_path):
+    json_path = tmp_path / "plan.json"
+    json_path.write_text(json.dumps(PLAN))
+    yaml_path = tmp_path / "plan.yaml"
+    yaml_path.write_text(yaml.safe_dump(PLAN))
+    return str(json_path), str(yaml_path)
+
+
+def test_json_and_yaml_round_trip(plan_files):
+    json_path, yaml_path = plan_files
+    from_json, from_yaml = load_plan(json_path), load_plan(yaml_path)
+    assert summary(from_json) == summary(from_yaml) == summary(Plan.from_dict(PLAN))
+    assert from_json.dac_values == [26, 52, 78]
+    assert from_json.channels == [3, 1, 8]
+    assert from_json.voltage_range is None
+    assert (from_json.hv_settle.max_wait, from_json.relay_settle.chunk) == (12, 4)
+    assert (from_json.sampling.target_sem, from_json.sampling.max_count) == (2e-5, 30)
+    assert (from_json.pause_every, from_json.pause_duration) == (600, 30)
+    assert from_json.screen.target == 5e9
+    # source loads the same plan again
+    assert summary(load_plan(from_yaml.source)) == summary(from_yaml)
+
+
+def test_plans_folder_matches_built_ins():
+    resistor = load_plan("resistor.json")
+    assert summary(resistor) == dict(summary(STANDARD_PLAN), name="resistor")
+    relay_test = load_plan("relay_test.json")
+    assert relay_test.stream == PLANS["relay_test"].stream
+    assert load_plan("varistor.yaml").voltage_range is None
+    assert load_plan("standard") is STANDARD_PLAN
+
+
+@pytest.mark.parametrize("key, value", [("channels", [0, 1]), ("channels", [9]), ("hv", [256])])
+def test_invalid_plan(key, value):
+    with pytest.raises(ValueError):
+        Plan.from_dict(dict(PLAN, **{key: value}))
+
+
+def test_step_order():
+    plan = Plan.from_dict(PLAN)
+    steps = compile_plan(plan)
+    assert [(step.kind, step.dac, step.channel) for step in steps] == [
+        (kind, dac, channel)
+        for dac in (26, 52, 78)
+        for kind, channel in [(SET_HV, None), (MEASURE, 3), (MEASURE, 1), (MEASURE, 8)]
+    ]
+    assert all(step.volts == step.dac * 7.843 for step in steps)
+    streamed = compile_plan(PLANS["relay_test"])
+    assert [(step.kind, step.dac, step.channel) for step in streamed] == [(SET_HV, 0, None), (STREAM, 0, 1)]
+
+
+def test_done_steps_are_skipped():
+    plan = Plan.from_dict(dict(PLAN, screen=None))
+    done = {(26, 3), (26, 1), (26, 8), (52, 3)}
+    executor = PlanExecutor(object(), plan, done)
+    assert [(step.kind, step.dac, step.channel) for step in executor.steps] == [
+        (SET_HV, 52, None),
+        (MEASURE, 52, 1),
+        (MEASURE, 52, 8),
+        (SET_HV, 78, None),
+        (MEASURE, 78, 3),
+        (MEASURE, 78, 1),
+        (MEASURE, 78, 8),
+    ]